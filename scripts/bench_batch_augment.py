@@ -0,0 +1,138 @@
+"""Benchmark batch augmentation against the per-sample PIL path.
+
+Times the same recipe -- pad-and-crop, horizontal flip, cutout, normalize --
+done two ways over a small-image dataset:
+
+- `pil`: per sample, as a typical `Dataset.__getitem__` transform would --
+  `ds[i]` (a PIL image), `ImageOps.expand`, `crop`, `transpose`, then cutout
+  and normalization on the sample's array, and a final `np.stack`.
+- `batch`: `ds.gather(indices)` plus one `BatchAugment` call (see
+  rsrch_data/utils/batch_augment.py).
+
+Without `--data-root`, random images of the dataset's shape are used instead,
+so the benchmark runs without downloading anything.
+"""
+
+import time
+from collections.abc import Callable
+from typing import Literal
+
+import numpy as np
+import tyro
+from PIL import Image, ImageOps
+from pydantic import BaseModel
+
+from rsrch_data.cifar import CIFAR10, CIFAR100
+from rsrch_data.mnist import MNIST
+from rsrch_data.utils.batch_augment import BatchAugment
+
+_DATASETS = {"cifar-10": CIFAR10, "cifar-100": CIFAR100, "mnist": MNIST}
+
+_SHAPES = {
+    "cifar-10": (50000, 32, 32, 3),
+    "cifar-100": (50000, 32, 32, 3),
+    "mnist": (60000, 28, 28),
+}
+
+
+class Args(BaseModel):
+    """CLI args for the batch augmentation benchmark."""
+
+    dataset: Literal["cifar-10", "cifar-100", "mnist"] = "cifar-10"
+    """Dataset to augment."""
+    data_root: str | None = None
+    """Dataset root (default: random images of the dataset's shape)."""
+    batch_size: int = 256
+    """Samples per batch."""
+    num_batches: int = 50
+    """Batches timed per method."""
+    padding: int = 4
+    """Pixels of padding per side for the random crop."""
+    cutout_size: int = 16
+    """Side of the cutout square (0 to disable)."""
+    seed: int = 0
+    """Seed for batch sampling and augmentation."""
+
+
+class _Synthetic:
+    """Random uint8 images, indexable like an `as_array` dataset."""
+
+    def __init__(self, shape: tuple[int, ...], seed: int) -> None:
+        self.images = np.random.default_rng(seed).integers(
+            0, 256, size=shape, dtype=np.uint8
+        )
+        self.labels = np.zeros(len(self.images), dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    def __getitem__(self, index: int) -> dict:
+        return {"image": Image.fromarray(self.images[index]), "label": 0}
+
+    def gather(self, indices: np.ndarray) -> dict:
+        return {"image": self.images[indices], "label": self.labels[indices]}
+
+
+def _pil_batch(
+    ds: _Synthetic | CIFAR10 | CIFAR100 | MNIST,
+    indices: np.ndarray,
+    args: Args,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    out = []
+    for i in indices:
+        image = ds[int(i)]["image"]
+        width, height = image.size
+        image = ImageOps.expand(image, args.padding)
+        top, left = rng.integers(0, 2 * args.padding + 1, size=2)
+        image = image.crop((left, top, left + width, top + height))
+        if rng.random() < 0.5:
+            image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        array = np.asarray(image, dtype=np.float32) / 255
+        if args.cutout_size > 0:
+            half = args.cutout_size // 2
+            y, x = rng.integers(0, height), rng.integers(0, width)
+            array[max(0, y - half) : y + half, max(0, x - half) : x + half] = 0
+        out.append((array - 0.5) / 0.25)
+    return np.stack(out)
+
+
+def _time(name: str, fn: Callable[[np.ndarray], np.ndarray], batches: list) -> float:
+    fn(batches[0])  # Warm-up.
+    start = time.perf_counter()
+    for indices in batches:
+        fn(indices)
+    rate = sum(len(indices) for indices in batches) / (time.perf_counter() - start)
+    print(f"{name:>6}: {rate:12,.0f} img/s")
+    return rate
+
+
+def main(args: Args) -> None:
+    """Benchmark batch augmentation against the per-sample PIL path."""
+    if args.data_root is None:
+        ds = _Synthetic(_SHAPES[args.dataset], args.seed)
+    else:
+        ds = _DATASETS[args.dataset](args.data_root)
+
+    rng = np.random.default_rng(args.seed)
+    batches = [
+        rng.choice(len(ds), args.batch_size, replace=False)
+        for _ in range(args.num_batches)
+    ]
+    augment = BatchAugment(
+        padding=args.padding,
+        cutout_size=args.cutout_size,
+        mean=0.5,
+        std=0.25,
+        seed=args.seed,
+    )
+
+    pil = _time("pil", lambda indices: _pil_batch(ds, indices, args, rng), batches)
+    batch = _time(
+        "batch", lambda indices: augment(ds.gather(indices)["image"]), batches
+    )
+    print(f"speedup: {batch / pil:.1f}x")
+
+
+if __name__ == "__main__":
+    main(tyro.cli(Args))
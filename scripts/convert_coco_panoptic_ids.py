@@ -0,0 +1,133 @@
+"""Pre-convert COCO panoptic PNGs into a compact, memory-mapped id cache.
+
+Decodes every `annotations/panoptic_{split}2017/*.png` once and stores its
+id map as 1-based positions in the image's segment list (see
+`ids_to_segments` in rsrch_data/coco/panoptic.py) -- one uint8 per pixel
+for COCO, vs. a PNG decode plus an RGB-to-id pass per sample. `COCOPanoptic`
+then reads id maps straight from the memory-mapped cache. Expect roughly one
+byte per annotated pixel on disk (~35GB for train2017).
+
+PNGs are decoded in a process pool; each worker writes its chunk of images
+straight into the memory-mapped output. The cache's `meta.json` is written
+only once the data is complete, and records the annotation file's size and
+mtime, so a partial or stale cache is never used.
+"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+import tyro
+from PIL import Image
+from pydantic import BaseModel
+from tqdm.auto import tqdm
+
+from rsrch_data.coco.panoptic import (
+    ID_CACHE_VERSION,
+    IdCacheMetadata,
+    id_cache_dtype,
+    id_cache_paths,
+    ids_to_segments,
+    rgb_to_ids,
+)
+from rsrch_data.coco.utils.index import load_panoptic_index
+from rsrch_data.utils.npy_cache import stat_key
+
+
+class Args(BaseModel):
+    """CLI args for the COCO panoptic id cache converter."""
+
+    data_root: str
+    """COCO root, containing `annotations/`."""
+    splits: list[Literal["train", "val"]] = ["train", "val"]
+    """Splits to convert."""
+    num_workers: int | None = None
+    """Decode processes (default: one per CPU)."""
+    chunk_size: int = 64
+    """Images per work item sent to the pool."""
+
+
+def _convert_chunk(
+    data_root: Path,
+    split: str,
+    dtype: str,
+    num_pixels: int,
+    lo: int,
+    hi: int,
+    offset: int,
+) -> int:
+    index = load_panoptic_index(data_root, split)
+    ann_root = data_root / f"annotations/panoptic_{split}2017"
+    data_path, _ = id_cache_paths(data_root, split)
+    out = np.memmap(data_path, dtype=dtype, mode="r+", shape=(num_pixels,))
+    for i in range(lo, hi):
+        width, height = index.sizes[i].tolist()
+        with Image.open(ann_root / index.ann_file_names[i]) as img:
+            ids = rgb_to_ids(img)
+        if ids.shape != (height, width):
+            msg = f"{index.ann_file_names[i]}: size {ids.shape} != {(height, width)}"
+            raise RuntimeError(msg)
+        segment_ids = index.segment_ids[index.segments(i)]
+        out[offset : offset + ids.size] = ids_to_segments(ids, segment_ids).ravel()
+        offset += ids.size
+    out.flush()
+    return hi - lo
+
+
+def _convert_split(args: Args, split: str) -> None:
+    data_root = Path(args.data_root).expanduser()
+    data_path, meta_path = id_cache_paths(data_root, split)
+    meta_path.unlink(missing_ok=True)
+
+    index = load_panoptic_index(data_root, split)
+    dtype = id_cache_dtype(index).name
+    pixel_offsets = np.zeros(len(index) + 1, dtype=np.int64)
+    np.cumsum(np.prod(index.sizes, axis=1), out=pixel_offsets[1:])
+    num_pixels = int(pixel_offsets[-1])
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+    if num_pixels > 0:
+        out = np.memmap(data_path, dtype=dtype, mode="w+", shape=(num_pixels,))
+        del out  # Only needed to create the file at its full size.
+    else:
+        data_path.write_bytes(b"")
+
+    with (
+        ProcessPoolExecutor(args.num_workers) as pool,
+        tqdm(total=len(index), desc=f"Converting {split}", unit="img") as pbar,
+    ):
+        futures = [
+            pool.submit(
+                _convert_chunk,
+                data_root,
+                split,
+                dtype,
+                num_pixels,
+                lo,
+                min(lo + args.chunk_size, len(index)),
+                int(pixel_offsets[lo]),
+            )
+            for lo in range(0, len(index), args.chunk_size)
+        ]
+        for future in futures:
+            pbar.update(future.result())
+
+    meta: IdCacheMetadata = {
+        "version": ID_CACHE_VERSION,
+        "sources": stat_key([data_root / f"annotations/panoptic_{split}2017.json"]),
+        "dtype": dtype,
+        "num_pixels": num_pixels,
+    }
+    with meta_path.open("w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def main(args: Args) -> None:
+    """Pre-convert COCO panoptic PNGs into a compact, memory-mapped id cache."""
+    for split in args.splits:
+        _convert_split(args, split)
+
+
+if __name__ == "__main__":
+    main(tyro.cli(Args))
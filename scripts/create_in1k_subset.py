@@ -7,11 +7,18 @@ row groups unevenly sized), and labels are recomputed from `wnid` against the
 new (sampled) class list rather than copied -- the source's `label` values are
 0-indexed against the *full* class list, not the subset's, and would otherwise
 land outside `[0, num_classes)`.
+
+Like pack_in1k_to_parquet.py, a crashed run resumes after its last completed
+shard when rerun with the same args.
 """
 
 from collections.abc import Iterable
+from dataclasses import asdict, replace
+from functools import partial
 from pathlib import Path
 
+import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 import tyro
 from pydantic import BaseModel
@@ -19,11 +26,16 @@ from tqdm.auto import tqdm
 
 from rsrch_data.imagenet import (
     PARQUET_COMPRESSION,
+    PARQUET_INDEX,
     PARQUET_SCHEMA,
     parse_loc_synset_mapping,
 )
 from rsrch_data.utils.misc import parse_size
-from rsrch_data.utils.parquet_writer import write_sharded_parquet
+from rsrch_data.utils.parquet_writer import (
+    IndexOptions,
+    shards_complete,
+    write_sharded_parquet,
+)
 
 
 class Args(BaseModel):
@@ -45,24 +57,49 @@ class Args(BaseModel):
     worth of data (see write_sharded_parquet)."""
     seed: int = 0
     """Seed for the class sample."""
+    bloom_filters: bool = False
+    """Also write Bloom filters for `image_id`, for point lookups (needs
+    pyarrow>=24; see PARQUET_INDEX)."""
 
 
 def _filtered_rows(
-    files: list[Path], wnid_to_new_label: dict[str, int], split: str
-) -> Iterable[dict]:
-    """Yield rows whose wnid survived the class sample, relabeled to it."""
+    files: list[Path],
+    wnid_to_new_label: dict[str, int],
+    split: str,
+    start: int = 0,
+) -> Iterable[pa.Table]:
+    """Yield row groups' rows whose wnid survived the class sample, relabeled to it.
+
+    Filtering and relabeling are vectorized over each Arrow table, so rows
+    (and their image bytes) never round-trip through Python objects. The
+    first `start` surviving rows are skipped -- counting a row group's
+    survivors needs only its `wnid` column, so skipped ones cost no image
+    reads.
+    """
+    # `new_labels[i]` is the new label of `new_wnids[i]`.
+    new_wnids = pa.array(list(wnid_to_new_label), pa.string())
+    new_labels = pa.array(list(wnid_to_new_label.values()), pa.int32())
     total = sum(pq.ParquetFile(f).metadata.num_rows for f in files)
     with tqdm(total=total, desc=f"Filtering {split}", unit="img") as pbar:
         for file in files:
             pf = pq.ParquetFile(file)
-            for batch in pf.iter_batches():
-                for row in batch.to_pylist():
-                    pbar.update(1)
-                    new_label = wnid_to_new_label.get(row["wnid"])
-                    if new_label is None:
+            for row_group in range(pf.num_row_groups):
+                pbar.update(pf.metadata.row_group(row_group).num_rows)
+                if start > 0:
+                    wnids = pf.read_row_group(row_group, columns=["wnid"])
+                    mask = pc.is_in(wnids.column("wnid"), value_set=new_wnids)
+                    num_kept = pc.sum(mask).as_py() or 0
+                    if num_kept <= start:
+                        start -= num_kept
                         continue
-                    row["label"] = new_label
-                    yield row
+                table = pf.read_row_group(row_group)
+                positions = pc.index_in(table.column("wnid"), value_set=new_wnids)
+                keep = pc.is_valid(positions)
+                table = table.filter(keep)
+                labels = pc.take(new_labels, positions.filter(keep))
+                label_idx = table.schema.get_field_index("label")
+                yield table.set_column(label_idx, "label", labels).slice(start)
+                start = 0
 
 
 def _subset_split(
@@ -72,22 +109,33 @@ def _subset_split(
     wnid_to_new_label: dict[str, int],
     row_group_size: int,
     max_shard_bytes: int,
+    index: IndexOptions,
 ) -> None:
     """Filter and relabel one split's shards into `output_dir`."""
-    if sorted(output_dir.glob(f"{split}-*.parquet")):
+    if shards_complete(output_dir, split):
         return
     files = sorted(in1k_root.glob(f"{split}-*.parquet"))
     if not files:
         return
 
+    resume_key = {
+        "in1k_root": str(in1k_root),
+        "files": [f.name for f in files],
+        "wnid_to_new_label": wnid_to_new_label,
+        "row_group_size": row_group_size,
+        "max_shard_bytes": max_shard_bytes,
+        "index": asdict(index),
+    }
     write_sharded_parquet(
-        _filtered_rows(files, wnid_to_new_label, split),
+        partial(_filtered_rows, files, wnid_to_new_label, split),
         output_dir,
         split,
         PARQUET_SCHEMA,
         PARQUET_COMPRESSION,
         row_group_size,
         max_shard_bytes,
+        index=index,
+        resume_key=resume_key,
     )
 
 
@@ -109,6 +157,11 @@ def main(args: Args) -> None:
 
     wnid_to_new_label = {wnid: label for label, wnid in enumerate(synset_df["wnid"])}
     max_shard_bytes = int(parse_size(args.max_shard_size))
+    index = (
+        replace(PARQUET_INDEX, bloom_filters=("image_id",))
+        if args.bloom_filters
+        else PARQUET_INDEX
+    )
 
     for split in ("train", "val"):
         _subset_split(
@@ -118,6 +171,7 @@ def main(args: Args) -> None:
             wnid_to_new_label,
             args.row_group_size,
             max_shard_bytes,
+            index,
         )
 
     with (output_dir / "LOC_synset_mapping.txt").open("w") as f:
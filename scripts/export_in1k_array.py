@@ -0,0 +1,227 @@
+"""Export ImageNet at a fixed resolution as raw uint8 pixel arrays.
+
+Reads an ImageNet-format root (folder layout, see `ImageNet`) or a
+Parquet-packed one (see pack_in1k_to_parquet.py), crops/resizes every image to
+`size x size` with the chosen policy, and writes an `N x H x W x 3` uint8
+memmap plus an int32 labels array per split -- see `ImageNetArray` in
+rsrch_data/imagenet.py for the loader. For 32/64/128px experiments the whole
+dataset then fits as pixels, so training never decodes a JPEG.
+
+Images are decoded and resized in a process pool; each worker writes its
+chunk of rows straight into the memory-mapped output, so no pixels travel
+back through the parent. Samples keep the source's order (`ImageNet.paths`
+order, or the Parquet shards' pre-shuffled row order).
+
+A split's `{split}.json` sidecar is written only once its arrays are
+complete, so an interrupted export is never mistaken for a finished one.
+"""
+
+import io
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+import pyarrow.parquet as pq
+import tyro
+from PIL import Image
+from pydantic import BaseModel
+from tqdm.auto import tqdm
+
+from rsrch_data.imagenet import ArrayMetadata, ImageNet, ImageNetParquet, array_paths
+
+Policy = Literal["center-crop", "squash"]
+Resample = Literal["box", "bilinear", "bicubic", "lanczos"]
+
+_RESAMPLE = {
+    "box": Image.Resampling.BOX,
+    "bilinear": Image.Resampling.BILINEAR,
+    "bicubic": Image.Resampling.BICUBIC,
+    "lanczos": Image.Resampling.LANCZOS,
+}
+
+
+class Args(BaseModel):
+    """CLI args for the fixed-resolution ImageNet array exporter."""
+
+    input_dir: str
+    """Source dataset root, in `input_format`'s layout."""
+    output_dir: str
+    """Output directory for the arrays."""
+    input_format: Literal["imagenet", "imagenet-parquet"] = "imagenet"
+    """Source layout: an ImageNet-format folder, or Parquet shards as written
+    by pack_in1k_to_parquet.py."""
+    size: int = 64
+    """Output height and width, in pixels."""
+    policy: Policy = "center-crop"
+    """`center-crop`: crop the largest centered square, then resize it --
+    keeps aspect ratio, drops the borders of the longer side. `squash`:
+    resize the whole image, ignoring aspect ratio (as in the downsampled
+    ImageNet variants of Chrabaszcz et al., 2017)."""
+    resample: Resample = "box"
+    """PIL resampling filter. `box` is an exact area average -- cheap and
+    alias-free for the large downscaling factors involved here."""
+    num_workers: int | None = None
+    """Decode/resize processes (default: one per CPU)."""
+    chunk_size: int = 256
+    """Images per work item sent to the pool."""
+
+
+def _to_array(
+    image: Image.Image, size: int, policy: Policy, resample: Resample
+) -> np.ndarray:
+    image = image.convert("RGB")
+    box = None
+    if policy == "center-crop":
+        side = min(image.width, image.height)
+        left = (image.width - side) / 2
+        top = (image.height - side) / 2
+        box = (left, top, left + side, top + side)
+    # Cropping through `box` resamples from the source pixels in one pass
+    # (no intermediate cropped copy).
+    image = image.resize((size, size), _RESAMPLE[resample], box=box)
+    return np.asarray(image)
+
+
+def _export_files(
+    images_path: Path,
+    num_samples: int,
+    size: int,
+    policy: Policy,
+    resample: Resample,
+    start: int,
+    paths: list[Path],
+) -> int:
+    images = np.memmap(
+        images_path, dtype=np.uint8, mode="r+", shape=(num_samples, size, size, 3)
+    )
+    for k, path in enumerate(paths):
+        with Image.open(path) as image:
+            images[start + k] = _to_array(image, size, policy, resample)
+    images.flush()
+    return len(paths)
+
+
+def _export_row_group(
+    images_path: Path,
+    num_samples: int,
+    size: int,
+    policy: Policy,
+    resample: Resample,
+    start: int,
+    file: Path,
+    row_group: int,
+) -> int:
+    images = np.memmap(
+        images_path, dtype=np.uint8, mode="r+", shape=(num_samples, size, size, 3)
+    )
+    column = pq.ParquetFile(file).read_row_group(row_group, columns=["image"])
+    for k, img_bytes in enumerate(column.column("image").to_pylist()):
+        with Image.open(io.BytesIO(img_bytes)) as image:
+            images[start + k] = _to_array(image, size, policy, resample)
+    images.flush()
+    return column.num_rows
+
+
+def _folder_tasks(
+    input_dir: Path, split: Literal["train", "val"], chunk_size: int
+) -> tuple[np.ndarray, list[tuple]]:
+    """Return labels and `_export_files` work items for a folder-layout split."""
+    ds = ImageNet(input_dir, split=split)
+    labels = np.array(ds.labels, dtype=np.int32)
+    paths = [ds.img_root / (path + ".JPEG") for path in ds.paths]
+    tasks = [
+        (_export_files, start, paths[start : start + chunk_size])
+        for start in range(0, len(paths), chunk_size)
+    ]
+    return labels, tasks
+
+
+def _parquet_tasks(
+    input_dir: Path, split: Literal["train", "val"]
+) -> tuple[np.ndarray, list[tuple]]:
+    """Return labels and `_export_row_group` work items (one per row group)."""
+    ds = ImageNetParquet(input_dir, split=split)
+    labels = []
+    tasks = []
+    start = 0
+    for file in ds.files:
+        pf = pq.ParquetFile(file)
+        labels.append(pf.read(columns=["label"]).column("label").to_numpy())
+        for row_group in range(pf.metadata.num_row_groups):
+            tasks.append((_export_row_group, start, file, row_group))
+            start += pf.metadata.row_group(row_group).num_rows
+    return np.concatenate(labels).astype(np.int32), tasks
+
+
+def _export_split(args: Args, split: Literal["train", "val"]) -> None:
+    """Export one split's images and labels as arrays."""
+    input_dir = Path(args.input_dir)
+    images_path, labels_path, meta_path = array_paths(args.output_dir, split)
+    meta_path.unlink(missing_ok=True)
+
+    if args.input_format == "imagenet":
+        labels, tasks = _folder_tasks(input_dir, split, args.chunk_size)
+    else:
+        labels, tasks = _parquet_tasks(input_dir, split)
+    if len(labels) == 0:
+        return
+
+    num_samples = len(labels)
+    images = np.memmap(
+        images_path,
+        dtype=np.uint8,
+        mode="w+",
+        shape=(num_samples, args.size, args.size, 3),
+    )
+    del images  # Only needed to create the file at its full size.
+
+    with (
+        ProcessPoolExecutor(args.num_workers) as pool,
+        tqdm(total=num_samples, desc=f"Exporting {split}", unit="img") as pbar,
+    ):
+        futures = [
+            pool.submit(
+                fn,
+                images_path,
+                num_samples,
+                args.size,
+                args.policy,
+                args.resample,
+                *task,
+            )
+            for fn, *task in tasks
+        ]
+        for future in futures:
+            pbar.update(future.result())
+
+    labels.tofile(labels_path)
+    meta: ArrayMetadata = {
+        "num_samples": num_samples,
+        "height": args.size,
+        "width": args.size,
+        "policy": args.policy,
+        "resample": args.resample,
+    }
+    with meta_path.open("w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def main(args: Args) -> None:
+    """Export ImageNet at a fixed resolution as raw uint8 pixel arrays."""
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    for split in ("train", "val"):
+        _export_split(args, split)
+
+    shutil.copy(
+        Path(args.input_dir) / "LOC_synset_mapping.txt",
+        output_dir / "LOC_synset_mapping.txt",
+    )
+
+
+if __name__ == "__main__":
+    main(tyro.cli(Args))
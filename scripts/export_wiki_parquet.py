@@ -0,0 +1,112 @@
+"""Export a Wikipedia dump's `WikiText` samples to zstd-compressed Parquet shards.
+
+Decompresses and parses the multistream XML dump once -- on a process pool
+(see `WikiText`'s `num_workers`) -- optionally removing links or stripping
+all wikitext markup to plain text with `mwparserfromhell`, and writes one
+`(id, title, text)` row per page, in dump order, to
+`train-NNNNN-of-MMMMM.parquet` shards. See `WikiParquet` in
+rsrch_data/wiki.py for the loader: text passes (tokenization, dedup,
+stats, ...) then become columnar scans instead of a bz2 decompression and
+XML parse each time.
+
+Exporting is crash-resumable: rerunning with the same args continues after
+the last completed shard (see `write_sharded_parquet`'s `resume_key`),
+skipping the streams already exported without reading them.
+"""
+
+import os
+from collections.abc import Iterator
+from dataclasses import asdict
+from functools import partial
+from pathlib import Path
+
+import tyro
+from pydantic import BaseModel
+from tqdm.auto import tqdm
+
+from rsrch_data.utils.misc import parse_size
+from rsrch_data.utils.parquet_writer import write_sharded_parquet
+from rsrch_data.wiki import (
+    PARQUET_COMPRESSION,
+    PARQUET_INDEX,
+    PARQUET_SCHEMA,
+    TextSample,
+    WikiText,
+)
+
+
+class Args(BaseModel):
+    """CLI args for the WikiText-to-Parquet exporter."""
+
+    data_root: str
+    """Directory of the multistream dump (as downloaded by get_wiki.py)."""
+    lang: str
+    """Language of the dump (e.g. `en`)."""
+    version: str
+    """Version of the dump (YYYYMMDD format)."""
+    output_dir: str
+    """Output directory for the Parquet shards."""
+    remove_links: bool = False
+    """Remove wiki links, keeping piped links' display text."""
+    plain_text: bool = False
+    """Strip all wikitext markup with mwparserfromhell (much slower)."""
+    num_workers: int | None = None
+    """Decompress/parse processes (default: one per CPU)."""
+    row_group_size: int = 1000
+    """Rows per Parquet row group."""
+    max_shard_size: str = "1GiB"
+    """Size cap (actual on-disk bytes) per shard file before rolling over --
+    a soft cap, as in pack_in1k_to_parquet.py."""
+
+
+def _rows(ds: WikiText, start: int = 0) -> Iterator[TextSample]:
+    pbar = tqdm(
+        ds.iter_from(start),
+        desc="Exporting",
+        unit="page",
+        initial=start,
+        total=len(ds),
+    )
+    yield from pbar
+
+
+def main(args: Args) -> None:
+    """Export a Wikipedia dump's `WikiText` samples to Parquet shards."""
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    max_shard_bytes = int(parse_size(args.max_shard_size))
+
+    ds = WikiText(
+        args.data_root,
+        args.lang,
+        args.version,
+        remove_links=args.remove_links,
+        plain_text=args.plain_text,
+        num_workers=args.num_workers or os.cpu_count(),
+    )
+    resume_key = {
+        "data_root": str(Path(args.data_root).resolve()),
+        "lang": args.lang,
+        "version": args.version,
+        "num_rows": len(ds),
+        "remove_links": args.remove_links,
+        "plain_text": args.plain_text,
+        "row_group_size": args.row_group_size,
+        "max_shard_bytes": max_shard_bytes,
+        "index": asdict(PARQUET_INDEX),
+    }
+    write_sharded_parquet(
+        partial(_rows, ds),
+        output_dir,
+        "train",
+        PARQUET_SCHEMA,
+        PARQUET_COMPRESSION,
+        args.row_group_size,
+        max_shard_bytes,
+        index=PARQUET_INDEX,
+        resume_key=resume_key,
+    )
+
+
+if __name__ == "__main__":
+    main(tyro.cli(Args))
@@ -0,0 +1,207 @@
+"""Pack COCO images and annotations into pre-shuffled Parquet shards.
+
+Reads raw JPEG bytes directly (no decode/re-encode) from a COCO root (as
+produced by get_coco.py), together with either the instances or the panoptic
+annotations of each image, shuffles image order once with a fixed seed, and
+writes `{split}-NNNNN-of-MMMMM.parquet` shards -- see `COCOParquet` in
+rsrch_data/coco/parquet.py for the loader, and `INSTANCES_SCHEMA` /
+`PANOPTIC_SCHEMA` there for the row layout.
+
+Annotations are stored column-wise, one list entry per instance (or panoptic
+segment): boxes, category ids, crowd flags and areas, plus compressed RLE
+masks (polygons are rasterized here, once) or the panoptic PNG's bytes. They
+come from the split's columnar annotation index (see
+rsrch_data/coco/utils/index.py), which every writer process memory-maps
+rather than parsing the annotation JSON itself.
+
+As with pack_in1k_to_parquet.py, the one-time shuffle means rows are meant
+to be read back sequentially, and packing is crash-resumable: rerunning with
+the same args continues after the last completed shard.
+"""
+
+from collections.abc import Iterator
+from dataclasses import asdict
+from functools import partial
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+import tyro
+from pydantic import BaseModel
+from tqdm.auto import tqdm
+
+from rsrch_data.coco.parquet import (
+    INSTANCES_SCHEMA,
+    PANOPTIC_SCHEMA,
+    PARQUET_COMPRESSION,
+    PARQUET_INDEX,
+)
+from rsrch_data.coco.utils.index import (
+    InstancesIndex,
+    PanopticIndex,
+    load_instances_index,
+    load_panoptic_index,
+)
+from rsrch_data.utils.misc import parse_size
+from rsrch_data.utils.parquet_writer import (
+    write_sharded_parquet,
+    write_sharded_parquet_parallel,
+)
+
+
+class Args(BaseModel):
+    """CLI args for the COCO-to-Parquet packer."""
+
+    coco_root: str
+    """Source COCO root, containing `{split}2017/` and `annotations/`."""
+    output_dir: str
+    """Output directory for the packed Parquet shards."""
+    task: Literal["instances", "panoptic"] = "instances"
+    """Annotations to pack alongside the images."""
+    splits: list[Literal["train", "val"]] = ["train", "val"]
+    """Splits to pack."""
+    row_group_size: int = 500
+    """Rows per Parquet row group."""
+    max_shard_size: str = "2GiB"
+    """Size cap (actual on-disk bytes) per shard file before rolling over --
+    a soft cap, as in pack_in1k_to_parquet.py."""
+    seed: int = 0
+    """Seed for the one-time pre-shuffle."""
+    num_writers: int = 1
+    """Writer processes, each packing a contiguous slice of the shuffled order
+    into its own shards (see write_sharded_parquet_parallel) -- row order is
+    unchanged, but each writer's last shard may be partial."""
+
+
+def _instances_row(index: InstancesIndex, img_root: Path, i: int) -> dict:
+    anns = index.anns(i)
+    width, height = index.sizes[i].tolist()
+    return {
+        "image": (img_root / index.file_names[i]).read_bytes(),
+        "image_id": int(index.image_ids[i]),
+        "file_name": index.file_names[i],
+        "width": width,
+        "height": height,
+        # Position in the annotation file's image list -- sorting by this
+        # column reconstructs the original order.
+        "orig_index": i,
+        "boxes": index.bbox[anns].tolist(),
+        "labels": index.category[anns].tolist(),
+        "iscrowd": index.iscrowd[anns].tolist(),
+        "area": index.area[anns].tolist(),
+        "masks": [index.rle(ann)["counts"] for ann in range(anns.start, anns.stop)],
+    }
+
+
+def _panoptic_row(index: PanopticIndex, img_root: Path, ann_root: Path, i: int) -> dict:
+    segs = index.segments(i)
+    width, height = index.sizes[i].tolist()
+    return {
+        "image": (img_root / index.file_names[i]).read_bytes(),
+        "image_id": int(index.image_ids[i]),
+        "file_name": index.file_names[i],
+        "width": width,
+        "height": height,
+        "orig_index": i,
+        "boxes": index.segment_bbox[segs].tolist(),
+        "labels": index.segment_category[segs].tolist(),
+        "iscrowd": index.segment_iscrowd[segs].tolist(),
+        "area": index.segment_area[segs].tolist(),
+        "panoptic": (ann_root / index.ann_file_names[i]).read_bytes(),
+        "segment_ids": index.segment_ids[segs].tolist(),
+    }
+
+
+def _rows(
+    coco_root: Path,
+    split: str,
+    task: str,
+    order: np.ndarray,
+    start: int = 0,
+) -> Iterator[dict]:
+    img_root = coco_root / f"{split}2017"
+    if task == "panoptic":
+        index = load_panoptic_index(coco_root, split)
+        ann_root = coco_root / f"annotations/panoptic_{split}2017"
+        row = partial(_panoptic_row, index, img_root, ann_root)
+    else:
+        row = partial(_instances_row, load_instances_index(coco_root, split), img_root)
+
+    pbar = tqdm(
+        order[start:].tolist(),
+        desc=f"Packing {split}",
+        unit="img",
+        initial=start,
+        total=len(order),
+    )
+    for i in pbar:
+        yield row(i)
+
+
+def _pack_split(args: Args, split: str) -> None:
+    """Shuffle and write one split's samples as Parquet shards."""
+    coco_root = Path(args.coco_root).expanduser()
+    output_dir = Path(args.output_dir)
+    max_shard_bytes = int(parse_size(args.max_shard_size))
+
+    # Built (and cached) once here, so writer processes only memory-map it.
+    if args.task == "panoptic":
+        num_images = len(load_panoptic_index(coco_root, split))
+    else:
+        num_images = len(load_instances_index(coco_root, split))
+    if num_images == 0:
+        return
+
+    rng = np.random.default_rng(args.seed)
+    resume_key = {
+        "coco_root": str(coco_root),
+        "task": args.task,
+        "num_rows": num_images,
+        "rng_state": rng.bit_generator.state,
+        "num_writers": args.num_writers,
+        "row_group_size": args.row_group_size,
+        "max_shard_bytes": max_shard_bytes,
+        "index": asdict(PARQUET_INDEX),
+    }
+    order = rng.permutation(num_images)
+    sources = [
+        partial(_rows, coco_root, split, args.task, part)
+        for part in np.array_split(order, args.num_writers)
+    ]
+    schema = PANOPTIC_SCHEMA if args.task == "panoptic" else INSTANCES_SCHEMA
+
+    if args.num_writers > 1:
+        write_sharded_parquet_parallel(
+            sources,
+            output_dir,
+            split,
+            schema,
+            PARQUET_COMPRESSION,
+            args.row_group_size,
+            max_shard_bytes,
+            index=PARQUET_INDEX,
+            resume_key=resume_key,
+        )
+    else:
+        write_sharded_parquet(
+            sources[0],
+            output_dir,
+            split,
+            schema,
+            PARQUET_COMPRESSION,
+            args.row_group_size,
+            max_shard_bytes,
+            index=PARQUET_INDEX,
+            resume_key=resume_key,
+        )
+
+
+def main(args: Args) -> None:
+    """Pack COCO images and annotations into pre-shuffled Parquet shards."""
+    Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    for split in args.splits:
+        _pack_split(args, split)
+
+
+if __name__ == "__main__":
+    main(tyro.cli(Args))
@@ -8,21 +8,47 @@ shards -- see `ImageNetParquet` in rsrch_data/imagenet.py for the loader.
 The one-time shuffle means row groups are already a random mix of classes, so
 `ImageNetParquet` is meant to be read back sequentially (no per-epoch
 reshuffling needed).
+
+Packing is crash-resumable: completed shards are kept across a failure, and
+rerunning with the same args continues after the last one, producing the same
+bytes as an uninterrupted run (see `write_sharded_parquet`'s `resume_key`).
+
+By default JPEGs are read one at a time in shuffled order -- a random-read
+pattern that is very slow on spinning disks and network filesystems. With
+`--external-shuffle`, files are instead read in directory order by a pool of
+reader threads and scattered into temp bucket files keyed by their shuffled
+output position; each bucket is then sorted in memory and streamed to the
+writer (a two-pass external shuffle). Both modes write the same bytes.
 """
 
+import json
 import shutil
+from collections import defaultdict
 from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+from functools import partial
 from pathlib import Path
 from typing import Literal
 
 import numpy as np
+import pyarrow as pa
 import tyro
 from pydantic import BaseModel
 from tqdm.auto import tqdm
 
-from rsrch_data.imagenet import PARQUET_COMPRESSION, PARQUET_SCHEMA, ImageNet
+from rsrch_data.imagenet import (
+    PARQUET_COMPRESSION,
+    PARQUET_INDEX,
+    PARQUET_SCHEMA,
+    ImageNet,
+)
 from rsrch_data.utils.misc import parse_size
-from rsrch_data.utils.parquet_writer import write_sharded_parquet
+from rsrch_data.utils.parquet_writer import (
+    IndexOptions,
+    write_sharded_parquet,
+    write_sharded_parquet_parallel,
+)
 
 
 class Args(BaseModel):
@@ -40,24 +66,157 @@ class Args(BaseModel):
     worth of data (see write_sharded_parquet)."""
     seed: int = 0
     """Seed for the one-time pre-shuffle."""
+    num_writers: int = 1
+    """Writer processes, each packing a contiguous slice of the shuffled order
+    into its own shards (see write_sharded_parquet_parallel) -- row order is
+    unchanged, but each writer's last shard may be partial."""
+    bloom_filters: bool = False
+    """Also write Bloom filters for `image_id`, for point lookups (needs
+    pyarrow>=24; see PARQUET_INDEX)."""
+    external_shuffle: bool = False
+    """Read source files sequentially (in directory order, `num_threads` at a
+    time) and shuffle via temp bucket files under `output_dir`, instead of
+    reading them in shuffled order -- same output, much faster on storage
+    that is slow at random reads. Needs about one split's worth of extra disk
+    space while packing."""
+    shuffle_bucket_rows: int = 10000
+    """Rows per temp bucket with `external_shuffle` (each bucket is loaded
+    into memory whole when it is written out)."""
+    num_threads: int = 16
+    """Reader threads with `external_shuffle`."""
+
+
+_BUCKET_SCHEMA = PARQUET_SCHEMA.append(pa.field("position", pa.int64()))
+"""`PARQUET_SCHEMA` plus each row's position in the shuffled output order --
+the schema of `external_shuffle`'s temp bucket files."""
+
+_READ_CHUNK = 1024
+"""Files read per reader-pool round in `_scatter_to_buckets` (bounds how many
+images are held in memory at once)."""
+
+_BUCKET_FLUSH_ROWS = 16
+"""Rows buffered per bucket before appending them to its temp file."""
+
+
+def _row(ds: ImageNet, i: int, img_bytes: bytes) -> dict:
+    path = ds.paths[i]
+    wnid = ds.wnids[i]
+    return {
+        "image": img_bytes,
+        "label": ds.wnid_to_label[wnid],
+        "wnid": wnid,
+        "image_id": path,
+        # Position in `ds.paths` (== train_cls.txt/val.txt's row order,
+        # 0-indexed) -- lets the original file order be exactly
+        # reconstructed later via sort_by("orig_index").
+        "orig_index": int(i),
+    }
+
+
+def _rows(
+    ds: ImageNet, order: np.ndarray, split: str, start: int = 0
+) -> Iterable[dict]:
+    pbar = tqdm(
+        order[start:],
+        desc=f"Packing {split}",
+        unit="img",
+        initial=start,
+        total=len(order),
+    )
+    for i in pbar:
+        yield _row(ds, i, (ds.img_root / (ds.paths[i] + ".JPEG")).read_bytes())
+
+
+def _scatter_to_buckets(
+    ds: ImageNet,
+    position: np.ndarray,
+    bucket_rows: int,
+    bucket_dir: Path,
+    num_threads: int,
+    split: str,
+    key: dict,
+) -> None:
+    """External shuffle, pass 1: scatter samples into position buckets.
+
+    Reads every sample sequentially and appends it to the bucket file covering
+    its output position: bucket `b` (`bucket_dir/{b:05d}.arrow`, an Arrow IPC
+    stream) receives the rows with `position` in
+    `[b * bucket_rows, (b + 1) * bucket_rows)`. A `done.json` marker holding
+    `key` is written last, so a finished pass is reused by a rerun with the
+    same `key` and an interrupted one is redone.
+    """
+    marker = bucket_dir / "done.json"
+    if marker.exists() and json.loads(marker.read_text()) == key:
+        return
+    shutil.rmtree(bucket_dir, ignore_errors=True)
+    bucket_dir.mkdir(parents=True)
+
+    writers: dict[int, pa.RecordBatchStreamWriter] = {}
+    pending: defaultdict[int, list[dict]] = defaultdict(list)
+
+    def flush(bucket: int) -> None:
+        if bucket not in writers:
+            writers[bucket] = pa.ipc.new_stream(
+                str(bucket_dir / f"{bucket:05d}.arrow"), _BUCKET_SCHEMA
+            )
+        batch = pa.RecordBatch.from_pylist(pending.pop(bucket), _BUCKET_SCHEMA)
+        writers[bucket].write_batch(batch)
 
+    def read(i: int) -> bytes:
+        return (ds.img_root / (ds.paths[i] + ".JPEG")).read_bytes()
 
-def _rows(ds: ImageNet, order: np.ndarray, split: str) -> Iterable[dict]:
-    for i in tqdm(order, desc=f"Packing {split}", unit="img"):
-        path = ds.paths[i]
-        wnid = ds.wnids[i]
-        label = ds.wnid_to_label[wnid]
-        img_bytes = (ds.img_root / (path + ".JPEG")).read_bytes()
-        yield {
-            "image": img_bytes,
-            "label": label,
-            "wnid": wnid,
-            "image_id": path,
-            # Position in `ds.paths` (== train_cls.txt/val.txt's row order,
-            # 0-indexed) -- lets the original file order be exactly
-            # reconstructed later via sort_by("orig_index").
-            "orig_index": int(i),
-        }
+    # Directory order: `paths` are `{wnid}/{image}` (train) or flat (val),
+    # so sorting them walks each directory's files in name order.
+    read_order = sorted(range(len(ds)), key=ds.paths.__getitem__)
+    pbar = tqdm(total=len(ds), desc=f"Reading {split}", unit="img")
+    try:
+        with ThreadPoolExecutor(num_threads) as pool:
+            for lo in range(0, len(read_order), _READ_CHUNK):
+                chunk = read_order[lo : lo + _READ_CHUNK]
+                for i, img_bytes in zip(chunk, pool.map(read, chunk), strict=True):
+                    pos = int(position[i])
+                    bucket = pos // bucket_rows
+                    pending[bucket].append(_row(ds, i, img_bytes) | {"position": pos})
+                    if len(pending[bucket]) >= _BUCKET_FLUSH_ROWS:
+                        flush(bucket)
+                pbar.update(len(chunk))
+        for bucket in list(pending):
+            flush(bucket)
+    finally:
+        pbar.close()
+        for writer in writers.values():
+            writer.close()
+    marker.write_text(json.dumps(key))
+
+
+def _bucketed_rows(
+    bucket_dir: Path,
+    bucket_rows: int,
+    lo: int,
+    hi: int,
+    split: str,
+    start: int = 0,
+) -> Iterable[pa.Table]:
+    """External shuffle, pass 2: yield rows in output order from the buckets.
+
+    Yields output positions `[lo + start, hi)` one bucket-sized table at a
+    time (see `_scatter_to_buckets`).
+    """
+    pbar = tqdm(desc=f"Packing {split}", unit="img", initial=start, total=hi - lo)
+    pos = lo + start
+    while pos < hi:
+        bucket = pos // bucket_rows
+        bucket_lo = bucket * bucket_rows
+        end = min(hi, bucket_lo + bucket_rows)
+        with pa.memory_map(str(bucket_dir / f"{bucket:05d}.arrow")) as source:
+            table = pa.ipc.open_stream(source).read_all()
+        # Positions within a bucket are exactly bucket_lo, bucket_lo + 1, ...,
+        # so after sorting, row `k` holds position `bucket_lo + k`.
+        table = table.sort_by("position").drop_columns(["position"])
+        yield table.slice(pos - bucket_lo, end - pos)
+        pbar.update(end - pos)
+        pos = end
+    pbar.close()
 
 
 def _pack_split(
@@ -67,23 +226,86 @@ def _pack_split(
     row_group_size: int,
     max_shard_bytes: int,
     seed: int,
+    num_writers: int,
+    index: IndexOptions,
+    external_shuffle: bool,
+    shuffle_bucket_rows: int,
+    num_threads: int,
 ) -> None:
     """Shuffle and write one split's samples as Parquet shards."""
     ds = ImageNet(in1k_root, split=split)
     if len(ds) == 0:
         return
 
-    order = np.random.default_rng(seed).permutation(len(ds))
+    rng = np.random.default_rng(seed)
+    resume_key = {
+        "in1k_root": str(in1k_root),
+        "num_rows": len(ds),
+        "rng_state": rng.bit_generator.state,
+        "num_writers": num_writers,
+        "row_group_size": row_group_size,
+        "max_shard_bytes": max_shard_bytes,
+        "index": asdict(index),
+    }
+    order = rng.permutation(len(ds))
 
-    write_sharded_parquet(
-        _rows(ds, order, split),
-        output_dir,
-        split,
-        PARQUET_SCHEMA,
-        PARQUET_COMPRESSION,
-        row_group_size,
-        max_shard_bytes,
-    )
+    if external_shuffle:
+        bucket_dir = output_dir / f"_{split}_shuffle"
+        position = np.empty(len(ds), dtype=np.int64)
+        position[order] = np.arange(len(ds))
+        _scatter_to_buckets(
+            ds,
+            position,
+            shuffle_bucket_rows,
+            bucket_dir,
+            num_threads,
+            split,
+            {
+                "in1k_root": str(in1k_root),
+                "num_rows": len(ds),
+                "rng_state": resume_key["rng_state"],
+                "shuffle_bucket_rows": shuffle_bucket_rows,
+            },
+        )
+        # Same contiguous slices of the shuffled order as `_rows`' path.
+        bounds = np.cumsum([0] + [len(p) for p in np.array_split(order, num_writers)])
+        sources = [
+            partial(_bucketed_rows, bucket_dir, shuffle_bucket_rows, lo, hi, split)
+            for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist(), strict=True)
+        ]
+    else:
+        sources = [
+            partial(_rows, ds, part, split)
+            for part in np.array_split(order, num_writers)
+        ]
+
+    if num_writers > 1:
+        write_sharded_parquet_parallel(
+            sources,
+            output_dir,
+            split,
+            PARQUET_SCHEMA,
+            PARQUET_COMPRESSION,
+            row_group_size,
+            max_shard_bytes,
+            index=index,
+            resume_key=resume_key,
+        )
+    else:
+        write_sharded_parquet(
+            sources[0],
+            output_dir,
+            split,
+            PARQUET_SCHEMA,
+            PARQUET_COMPRESSION,
+            row_group_size,
+            max_shard_bytes,
+            index=index,
+            resume_key=resume_key,
+        )
+
+    if external_shuffle:
+        shutil.rmtree(bucket_dir)
 
 
 def main(args: Args) -> None:
@@ -93,6 +315,11 @@ def main(args: Args) -> None:
     output_dir.mkdir(parents=True, exist_ok=True)
 
     max_shard_bytes = int(parse_size(args.max_shard_size))
+    index = (
+        replace(PARQUET_INDEX, bloom_filters=("image_id",))
+        if args.bloom_filters
+        else PARQUET_INDEX
+    )
 
     for split in ("train", "val"):
         _pack_split(
@@ -102,6 +329,11 @@ def main(args: Args) -> None:
             args.row_group_size,
             max_shard_bytes,
             args.seed,
+            args.num_writers,
+            index,
+            args.external_shuffle,
+            args.shuffle_bucket_rows,
+            args.num_threads,
         )
 
     shutil.copy(
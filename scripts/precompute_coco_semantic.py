@@ -0,0 +1,83 @@
+"""Precompute COCO semantic label maps from the panoptic annotations.
+
+Writes every image's uint8 category map (see `COCOSemantic.labels`) as
+`annotations/semantic_{split}2017/{image stem}.png`, decoding the panoptic
+PNGs (or the id cache written by convert_coco_panoptic_ids.py) in a process
+pool. `COCOSemantic` then just opens the PNGs. A `_done.json` marker keyed on
+the panoptic annotation file is written last, so partial or stale label maps
+are never used.
+"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Literal
+
+import tyro
+from PIL import Image
+from pydantic import BaseModel
+from tqdm.auto import tqdm
+
+from rsrch_data.coco.semantic import COCOSemantic, label_paths, labels_key
+from rsrch_data.coco.utils.index import load_panoptic_index
+
+
+class Args(BaseModel):
+    """CLI args for the COCO semantic label precomputation."""
+
+    root: str
+    """COCO root, containing `annotations/`."""
+    splits: list[Literal["train", "val"]] = ["train", "val"]
+    """Splits to precompute."""
+    num_workers: int | None = None
+    """Worker processes (default: one per CPU)."""
+    chunk_size: int = 64
+    """Images per work item sent to the pool."""
+
+
+def _precompute_chunk(root: Path, split: str, lo: int, hi: int) -> int:
+    ds = COCOSemantic(root, split, precomputed=False)
+    label_dir, _ = label_paths(root, split)
+    file_names = load_panoptic_index(root, split).file_names
+    for i in range(lo, hi):
+        path = label_dir / f"{Path(file_names[i]).stem}.png"
+        Image.fromarray(ds.labels(i)).save(path)
+    return hi - lo
+
+
+def _precompute_split(args: Args, split: str) -> None:
+    root = Path(args.root).expanduser()
+    label_dir, marker = label_paths(root, split)
+    label_dir.mkdir(parents=True, exist_ok=True)
+    marker.unlink(missing_ok=True)
+
+    num_images = len(COCOSemantic(root, split, precomputed=False))
+    with (
+        ProcessPoolExecutor(args.num_workers) as pool,
+        tqdm(total=num_images, desc=f"Precomputing {split}", unit="img") as pbar,
+    ):
+        futures = [
+            pool.submit(
+                _precompute_chunk,
+                root,
+                split,
+                lo,
+                min(lo + args.chunk_size, num_images),
+            )
+            for lo in range(0, num_images, args.chunk_size)
+        ]
+        for future in futures:
+            pbar.update(future.result())
+
+    with marker.open("w") as f:
+        json.dump(labels_key(root, split), f, indent=2)
+
+
+def main(args: Args) -> None:
+    """Precompute COCO semantic label maps from the panoptic annotations."""
+    for split in args.splits:
+        _precompute_split(args, split)
+
+
+if __name__ == "__main__":
+    main(tyro.cli(Args))
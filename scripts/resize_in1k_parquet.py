@@ -8,28 +8,57 @@ on the smaller side against a 224px crop), so most of that resolution is
 decoded at training time only to be immediately thrown away by the resize --
 shrinking it here once cuts both on-disk size and per-epoch decode cost.
 Images already at or below `smallest_size` are left unresized (upscaling
-would add no information).
+would add no information). Larger JPEGs are decoded straight at a reduced DCT
+scale (`Image.draft`) -- the smallest of 1/2, 1/4, 1/8 that still leaves the
+smaller side at or above `smallest_size` -- so most of the full-size decode is
+skipped, not just thrown away by the resize.
 
 Row-group boundaries and row order are preserved as-is from the source
 (already pre-shuffled by pack_in1k_to_parquet.py); only the `image` column
 changes.
+
+Several `smallest_size`s can be given to build a resolution pyramid in one
+pass: each image is decoded once and every size is resized from the next
+larger one, each size going to its own `{output_dir}/{size}px/` shard set.
+All shard sets share the source's row order, so `orig_index` lines up
+across them.
+
+Like pack_in1k_to_parquet.py, a crashed run resumes after its last completed
+shard when rerun with the same args.
 """
 
+import contextlib
 import io
+import os
+import queue
 import shutil
-from collections.abc import Iterable
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, replace
+from functools import partial
+from itertools import pairwise
+from multiprocessing.shared_memory import SharedMemory
 from pathlib import Path
+from typing import Literal
 
+import numpy as np
+import pyarrow as pa
 import pyarrow.parquet as pq
 import tyro
 from PIL import Image
 from pydantic import BaseModel
 from tqdm.auto import tqdm
 
-from rsrch_data.imagenet import PARQUET_COMPRESSION, PARQUET_SCHEMA
+from rsrch_data.imagenet import PARQUET_COMPRESSION, PARQUET_INDEX, PARQUET_SCHEMA
 from rsrch_data.utils.misc import parse_size
-from rsrch_data.utils.parquet_writer import write_sharded_parquet
+from rsrch_data.utils.parquet_writer import (
+    IndexOptions,
+    shards_complete,
+    write_sharded_parquet,
+    write_sharded_parquet_parallel,
+)
 
 
 class Args(BaseModel):
@@ -39,8 +68,10 @@ class Args(BaseModel):
     """Root of a Parquet-packed ImageNet dataset (see pack_in1k_to_parquet.py)."""
     output_dir: str
     """Output directory for the resized Parquet shards."""
-    smallest_size: int = 224
-    """Target size for each image's smaller dimension."""
+    smallest_size: list[int] = [224]
+    """Target size for each image's smaller dimension. With several sizes,
+    each is written to its own `{output_dir}/{size}px/` dataset (see module
+    docstring)."""
     jpeg_quality: int = 90
     row_group_size: int = 2000
     """Rows per Parquet row group."""
@@ -53,76 +84,462 @@ class Args(BaseModel):
     docstring for why this shouldn't just be "every physical core": PIL's
     JPEG codec releases the GIL, but past a handful of threads, contention
     outweighs the added parallelism for this kind of work."""
+    backend: Literal["thread", "process"] = "thread"
+    """Where images are resized: a `num_threads` thread pool, or a
+    `num_processes` process pool, which sidesteps the GIL and scales to every
+    core (row groups are handed to it through shared memory)."""
+    num_processes: int | None = None
+    """Resize processes with `backend="process"`, per writer (default: the CPU
+    count split evenly across `num_writers`)."""
+    draft: bool = True
+    """Decode JPEGs at a reduced DCT scale where possible (see module
+    docstring); disable for a full-resolution decode before every resize."""
+    num_writers: int = 1
+    """Writer processes, each resizing a contiguous run of source shards (with
+    its own resize pool) into its own output shards -- see
+    write_sharded_parquet_parallel. Row order is unchanged, but each
+    writer's last shard may be partial. Only supported with a single
+    `smallest_size` -- use `backend="process"` to parallelize a pyramid."""
+    bloom_filters: bool = False
+    """Also write Bloom filters for `image_id`, for point lookups (needs
+    pyarrow>=24; see PARQUET_INDEX)."""
 
 
-def _resize_image(img_bytes: bytes, smallest_size: int, quality: int) -> bytes:
-    image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-    min_dim = min(image.width, image.height)
-    if min_dim > smallest_size:
-        if image.width > image.height:
-            new_w = round(image.width / image.height * smallest_size)
-            new_h = smallest_size
-        else:
-            new_h = round(image.height / image.width * smallest_size)
-            new_w = smallest_size
-        image = image.resize((new_w, new_h), Image.Resampling.LANCZOS)
-    out = io.BytesIO()
-    image.save(out, format="JPEG", quality=quality, subsampling=0)
-    return out.getvalue()
+def _resize_image(
+    img_bytes: bytes, sizes: Sequence[int], quality: int, draft: bool = True
+) -> list[bytes]:
+    """Re-encode one image at each of `sizes` (descending), decoding it once.
 
+    Each size is resized from the previous (larger) one, not the original.
+    """
+    image = Image.open(io.BytesIO(img_bytes))
+    if draft:
+        # Picks the largest DCT scale-down keeping both sides >= the
+        # requested size; a no-op for non-JPEGs and small images.
+        image.draft(None, (sizes[0], sizes[0]))
+    image = image.convert("RGB")
+    encoded = []
+    for smallest_size in sizes:
+        min_dim = min(image.width, image.height)
+        if min_dim > smallest_size:
+            if image.width > image.height:
+                new_w = round(image.width / image.height * smallest_size)
+                new_h = smallest_size
+            else:
+                new_h = round(image.height / image.width * smallest_size)
+                new_w = smallest_size
+            image = image.resize((new_w, new_h), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, format="JPEG", quality=quality, subsampling=0)
+        encoded.append(out.getvalue())
+    return encoded
 
-def _resized_rows(
+
+def _resize_shared(
+    shm_name: str,
+    offsets: np.ndarray,
+    sizes: Sequence[int],
+    quality: int,
+    draft: bool,
+) -> list[list[bytes]]:
+    """Resize the images at `offsets` in shared-memory block `shm_name`.
+
+    Process-pool worker: the images are read out of the block (written by
+    `_share_images`) rather than pickled over to this process.
+    """
+    shm = SharedMemory(shm_name)
+    try:
+        return [
+            _resize_image(bytes(shm.buf[lo:hi]), sizes, quality, draft)
+            for lo, hi in zip(offsets[:-1].tolist(), offsets[1:].tolist(), strict=True)
+        ]
+    finally:
+        shm.close()
+
+
+def _share_images(images: pa.ChunkedArray) -> tuple[SharedMemory, np.ndarray]:
+    """Copy an `image` column's bytes into a new shared-memory block.
+
+    Returns the block and the `len(images) + 1` offsets of each image in it.
+    """
+    images = images.combine_chunks()
+    _, offsets_buf, data_buf = images.buffers()
+    offsets = np.frombuffer(offsets_buf, dtype=np.int32)
+    offsets = offsets[images.offset : images.offset + len(images) + 1].astype(np.int64)
+    data = np.frombuffer(data_buf, dtype=np.uint8)[offsets[0] : offsets[-1]]
+    offsets -= offsets[0]
+    shm = SharedMemory(create=True, size=max(len(data), 1))
+    shm.buf[: len(data)] = data
+    return shm, offsets
+
+
+def _resize_in_processes(
+    tables: Iterator[pa.Table],
+    pool: ProcessPoolExecutor,
+    num_chunks: int,
+    sizes: Sequence[int],
+    quality: int,
+    draft: bool,
+) -> Iterator[tuple[pa.Table, list[list[bytes]]]]:
+    """Yield each table with its resized images, in order, resized in `pool`.
+
+    Each table's images are split into `num_chunks` tasks, and the next
+    table is submitted before the current one is waited on, so workers don't
+    idle at row-group boundaries.
+    """
+    in_flight: deque[tuple[pa.Table, SharedMemory, list[Future]]] = deque()
+
+    def collect() -> tuple[pa.Table, list[list[bytes]]]:
+        table, shm, futures = in_flight.popleft()
+        try:
+            return table, [img for future in futures for img in future.result()]
+        finally:
+            shm.close()
+            shm.unlink()
+
+    try:
+        for table in tables:
+            shm, offsets = _share_images(table.column("image"))
+            bounds = np.linspace(0, table.num_rows, num_chunks + 1).astype(int)
+            futures = [
+                pool.submit(
+                    _resize_shared,
+                    shm.name,
+                    offsets[lo : hi + 1],
+                    sizes,
+                    quality,
+                    draft,
+                )
+                for lo, hi in pairwise(bounds)
+                if hi > lo
+            ]
+            in_flight.append((table, shm, futures))
+            if len(in_flight) > 1:
+                yield collect()
+        while in_flight:
+            yield collect()
+    finally:
+        while in_flight:
+            _, shm, futures = in_flight.popleft()
+            for future in futures:
+                future.cancel()
+            # Running workers only hold a mapping, not the name -- unlinking
+            # under them is safe.
+            shm.close()
+            shm.unlink()
+
+
+def _source_row_groups(files: list[Path], start: int, pbar: tqdm) -> Iterator[pa.Table]:
+    """Yield `files`' row groups, minus the first `start` rows.
+
+    Skipped row groups are counted off via footer row counts, without being
+    read.
+    """
+    for file in files:
+        pf = pq.ParquetFile(file)
+        for row_group in range(pf.num_row_groups):
+            num_rows = pf.metadata.row_group(row_group).num_rows
+            if start >= num_rows:
+                start -= num_rows
+                pbar.update(num_rows)
+                continue
+            table = pf.read_row_group(row_group).slice(start)
+            pbar.update(start)
+            start = 0
+            yield table
+
+
+def _resized_pyramid(
     files: list[Path],
-    smallest_size: int,
+    sizes: Sequence[int],
     quality: int,
-    num_threads: int,
+    draft: bool,
+    backend: Literal["thread", "process"],
+    num_workers: int,
     split: str,
-) -> Iterable[dict]:
-    """Yield rows with `image` re-encoded at (at most) `smallest_size`."""
+    start: int = 0,
+) -> Iterator[list[pa.Table]]:
+    """Yield each row group re-encoded at every one of `sizes` (descending).
+
+    Each item holds one table per size, all with the same rows. Only the
+    `image` column goes through Python objects; every other column is passed
+    through as-is, as Arrow data. The first `start` rows are skipped via
+    footer row counts, without being read.
+    """
     total = sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+    executor = ThreadPoolExecutor if backend == "thread" else ProcessPoolExecutor
     with (
-        ThreadPoolExecutor(num_threads) as pool,
+        executor(num_workers) as pool,
         tqdm(total=total, desc=f"Resizing {split}", unit="img") as pbar,
     ):
-        for file in files:
-            pf = pq.ParquetFile(file)
-            for batch in pf.iter_batches():
-                rows = batch.to_pylist()
-                resized = pool.map(
-                    lambda r: _resize_image(r["image"], smallest_size, quality),
-                    rows,
+        tables = _source_row_groups(files, start, pbar)
+        if backend == "thread":
+            resize = partial(_resize_image, sizes=sizes, quality=quality, draft=draft)
+            batches = (
+                (table, list(pool.map(resize, table.column("image").to_pylist())))
+                for table in tables
+            )
+        else:
+            batches = _resize_in_processes(
+                tables, pool, num_workers, sizes, quality, draft
+            )
+
+        for table, images in batches:
+            image_idx = table.schema.get_field_index("image")
+            pbar.update(table.num_rows)
+            yield [
+                table.set_column(
+                    image_idx,
+                    "image",
+                    pa.array([encoded[k] for encoded in images], pa.binary()),
                 )
-                for row, new_image in zip(rows, resized, strict=True):
-                    row["image"] = new_image
-                    pbar.update(1)
-                    yield row
+                for k in range(len(sizes))
+            ]
+
+
+def _resized_rows(
+    files: list[Path],
+    smallest_size: int,
+    quality: int,
+    draft: bool,
+    backend: Literal["thread", "process"],
+    num_workers: int,
+    split: str,
+    start: int = 0,
+) -> Iterable[pa.Table]:
+    """Yield row groups with `image` re-encoded at (at most) `smallest_size`.
+
+    See `_resized_pyramid`.
+    """
+    for (table,) in _resized_pyramid(
+        files, (smallest_size,), quality, draft, backend, num_workers, split, start
+    ):
+        yield table
+
+
+def _write_pyramid(  # noqa: C901, PLR0915
+    files: list[Path],
+    sizes: Sequence[int],
+    output_dirs: dict[int, Path],
+    quality: int,
+    draft: bool,
+    backend: Literal["thread", "process"],
+    num_workers: int,
+    split: str,
+    row_group_size: int,
+    max_shard_bytes: int,
+    index: IndexOptions,
+    resume_key: dict,
+) -> None:
+    """Resize `files` once into all of `sizes`, writing each size's shards.
+
+    Every size in `output_dirs` gets its own `write_sharded_parquet` call, on
+    a thread fed through a small bounded queue. Each writer may resume from
+    a different row (it has its own journal), so resizing starts at the
+    earliest of them, and each writer is only sent the rows it is missing.
+    A failure in any writer (or in resizing) stops all of them, each keeping
+    its completed shards for a rerun. A writer resuming only its finalize
+    step never asks for rows, and is sent none.
+    """
+    queues = {size: queue.Queue(maxsize=2) for size in output_dirs}
+    starts: dict[int, int] = {}
+    failed: dict[int, BaseException] = {}
+    started = threading.Barrier(len(output_dirs) + 1)
+    done = object()
+
+    def rows(size: int, start: int) -> Iterator[pa.Table]:
+        starts[size] = start
+        started.wait()
+        while (item := queues[size].get()) is not done:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def write(size: int) -> None:
+        try:
+            write_sharded_parquet(
+                partial(rows, size),
+                output_dirs[size],
+                split,
+                PARQUET_SCHEMA,
+                PARQUET_COMPRESSION,
+                row_group_size,
+                max_shard_bytes,
+                index=index,
+                resume_key=resume_key | {"smallest_size": size},
+            )
+        except BaseException as e:
+            failed.setdefault(size, e)
+            started.abort()
+            raise
+        finally:
+            if size not in starts:
+                # `rows` was never called (only finalizing was left to do),
+                # so arrive at the barrier on its behalf.
+                with contextlib.suppress(threading.BrokenBarrierError):
+                    started.wait()
+
+    def put(size: int, item: object) -> None:
+        # A failed writer stops reading its queue -- don't block on it.
+        while size not in failed:
+            try:
+                queues[size].put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return
+
+    def feed() -> object:
+        """Send each writer its rows; return the item ending their queues."""
+        pos = min(starts.values())
+        try:
+            for tables in _resized_pyramid(
+                files, sizes, quality, draft, backend, num_workers, split, pos
+            ):
+                if failed:
+                    msg = "Another resolution's writer failed"
+                    return RuntimeError(msg)
+                for size, table in zip(sizes, tables, strict=True):
+                    skip = min(max(starts.get(size, 0) - pos, 0), table.num_rows)
+                    if size in starts and skip < table.num_rows:
+                        put(size, table.slice(skip))
+                pos += tables[0].num_rows
+        except Exception as e:  # noqa: BLE001 -- re-raised by each writer
+            return e
+        return done
+
+    with ThreadPoolExecutor(len(output_dirs)) as pool:
+        for size in output_dirs:
+            pool.submit(write, size)
+        try:
+            started.wait()
+        except threading.BrokenBarrierError:
+            pass
+        else:
+            if starts:
+                last = feed()
+                for size in starts:
+                    put(size, last)
+
+    if failed:
+        raise next(iter(failed.values()))
 
 
 def _resize_split(
     in1k_root: Path,
     output_dir: Path,
     split: str,
-    smallest_size: int,
+    sizes: Sequence[int],
     quality: int,
     row_group_size: int,
     max_shard_bytes: int,
-    num_threads: int,
+    draft: bool,
+    backend: Literal["thread", "process"],
+    num_workers: int,
+    num_writers: int,
+    index: IndexOptions,
 ) -> None:
-    """Resize and re-write one split's shards into `output_dir`."""
-    if sorted(output_dir.glob(f"{split}-*.parquet")):
-        return
+    """Resize and re-write one split's shards into `output_dir`.
+
+    With several `sizes` (descending), each goes to `output_dir/{size}px/`.
+    """
     files = sorted(in1k_root.glob(f"{split}-*.parquet"))
     if not files:
         return
+    if len(sizes) > 1:
+        output_dirs = {
+            size: output_dir / f"{size}px"
+            for size in sizes
+            if not shards_complete(output_dir / f"{size}px", split)
+        }
+        if not output_dirs:
+            return
+        _write_pyramid(
+            files,
+            sizes,
+            output_dirs,
+            quality,
+            draft,
+            backend,
+            num_workers,
+            split,
+            row_group_size,
+            max_shard_bytes,
+            index,
+            {
+                "in1k_root": str(in1k_root),
+                "files": [f.name for f in files],
+                # Smaller sizes are resized from larger ones, so every size's
+                # bytes depend on the whole list.
+                "sizes": list(sizes),
+                "quality": quality,
+                "draft": draft,
+                "row_group_size": row_group_size,
+                "max_shard_bytes": max_shard_bytes,
+                "index": asdict(index),
+            },
+        )
+        return
+
+    if shards_complete(output_dir, split):
+        return
+    (smallest_size,) = sizes
+    resume_key = {
+        "in1k_root": str(in1k_root),
+        "files": [f.name for f in files],
+        "smallest_size": smallest_size,
+        "quality": quality,
+        "draft": draft,
+        "num_writers": num_writers,
+        "row_group_size": row_group_size,
+        "max_shard_bytes": max_shard_bytes,
+        "index": asdict(index),
+    }
+    if num_writers > 1:
+        write_sharded_parquet_parallel(
+            [
+                partial(
+                    _resized_rows,
+                    list(part),
+                    smallest_size,
+                    quality,
+                    draft,
+                    backend,
+                    num_workers,
+                    split,
+                )
+                for part in np.array_split(np.array(files), num_writers)
+                if len(part) > 0
+            ],
+            output_dir,
+            split,
+            PARQUET_SCHEMA,
+            PARQUET_COMPRESSION,
+            row_group_size,
+            max_shard_bytes,
+            index=index,
+            resume_key=resume_key,
+        )
+        return
 
     write_sharded_parquet(
-        _resized_rows(files, smallest_size, quality, num_threads, split),
+        partial(
+            _resized_rows,
+            files,
+            smallest_size,
+            quality,
+            draft,
+            backend,
+            num_workers,
+            split,
+        ),
         output_dir,
         split,
         PARQUET_SCHEMA,
         PARQUET_COMPRESSION,
         row_group_size,
         max_shard_bytes,
+        index=index,
+        resume_key=resume_key,
     )
 
 
@@ -130,25 +547,52 @@ def main(args: Args) -> None:
     """Resize a Parquet-packed ImageNet dataset's images to `smallest_size`."""
     in1k_root = Path(args.in1k_root)
     output_dir = Path(args.output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
+    sizes = sorted(set(args.smallest_size), reverse=True)
+    if not sizes:
+        msg = "At least one smallest_size is required"
+        raise ValueError(msg)
+    if len(sizes) > 1 and args.num_writers > 1:
+        msg = "num_writers > 1 is only supported with a single smallest_size"
+        raise ValueError(msg)
+    dataset_dirs = (
+        [output_dir / f"{size}px" for size in sizes] if len(sizes) > 1 else [output_dir]
+    )
+    for dataset_dir in dataset_dirs:
+        dataset_dir.mkdir(parents=True, exist_ok=True)
 
     max_shard_bytes = int(parse_size(args.max_shard_size))
+    index = (
+        replace(PARQUET_INDEX, bloom_filters=("image_id",))
+        if args.bloom_filters
+        else PARQUET_INDEX
+    )
+    if args.backend == "thread":
+        num_workers = args.num_threads
+    elif args.num_processes is not None:
+        num_workers = args.num_processes
+    else:
+        num_workers = max(1, (os.cpu_count() or 1) // args.num_writers)
 
     for split in ("train", "val"):
         _resize_split(
             in1k_root,
             output_dir,
             split,
-            args.smallest_size,
+            sizes,
             args.jpeg_quality,
             args.row_group_size,
             max_shard_bytes,
-            args.num_threads,
+            args.draft,
+            args.backend,
+            num_workers,
+            args.num_writers,
+            index,
         )
 
     synset_src = in1k_root / "LOC_synset_mapping.txt"
     if synset_src.exists():
-        shutil.copy(synset_src, output_dir / "LOC_synset_mapping.txt")
+        for dataset_dir in dataset_dirs:
+            shutil.copy(synset_src, dataset_dir / "LOC_synset_mapping.txt")
 
 
 if __name__ == "__main__":
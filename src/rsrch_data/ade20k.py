@@ -4,12 +4,14 @@ from collections.abc import Sequence
 from pathlib import Path
 from typing import Literal, TypedDict
 
+import numpy as np
 from PIL import Image
 from ruamel.yaml import YAML
 from typing_extensions import NotRequired
 
 from rsrch_data.registry import register_dataset
 from rsrch_data.types.sem_seg import Metadata
+from rsrch_data.utils.image_sizes import cached_image_sizes
 
 
 class Sample(TypedDict):
@@ -65,6 +67,19 @@ class ADE20k(Sequence):
             return {"image": image, "labels": labels}
         return {"image": image}
 
+    def image_sizes(self, num_threads: int = 32) -> np.ndarray:
+        """Return every image's `(width, height)`, as an `(N, 2)` int32 array.
+
+        Read from the image file headers (no decoding) on first call, then
+        cached as `<data_root>/_{split}_image_sizes.npy` -- see `cached_image_sizes`.
+        """
+        return cached_image_sizes(
+            self._img_dir,
+            self._fnames,
+            self.data_root / f"_{self.split}_image_sizes.npy",
+            num_threads,
+        )
+
     @staticmethod
     def meta() -> Metadata:
         """Return semantic segmentation metadata loaded from the bundled YAML."""
@@ -16,6 +16,7 @@ import pandas as pd
 from PIL import Image
 
 from rsrch_data.registry import register_dataset
+from rsrch_data.utils.image_sizes import cached_image_sizes
 
 
 class Sample(TypedDict):
@@ -47,6 +48,8 @@ class CelebA(Sequence):
     ):
         """Index CelebA file IDs/attributes for `split` from `data_root`."""
         data_root = Path(data_root)
+        self.root = data_root
+        self.split = split
         self.img_dir = data_root / "img_align_celeba" / "img_align_celeba"
 
         partition = pd.read_csv(
@@ -74,3 +77,16 @@ class CelebA(Sequence):
         values = self.attrs[index].astype(bool).tolist()
         attrs = dict(zip(self.attr_names, values, strict=True))
         return {"image": image, "attrs": attrs}
+
+    def image_sizes(self, num_threads: int = 32) -> np.ndarray:
+        """Return every image's `(width, height)`, as an `(N, 2)` int32 array.
+
+        Read from the image file headers (no decoding) on first call, then
+        cached as `<data_root>/_{split}_image_sizes.npy` -- see `cached_image_sizes`.
+        """
+        return cached_image_sizes(
+            self.img_dir,
+            self.file_ids,
+            self.root / f"_{self.split}_image_sizes.npy",
+            num_threads,
+        )
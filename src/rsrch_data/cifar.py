@@ -3,6 +3,7 @@
 import hashlib
 import pickle
 from collections.abc import Sequence
+from functools import partial
 from pathlib import Path
 from typing import Literal
 
@@ -11,7 +12,8 @@ from PIL import Image
 from ruamel.yaml import YAML
 
 from rsrch_data.registry import register_dataset
-from rsrch_data.types.image_cls import Metadata, Sample
+from rsrch_data.types.image_cls import ArrayBatch, ArraySample, Metadata, Sample
+from rsrch_data.utils.npy_cache import cached_npy_arrays
 
 CIFAR10_CHECKSUMS = {
     "data_batch_1": "f962466ef690d46b226450fb9aadc74ba4bc64a76aa526b5827fe4bc5c7125cb",
@@ -32,7 +34,8 @@ class CIFAR10(Sequence):
     <data_root>/
     └── cifar-10-batches-py/
         ├── data_batch_{1..5} # Train set
-        └── test_batch        # Test set
+        ├── test_batch        # Test set
+        └── _{split}_npy/     # Verified `.npy` conversion, made on first load
     ```
     """
 
@@ -40,15 +43,41 @@ class CIFAR10(Sequence):
         self,
         data_root: str | Path,
         split: Literal["train", "test"] = "train",
+        *,
+        as_array: bool = False,
+        cache: bool = True,
     ):
-        """Load CIFAR-10 `split` batches from `data_root`, verifying checksums."""
+        """Load CIFAR-10 `split` batches from `data_root`, verifying checksums.
+
+        :param as_array: Return each sample's image as a `(32, 32, 3)` uint8 array
+            view instead of a PIL image (see also `gather`).
+        :param cache: Verify and convert the batches only once, then
+            memory-map the converted arrays from `_{split}_npy/` (see
+            `cached_npy_arrays`).
+        """
         self.data_root = Path(data_root)
+        self.as_array = as_array
 
         batches = {
             "train": [f"data_batch_{idx}" for idx in range(1, 6)],
             "test": ["test_batch"],
         }[split]
 
+        batch_dir = self.data_root / "cifar-10-batches-py"
+        convert = partial(self._convert, batches)
+        arrays = (
+            cached_npy_arrays(
+                batch_dir / f"_{split}_npy",
+                [batch_dir / fname for fname in batches],
+                convert,
+            )
+            if cache
+            else convert()
+        )
+        self.images = arrays["images"]
+        self.labels = arrays["labels"]
+
+    def _convert(self, batches: list[str]) -> dict[str, np.ndarray]:
         images, labels = [], []
         for fname in batches:
             batch = self._safe_load(fname)
@@ -57,8 +86,10 @@ class CIFAR10(Sequence):
 
         images = np.concatenate(images)
         images = images.reshape(-1, 3, 32, 32)
-        self.images = np.moveaxis(images, 1, -1)
-        self.labels = np.array(labels, dtype=np.int32)
+        return {
+            "images": np.moveaxis(images, 1, -1),
+            "labels": np.array(labels, dtype=np.int32),
+        }
 
     def _safe_load(self, name: str):
         with (self.data_root / "cifar-10-batches-py" / name).open("rb") as f:
@@ -73,11 +104,38 @@ class CIFAR10(Sequence):
     def __len__(self):
         return len(self.labels)
 
-    def __getitem__(self, index: int) -> Sample:
+    def __getitem__(self, index: int) -> Sample | ArraySample:
+        if self.as_array:
+            return {"image": self.images[index], "label": int(self.labels[index])}
         image = Image.fromarray(self.images[index])
         label = self.labels[index]
         return {"image": image, "label": label}
 
+    def gather(self, indices: Sequence[int] | np.ndarray) -> ArrayBatch:
+        """Return the samples at `indices` as stacked arrays (in either mode).
+
+        :param indices: Sample indices, in batch order.
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        return {"image": self.images[indices], "label": self.labels[indices]}
+
+    def __getitems__(
+        self, indices: Sequence[int] | np.ndarray
+    ) -> ArrayBatch | list[Sample]:
+        """Return the samples at `indices`: `gather`'s batch if `as_array`.
+
+        PyTorch's map-style `DataLoader` calls this, when defined, instead of
+        `__getitem__` per index, and passes the result to `collate_fn`.
+        Without `as_array`, it's a list of samples (PIL images), as
+        `default_collate` expects; with it, an already-stacked batch, so pass
+        e.g. `collate_fn=torch.utils.data.default_convert`.
+
+        :param indices: Sample indices, in batch order.
+        """
+        if not self.as_array:
+            return [self[int(index)] for index in indices]
+        return self.gather(indices)
+
     @staticmethod
     def meta() -> Metadata:
         """Return class metadata loaded from the bundled YAML."""
@@ -102,7 +160,8 @@ class CIFAR100(Sequence):
     <data_root>/
     └── cifar-100-python/
         ├── train          # Train set
-        └── test           # Test set
+        ├── test           # Test set
+        └── _{split}_npy/  # Verified `.npy` conversion, made on first load
     ```
     """
 
@@ -110,16 +169,39 @@ class CIFAR100(Sequence):
         self,
         data_root: str | Path,
         split: Literal["train", "test"] = "train",
+        *,
+        as_array: bool = False,
+        cache: bool = True,
     ):
-        """Load the CIFAR-100 `split` batch from `data_root`, verifying its checksum."""
+        """Load the CIFAR-100 `split` batch from `data_root`, verifying its checksum.
+
+        :param as_array: Return each sample's image as a `(32, 32, 3)` uint8 array
+            view instead of a PIL image (see also `gather`).
+        :param cache: Verify and convert the batch only once, then memory-map
+            the converted arrays from `_{split}_npy/` (see `cached_npy_arrays`).
+        """
         self.data_root = Path(data_root)
+        self.as_array = as_array
+
+        batch_dir = self.data_root / "cifar-100-python"
+        convert = partial(self._convert, split)
+        arrays = (
+            cached_npy_arrays(batch_dir / f"_{split}_npy", [batch_dir / split], convert)
+            if cache
+            else convert()
+        )
+        self.images = arrays["images"]
+        self.labels = arrays["labels"]
 
+    def _convert(self, split: str) -> dict[str, np.ndarray]:
         data = self._safe_load(split)
         images, labels = data[b"data"], data[b"fine_labels"]
 
         images = images.reshape(-1, 3, 32, 32)
-        self.images = np.moveaxis(images, 1, -1)
-        self.labels = np.array(labels, dtype=np.int32)
+        return {
+            "images": np.moveaxis(images, 1, -1),
+            "labels": np.array(labels, dtype=np.int32),
+        }
 
     def _safe_load(self, name: str):
         with (self.data_root / "cifar-100-python" / name).open("rb") as f:
@@ -134,11 +216,38 @@ class CIFAR100(Sequence):
     def __len__(self):
         return len(self.labels)
 
-    def __getitem__(self, index: int) -> Sample:
+    def __getitem__(self, index: int) -> Sample | ArraySample:
+        if self.as_array:
+            return {"image": self.images[index], "label": int(self.labels[index])}
         image = Image.fromarray(self.images[index])
         label = self.labels[index]
         return {"image": image, "label": label}
 
+    def gather(self, indices: Sequence[int] | np.ndarray) -> ArrayBatch:
+        """Return the samples at `indices` as stacked arrays (in either mode).
+
+        :param indices: Sample indices, in batch order.
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        return {"image": self.images[indices], "label": self.labels[indices]}
+
+    def __getitems__(
+        self, indices: Sequence[int] | np.ndarray
+    ) -> ArrayBatch | list[Sample]:
+        """Return the samples at `indices`: `gather`'s batch if `as_array`.
+
+        PyTorch's map-style `DataLoader` calls this, when defined, instead of
+        `__getitem__` per index, and passes the result to `collate_fn`.
+        Without `as_array`, it's a list of samples (PIL images), as
+        `default_collate` expects; with it, an already-stacked batch, so pass
+        e.g. `collate_fn=torch.utils.data.default_convert`.
+
+        :param indices: Sample indices, in batch order.
+        """
+        if not self.as_array:
+            return [self[int(index)] for index in indices]
+        return self.gather(indices)
+
     @staticmethod
     def meta() -> Metadata:
         """Return class metadata loaded from the bundled YAML."""
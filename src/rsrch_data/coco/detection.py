@@ -4,12 +4,14 @@ from collections.abc import Sequence
 from pathlib import Path
 from typing import Literal, NamedTuple, TypedDict
 
+import numpy as np
 from PIL import Image
-from pycocotools.coco import COCO
 from ruamel.yaml import YAML
 
 from rsrch_data.registry import register_dataset
-from rsrch_data.types.object_det import Metadata, Sample
+from rsrch_data.types.object_det import ArraySample, Metadata, Sample
+
+from .utils.index import load_instances_index
 
 
 class Box(NamedTuple):
@@ -37,39 +39,61 @@ class COCODetection(Sequence):
         self,
         data_root: str | Path,
         split: Literal["train", "val"] = "train",
+        *,
+        cache_index: bool = True,
+        as_array: bool = False,
     ):
-        """Load COCO `split` detection annotations from `data_root`."""
+        """Load COCO `split` detection annotations from `data_root`.
+
+        :param cache_index: Parse the annotation file only once, then
+            memory-map its columnar index (see `load_instances_index`).
+        :param as_array: Return each sample's annotations as arrays sliced
+            from the index (an `ArraySample`, see also `collate_detections`)
+            instead of one dict per annotation.
+        """
         self.root = Path(data_root).expanduser()
         self.split = split
+        self.as_array = as_array
 
-        ann_path = self.root / f"annotations/instances_{split}2017.json"
-        self.coco = COCO(ann_path)
-
-        self.img_ids = self.coco.getImgIds()
+        self.index = load_instances_index(self.root, split, cache=cache_index)
+        self.img_ids = self.index.image_ids
         self.img_root = self.root / f"{split}2017"
 
     def __len__(self):
         return len(self.img_ids)
 
-    def __getitem__(self, index: int) -> Sample:
-        img_id = self.img_ids[index]
-        img_info = self.coco.loadImgs(img_id)[0]
-        img_path = self.img_root / img_info["file_name"]
+    def __getitem__(self, index: int) -> Sample | ArraySample:
+        img_path = self.img_root / self.index.file_names[index]
         img = Image.open(img_path)
 
-        ann_ids = self.coco.getAnnIds(img_id)
+        anns = self.index.anns(index)
+        if self.as_array:
+            return {
+                "image": img,
+                "boxes": self.index.bbox[anns],
+                "labels": self.index.category[anns].astype(np.int64),
+                "iscrowd": self.index.iscrowd[anns],
+            }
 
         detections = [
-            {
-                "category": coco_ann["category_id"],
-                "bbox": Box(coco_ann["bbox"]),
-                "iscrowd": coco_ann["iscrowd"] > 0,
-            }
-            for coco_ann in self.coco.loadAnns(ann_ids)
+            {"category": category, "bbox": Box(*bbox), "iscrowd": iscrowd}
+            for category, bbox, iscrowd in zip(
+                self.index.category[anns].tolist(),
+                self.index.bbox[anns].tolist(),
+                self.index.iscrowd[anns].tolist(),
+                strict=True,
+            )
         ]
 
         return {"image": img, "dets": detections}
 
+    def image_sizes(self) -> np.ndarray:
+        """Return every image's `(width, height)`, as an `(N, 2)` int32 array.
+
+        Taken from the annotation file's image entries -- no image is read.
+        """
+        return self.index.sizes
+
     @staticmethod
     def meta() -> Metadata:
         """Return class metadata loaded from the bundled YAML."""
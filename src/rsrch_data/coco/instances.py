@@ -6,12 +6,14 @@ from typing import Literal, NamedTuple, TypedDict
 
 import numpy as np
 from PIL import Image
-from pycocotools.coco import COCO
 from ruamel.yaml import YAML
 
 from rsrch_data.registry import register_dataset
 from rsrch_data.types.object_det import Metadata
 
+from .utils.index import load_instances_index
+from .utils.masks import InstanceMasks
+
 
 class Box(NamedTuple):
     """Bounding box in (x, y, width, height) format."""
@@ -41,6 +43,25 @@ class Sample(TypedDict):
     instances: list[Instance]
 
 
+class ArraySample(TypedDict):
+    """A COCO instance segmentation sample with array annotations.
+
+    Like `rsrch_data.types.object_det.ArraySample`, plus the masks, which are
+    decoded only on request (see `InstanceMasks.decode`).
+
+    :param boxes: `(N, 4)` float32 boxes, as `(x, y, width, height)`.
+    :param labels: `(N,)` int64 category ids.
+    :param iscrowd: `(N,)` bool crowd flags.
+    :param masks: The `N` instance masks, still compressed.
+    """
+
+    image: Image.Image
+    boxes: np.ndarray
+    labels: np.ndarray
+    iscrowd: np.ndarray
+    masks: InstanceMasks
+
+
 @register_dataset("coco-instances")
 class COCOInstances(Sequence):
     """COCO instance segmentation dataset."""
@@ -49,49 +70,71 @@ class COCOInstances(Sequence):
         self,
         data_root: str | Path,
         split: Literal["train", "val"] = "train",
+        *,
+        cache_index: bool = True,
+        as_array: bool = False,
     ):
-        """Load COCO `split` instance segmentation annotations from `data_root`."""
+        """Load COCO `split` instance segmentation annotations from `data_root`.
+
+        :param cache_index: Parse the annotation file only once, then
+            memory-map its columnar index (see `load_instances_index`).
+        :param as_array: Return an `ArraySample` -- annotation arrays plus
+            lazily decoded masks -- instead of one dict and one full-size PIL
+            mask per instance.
+        """
         self.root = Path(data_root).expanduser()
         self.split = split
+        self.as_array = as_array
 
-        ann_path = self.root / f"annotations/instances_{split}2017.json"
-        self.coco = COCO(ann_path)
-
-        self.img_ids = self.coco.getImgIds()
+        self.index = load_instances_index(self.root, split, cache=cache_index)
+        self.img_ids = self.index.image_ids
         self.img_root = self.root / f"{split}2017"
 
     def __len__(self):
         return len(self.img_ids)
 
-    def __getitem__(self, index: int) -> Sample:
-        img_id = self.img_ids[index]
-        img_info = self.coco.loadImgs(img_id)[0]
-        img_path = self.img_root / img_info["file_name"]
+    def __getitem__(self, index: int) -> Sample | ArraySample:
+        img_path = self.img_root / self.index.file_names[index]
         img = Image.open(img_path)
 
-        ann_ids = self.coco.getAnnIds(img_id)
-        coco_anns = self.coco.loadAnns(ann_ids)
+        anns = self.index.anns(index)
+        masks = InstanceMasks(self.index, index)
+        if self.as_array:
+            return {
+                "image": img,
+                "boxes": self.index.bbox[anns],
+                "labels": self.index.category[anns].astype(np.int64),
+                "iscrowd": self.index.iscrowd[anns],
+                "masks": masks,
+            }
 
         instances: list[Instance] = []
-        for coco_ann in coco_anns:
-            mask = self.coco.annToMask(coco_ann)
-            mask = Image.fromarray((255 * mask).astype(np.uint8))
+        for decoded, category, bbox, iscrowd in zip(
+            masks.decode(),
+            self.index.category[anns].tolist(),
+            self.index.bbox[anns].tolist(),
+            self.index.iscrowd[anns].tolist(),
+            strict=True,
+        ):
             instances.append(
                 {
-                    "category": coco_ann["category_id"],
-                    "bbox": Box(coco_ann["bbox"]),
-                    "iscrowd": coco_ann["iscrowd"] > 0,
-                    "mask": mask,
+                    "category": category,
+                    "bbox": Box(*bbox),
+                    "iscrowd": iscrowd,
+                    "mask": Image.fromarray(255 * decoded.view(np.uint8)),
                 }
             )
 
         return {"image": img, "instances": instances}
 
     def _get_meta(self) -> dict:
-        classes = {}
-        categories = self.coco.loadCats(self.coco.getCatIds())
-        for cat in categories:
-            classes[cat["id"]] = cat["name"]
+        classes = dict(
+            zip(
+                self.index.category_ids.tolist(),
+                self.index.category_names,
+                strict=True,
+            )
+        )
 
         return {"classes": classes, "ignore_index": 0}
 
@@ -3,7 +3,7 @@
 import json
 from collections.abc import Sequence
 from pathlib import Path
-from typing import TYPE_CHECKING, Literal, TypedDict
+from typing import Literal, TypedDict
 
 import numpy as np
 from PIL import Image
@@ -11,15 +11,20 @@ from ruamel.yaml import YAML
 
 from rsrch_data.registry import register_dataset
 from rsrch_data.types.panoptic_seg import Metadata
+from rsrch_data.utils.npy_cache import stat_key
 
+from .utils.index import PanopticIndex, load_panoptic_index
 from .utils.schema import SegmentInfo
 
-if TYPE_CHECKING:
-    from .utils.schema import PanopticAnnFile
+ID_CACHE_VERSION = 1
+"""Bump whenever the id cache's layout or contents change."""
 
 
 class Sample(TypedDict):
-    """A COCO panoptic segmentation sample."""
+    """A COCO panoptic segmentation sample.
+
+    :param ids: `(H, W)` uint32 segment id map (0 for unlabeled pixels).
+    """
 
     image: Image.Image
     ann_img: Image.Image
@@ -27,64 +32,209 @@ class Sample(TypedDict):
     segments: list[SegmentInfo]
 
 
+class IdCacheMetadata(TypedDict):
+    """Contents of the id cache's `meta.json` (see `id_cache_paths`)."""
+
+    version: int
+    sources: dict[str, list[int]]
+    dtype: str
+    num_pixels: int
+
+
+def id_cache_paths(data_root: str | Path, split: str) -> tuple[Path, Path]:
+    """Return the `(segments.bin, meta.json)` paths of a split's id cache."""
+    cache_dir = Path(data_root).expanduser() / f"annotations/_panoptic_{split}2017_ids"
+    return cache_dir / "segments.bin", cache_dir / "meta.json"
+
+
+def rgb_to_ids(ann_img: Image.Image) -> np.ndarray:
+    """Decode a panoptic PNG into its `(H, W)` uint32 segment id map.
+
+    COCO encodes id `R + 256 * G + 256**2 * B`: expanding to RGBX and viewing
+    each pixel's 4 bytes as one little-endian uint32 gives exactly that, once
+    the padding byte is masked off -- no per-channel temporaries.
+    """
+    rgbx = np.asarray(ann_img.convert("RGBX"))
+    return rgbx.view("<u4")[..., 0] & np.uint32(0xFFFFFF)
+
+
+def ids_to_segments(ids: np.ndarray, segment_ids: np.ndarray) -> np.ndarray:
+    """Map an id map to 1-based positions in `segment_ids` (0 if absent).
+
+    Segment ids are looked up with `searchsorted` over the image's few sorted
+    ids. Panoptic maps are mostly long horizontal runs of one id, so only
+    each run's first pixel is looked up (unless runs are very short), and
+    the result is expanded back with `np.repeat`.
+
+    :param ids: Segment id map, as from `rgb_to_ids`.
+    :param segment_ids: The image's segment ids, in `segments_info` order.
+    :return: int32 array shaped like `ids`.
+    """
+    order = np.argsort(segment_ids)
+    # A sentinel no 24-bit id can match keeps `pos` in range past the end.
+    sorted_ids = np.append(segment_ids[order], np.uint32(0xFFFFFFFF))
+    positions = np.append(order + 1, 0).astype(np.int32)
+
+    flat = ids.ravel()
+    starts = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    if len(starts) >= flat.size // 4:
+        pos = np.searchsorted(sorted_ids, flat)
+        return np.where(sorted_ids[pos] == flat, positions[pos], 0).reshape(ids.shape)
+
+    starts = np.concatenate([np.zeros(1, dtype=np.intp), starts])
+    values = flat[starts]
+    pos = np.searchsorted(sorted_ids, values)
+    run_positions = np.where(sorted_ids[pos] == values, positions[pos], 0)
+    lengths = np.diff(starts, append=flat.size)
+    return np.repeat(run_positions, lengths).reshape(ids.shape)
+
+
+def id_cache_dtype(index: PanopticIndex) -> np.dtype:
+    """Return the narrowest dtype fitting every image's segment positions."""
+    max_segments = int(np.diff(index.segment_offsets).max(initial=0))
+    return np.dtype(np.uint8 if max_segments < 2**8 else np.uint16)
+
+
 @register_dataset("coco-panoptic")
 class COCOPanoptic(Sequence):
-    """COCO panoptic segmentation dataset."""
+    """COCO panoptic segmentation dataset.
+
+    Annotations come from a columnar index of `panoptic_{split}2017.json`
+    (see `load_panoptic_index`). Id maps are decoded from the panoptic PNGs,
+    or read from the pre-converted id cache written by
+    convert_coco_panoptic_ids.py, when one matching the annotation file
+    exists: every image's map stored as 1-based positions in its segment
+    list, in the narrowest unsigned dtype (see `ids_to_segments`).
+
+    File structure:
+    ```
+    <data_root>/
+    ├── {split}2017/
+    └── annotations/
+        ├── panoptic_{split}2017.json
+        ├── panoptic_{split}2017/            # Panoptic PNGs
+        ├── _panoptic_{split}2017_index/     # Columnar index, made on first load
+        └── _panoptic_{split}2017_ids/       # Optional id cache
+            ├── segments.bin                 # Concatenated (H, W) maps
+            └── meta.json                    # `IdCacheMetadata`
+    ```
+    """
 
     def __init__(
         self,
         data_root: str | Path,
         split: Literal["train", "val"] = "train",
+        *,
+        cache_index: bool = True,
+        id_cache: bool = True,
     ):
-        """Load COCO `split` panoptic annotations from `data_root`."""
+        """Load COCO `split` panoptic annotations from `data_root`.
+
+        :param cache_index: Parse the annotation file only once, then
+            memory-map its columnar index (see `load_panoptic_index`).
+        :param id_cache: Read id maps from the id cache if it's up to date,
+            instead of decoding the panoptic PNGs.
+        """
         self.root = Path(data_root).expanduser()
         self.split = split
 
-        ann_file = self.root / f"annotations/panoptic_{split}2017.json"
-        with ann_file.open() as f:
-            self.ann_file: PanopticAnnFile = json.load(f)
-
-        self.img_anns = {image["id"]: [] for image in self.ann_file["images"]}
-        for ann_id, ann in enumerate(self.ann_file["annotations"]):
-            self.img_anns[ann["image_id"]].append(ann_id)
-
+        self.index = load_panoptic_index(self.root, split, cache=cache_index)
         self.img_root = self.root / f"{self.split}2017"
         self.ann_root = self.root / f"annotations/panoptic_{self.split}2017"
 
-        if any(len(v) != 1 for v in self.img_anns.values()):
-            msg = "Need to have 1 annotation per image"
-            raise RuntimeError(msg)
+        self._id_maps = self._open_id_cache() if id_cache else None
+        if self._id_maps is not None:
+            self._pixel_offsets = np.zeros(len(self.index) + 1, dtype=np.int64)
+            np.cumsum(np.prod(self.index.sizes, axis=1), out=self._pixel_offsets[1:])
+
+    def _open_id_cache(self) -> np.ndarray | None:
+        """Memory-map the id cache, or None if it's missing or stale."""
+        data_path, meta_path = id_cache_paths(self.root, self.split)
+        try:
+            with meta_path.open() as f:
+                meta: IdCacheMetadata = json.load(f)
+        except FileNotFoundError:
+            return None
+        ann_path = self.root / f"annotations/panoptic_{self.split}2017.json"
+        if meta["version"] != ID_CACHE_VERSION or meta["sources"] != stat_key(
+            [ann_path]
+        ):
+            return None
+        if meta["num_pixels"] == 0:
+            return np.empty(0, dtype=meta["dtype"])
+        return np.memmap(data_path, dtype=meta["dtype"], mode="r")
 
     def __len__(self):
-        return len(self.ann_file["images"])
+        return len(self.index)
+
+    def ids(self, index: int) -> np.ndarray:
+        """Return the `(H, W)` uint32 segment id map of the image at `index`."""
+        if self._id_maps is None:
+            with Image.open(self.ann_root / self.index.ann_file_names[index]) as img:
+                return rgb_to_ids(img)
+        segment_ids = self.index.segment_ids[self.index.segments(index)]
+        lut = np.concatenate([np.zeros(1, dtype=np.uint32), segment_ids])
+        return lut[self.segment_map(index)]
+
+    def segment_map(self, index: int) -> np.ndarray:
+        """Return the image's `(H, W)` map of 1-based segment positions.
+
+        Pixel value `k > 0` means segment row `index.segments(index)[k - 1]`
+        (the `k`-th entry of the image's `segments_info`), and 0 unlabeled --
+        so per-segment attributes map to pixels with one small lookup table.
+        Read straight from the id cache if available (see `ids_to_segments`).
+        """
+        if self._id_maps is None:
+            segment_ids = self.index.segment_ids[self.index.segments(index)]
+            return ids_to_segments(self.ids(index), segment_ids)
+        width, height = self.index.sizes[index].tolist()
+        lo, hi = self._pixel_offsets[index : index + 2].tolist()
+        return self._id_maps[lo:hi].reshape(height, width)
 
     def __getitem__(self, index: int) -> Sample:
-        img_info = self.ann_file["images"][index]
-        img_path = self.img_root / img_info["file_name"]
+        img_path = self.img_root / self.index.file_names[index]
         img = Image.open(img_path)
-
-        img_id = img_info["id"]
-        ann_id: int = self.img_anns[img_id][0]
-        ann = self.ann_file["annotations"][ann_id]
-        ann_img_path = self.ann_root / ann["file_name"]
-        ann_img = Image.open(ann_img_path)
-        ids = np.asarray(ann_img).astype(np.int32)
-        ids = (ids * np.array([1, 256, 256**2])).sum(-1)
+        ann_img = Image.open(self.ann_root / self.index.ann_file_names[index])
+
+        segs = self.index.segments(index)
+        segments: list[SegmentInfo] = [
+            {
+                "id": seg_id,
+                "category_id": category,
+                "area": area,
+                "bbox": bbox,
+                "iscrowd": iscrowd,
+            }
+            for seg_id, category, area, bbox, iscrowd in zip(
+                self.index.segment_ids[segs].tolist(),
+                self.index.segment_category[segs].tolist(),
+                self.index.segment_area[segs].tolist(),
+                self.index.segment_bbox[segs].tolist(),
+                self.index.segment_iscrowd[segs].astype(np.int64).tolist(),
+                strict=True,
+            )
+        ]
 
         return {
             "image": img,
             "ann_img": ann_img,
-            "ids": ids,
-            "segments": ann["segments_info"],
+            "ids": rgb_to_ids(ann_img) if self._id_maps is None else self.ids(index),
+            "segments": segments,
         }
 
     def _get_meta(self) -> dict:
         classes = {}
-        for cat in self.ann_file["categories"]:
-            classes[cat["id"]] = {
-                "name": cat["name"],
-                "isthing": cat["isthing"] > 0,
-                "supercategory": cat["supercategory"],
+        for cat_id, name, isthing, supercategory in zip(
+            self.index.category_ids.tolist(),
+            self.index.category_names,
+            self.index.category_isthing.tolist(),
+            self.index.category_supercategories,
+            strict=True,
+        ):
+            classes[cat_id] = {
+                "name": name,
+                "isthing": isthing,
+                "supercategory": supercategory,
             }
 
         return {"classes": classes, "ignore_index": 0}
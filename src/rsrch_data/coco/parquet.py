@@ -0,0 +1,245 @@
+"""Sequential loader over pre-shuffled COCO Parquet shards."""
+
+import io
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Literal, TypedDict
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from PIL import Image
+from ruamel.yaml import YAML
+
+from rsrch_data.registry import register_dataset
+from rsrch_data.types import object_det, panoptic_seg
+from rsrch_data.utils.parquet_shards import ParquetShards
+from rsrch_data.utils.parquet_writer import IndexOptions
+
+from .panoptic import rgb_to_ids
+from .utils.masks import RLEMasks
+
+_IMAGE_FIELDS = [
+    pa.field("image", pa.binary()),
+    pa.field("image_id", pa.int64()),
+    pa.field("file_name", pa.string()),
+    pa.field("width", pa.int32()),
+    pa.field("height", pa.int32()),
+    pa.field("orig_index", pa.int32()),
+    pa.field("boxes", pa.list_(pa.list_(pa.float32(), 4))),
+    pa.field("labels", pa.list_(pa.int32())),
+    pa.field("iscrowd", pa.list_(pa.bool_())),
+    pa.field("area", pa.list_(pa.float32())),
+]
+
+INSTANCES_SCHEMA = pa.schema([*_IMAGE_FIELDS, pa.field("masks", pa.list_(pa.binary()))])
+"""Schema of `COCOParquet` instances shards: the image's JPEG bytes and
+COCO entry, then one list entry per annotation -- `(x, y, width, height)`
+box, category id, crowd flag, area, and compressed RLE counts (polygons are
+rasterized at packing time)."""
+
+PANOPTIC_SCHEMA = pa.schema(
+    [
+        *_IMAGE_FIELDS,
+        pa.field("panoptic", pa.binary()),
+        pa.field("segment_ids", pa.list_(pa.uint32())),
+    ]
+)
+"""Schema of `COCOParquet` panoptic shards: as `INSTANCES_SCHEMA`, but one
+list entry per segment, the panoptic PNG's bytes instead of masks, and each
+segment's id in it."""
+
+PARQUET_COMPRESSION = {
+    "image": "none",  # already JPEG-compressed; re-compressing wastes CPU
+    "panoptic": "none",  # likewise, PNG
+    "image_id": "snappy",
+    "file_name": "snappy",
+    "width": "snappy",
+    "height": "snappy",
+    "orig_index": "snappy",
+    "boxes": "zstd",
+    "labels": "zstd",
+    "iscrowd": "zstd",
+    "area": "zstd",
+    "masks": "zstd",
+    "segment_ids": "zstd",
+}
+"""Per-column compression for either schema (`ParquetWriter` ignores the
+columns a schema doesn't have)."""
+
+PARQUET_INDEX = IndexOptions(
+    statistics=("image_id", "file_name", "orig_index"),
+    page_index=True,
+    summary=True,
+)
+"""Read-acceleration metadata for `COCOParquet` shards: statistics and page
+indexes for the per-image key columns only, plus the `_{split}_metadata`
+summary `COCOParquet` opens first."""
+
+Task = Literal["instances", "panoptic"]
+
+
+class InstancesSample(TypedDict):
+    """`COCOParquet` instances sample.
+
+    Like `rsrch_data.coco.instances.ArraySample`, plus where the row came
+    from.
+
+    :param boxes: `(N, 4)` float32 boxes, as `(x, y, width, height)`.
+    :param labels: `(N,)` int64 category ids.
+    :param iscrowd: `(N,)` bool crowd flags.
+    :param area: `(N,)` float32 mask areas.
+    :param masks: The `N` instance masks, still compressed.
+    :param image_id: COCO image id.
+    :param orig_index: This row's position in the annotation file's images
+        before the pack script's pre-shuffle.
+    """
+
+    image: Image.Image
+    boxes: np.ndarray
+    labels: np.ndarray
+    iscrowd: np.ndarray
+    area: np.ndarray
+    masks: RLEMasks
+    image_id: int
+    orig_index: int
+
+
+class PanopticSample(TypedDict):
+    """`COCOParquet` panoptic sample.
+
+    :param ann_img: The panoptic PNG.
+    :param ids: `(H, W)` uint32 segment id map (0 for unlabeled pixels).
+    :param segment_ids: `(N,)` uint32 ids of the image's segments in `ids`.
+    :param boxes: `(N, 4)` float32 segment boxes, as `(x, y, width, height)`.
+    :param labels: `(N,)` int64 category ids.
+    :param iscrowd: `(N,)` bool crowd flags.
+    :param area: `(N,)` float32 segment areas.
+    :param image_id: COCO image id.
+    :param orig_index: As in `InstancesSample`.
+    """
+
+    image: Image.Image
+    ann_img: Image.Image
+    ids: np.ndarray
+    segment_ids: np.ndarray
+    boxes: np.ndarray
+    labels: np.ndarray
+    iscrowd: np.ndarray
+    area: np.ndarray
+    image_id: int
+    orig_index: int
+
+
+def _list_column(table: pa.Table, name: str) -> tuple[np.ndarray, pa.Array]:
+    """Return a list column's `(N + 1,)` row offsets and flattened values."""
+    column = table.column(name).combine_chunks()
+    offsets = column.offsets.to_numpy()
+    return offsets - offsets[0], column.flatten()
+
+
+@register_dataset("coco-parquet")
+class COCOParquet(ParquetShards[InstancesSample | PanopticSample]):
+    """Sequential-only loader over pre-shuffled COCO Parquet shards.
+
+    Produced by `rsrch_data/scripts/pack_coco_to_parquet.py`, with either
+    instances or panoptic annotations (see `INSTANCES_SCHEMA` and
+    `PANOPTIC_SCHEMA`) -- whichever the shards hold. As with
+    `ImageNetParquet`, rows are pre-shuffled and meant to be read
+    sequentially; `iter_from` resumes at any row.
+
+    Annotations are converted to arrays one row group at a time, so a sample
+    costs a few array slices plus lazily opened images.
+
+    File structure:
+    ```
+    <data_root>/
+    ├── {split}-00000-of-000NN.parquet
+    ├── ...
+    └── _{split}_metadata          # Optional summary of every shard's footer
+    ```
+    """
+
+    def __init__(
+        self,
+        data_root: str | Path,
+        split: Literal["train", "val"],
+        *,
+        prefetch: int = 1,
+    ) -> None:
+        """Index parquet shard footers (no data read) for `split`.
+
+        :param data_root: Directory of Parquet shards, as written by
+            `pack_coco_to_parquet.py`.
+        :param split: Which split's shards to load.
+        :param prefetch: Row groups read ahead of the one being iterated (see
+            `ParquetShards`).
+        """
+        super().__init__(data_root, split, prefetch=prefetch)
+        schema = pq.read_schema(self.files[0])
+        self.task: Task = "panoptic" if "panoptic" in schema.names else "instances"
+        """Which annotations the shards hold."""
+        schema = PANOPTIC_SCHEMA if self.task == "panoptic" else INSTANCES_SCHEMA
+        # `file_name` is only there to inspect the shards; never read back.
+        self.columns = [name for name in schema.names if name != "file_name"]
+
+    def _samples(
+        self, table: pa.Table, start: int
+    ) -> Iterator[InstancesSample | PanopticSample]:
+        box_offsets, boxes = _list_column(table, "boxes")
+        boxes = boxes.flatten().to_numpy().reshape(-1, 4)
+        _, labels = _list_column(table, "labels")
+        labels = labels.to_numpy().astype(np.int64)
+        _, iscrowd = _list_column(table, "iscrowd")
+        iscrowd = iscrowd.to_numpy(zero_copy_only=False)
+        _, area = _list_column(table, "area")
+        area = area.to_numpy()
+        images = table.column("image").to_pylist()
+        image_ids = table.column("image_id").to_pylist()
+        orig_indices = table.column("orig_index").to_pylist()
+        sizes = list(
+            zip(
+                table.column("height").to_pylist(),
+                table.column("width").to_pylist(),
+                strict=True,
+            )
+        )
+        if self.task == "panoptic":
+            pngs = table.column("panoptic").to_pylist()
+            _, segment_ids = _list_column(table, "segment_ids")
+            segment_ids = segment_ids.to_numpy()
+        else:
+            _, masks = _list_column(table, "masks")
+            masks = masks.to_pylist()
+
+        for row in range(start, table.num_rows):
+            anns = slice(box_offsets[row], box_offsets[row + 1])
+            image = Image.open(io.BytesIO(images[row]))
+            sample = {
+                "image": image,
+                "boxes": boxes[anns],
+                "labels": labels[anns],
+                "iscrowd": iscrowd[anns],
+                "area": area[anns],
+                "image_id": image_ids[row],
+                "orig_index": orig_indices[row],
+            }
+            if self.task == "panoptic":
+                ann_img = Image.open(io.BytesIO(pngs[row]))
+                sample |= {
+                    "ann_img": ann_img,
+                    "ids": rgb_to_ids(ann_img),
+                    "segment_ids": segment_ids[anns],
+                }
+            else:
+                sample["masks"] = RLEMasks(masks[anns], sizes[row])
+            yield sample
+
+    def meta(self) -> object_det.Metadata | panoptic_seg.Metadata:
+        """Return class metadata loaded from the bundled YAML (as per `task`)."""
+        yaml = YAML(typ="safe", pure=True)
+        if self.task == "panoptic":
+            with (Path(__file__).parent / "coco_panoptic.yml").open() as f:
+                return panoptic_seg.Metadata(**yaml.load(f))
+        with (Path(__file__).parent / "coco.yml").open() as f:
+            return object_det.Metadata(**yaml.load(f))
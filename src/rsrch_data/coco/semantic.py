@@ -1,5 +1,7 @@
 """COCO semantic segmentation dataset (derived from panoptic annotations)."""
 
+import contextlib
+import json
 from collections.abc import Sequence
 from pathlib import Path
 from typing import Literal
@@ -9,37 +11,92 @@ from PIL import Image
 
 from rsrch_data.registry import register_dataset
 from rsrch_data.types.sem_seg import Metadata, Sample
+from rsrch_data.utils.npy_cache import stat_key
 
 from .panoptic import COCOPanoptic
 
+LABELS_VERSION = 1
+"""Bump whenever the precomputed label maps' contents change."""
+
+
+def label_paths(root: str | Path, split: str) -> tuple[Path, Path]:
+    """Return the precomputed label PNG directory of a split, and its marker.
+
+    The marker (`_done.json`, see `labels_key`) is written once every PNG is.
+    """
+    label_dir = Path(root).expanduser() / f"annotations/semantic_{split}2017"
+    return label_dir, label_dir / "_done.json"
+
+
+def labels_key(root: str | Path, split: str) -> dict:
+    """Return the key identifying the panoptic annotations labels derive from."""
+    ann_path = Path(root).expanduser() / f"annotations/panoptic_{split}2017.json"
+    return {"version": LABELS_VERSION, "sources": stat_key([ann_path])}
+
 
 @register_dataset("coco-semantic")
 class COCOSemantic(Sequence):
-    """A custom dataset for semantic segmentation from COCO-Panoptic."""
+    """A custom dataset for semantic segmentation from COCO-Panoptic.
+
+    Label maps are the category of each pixel's panoptic segment (0 where
+    unlabeled), as uint8. They're read from the PNGs precomputed by
+    precompute_coco_semantic.py when those are present and up to date, and
+    otherwise derived per sample from `COCOPanoptic.segment_map` via a lookup
+    table of the image's segment categories.
+
+    File structure:
+    ```
+    <root>/
+    ├── {split}2017/
+    └── annotations/
+        ├── panoptic_{split}2017.json
+        ├── panoptic_{split}2017/
+        └── semantic_{split}2017/   # Optional precomputed labels
+            ├── {image stem}.png    # (H, W) uint8 category ids
+            └── _done.json          # `labels_key`
+    ```
+    """
 
     def __init__(
         self,
         root: str | Path,
         split: Literal["train", "val"] = "train",
+        *,
+        precomputed: bool = True,
     ):
-        """Wrap a `COCOPanoptic` dataset, deriving semantic labels from panoptic ids."""
+        """Wrap a `COCOPanoptic` dataset, deriving semantic labels from panoptic ids.
+
+        :param precomputed: Read the precomputed label PNGs if they're up to
+            date.
+        """
         super().__init__()
-        self._panoptic = COCOPanoptic(root=root, split=split)
+        self._panoptic = COCOPanoptic(data_root=root, split=split)
+        self._label_dir = None
+        if precomputed:
+            label_dir, marker = label_paths(root, split)
+            with contextlib.suppress(FileNotFoundError), marker.open() as f:
+                if json.load(f) == labels_key(root, split):
+                    self._label_dir = label_dir
 
     def __len__(self):
         return len(self._panoptic)
 
+    def labels(self, index: int) -> np.ndarray:
+        """Compute the `(H, W)` uint8 category map of the image at `index`."""
+        pan_index = self._panoptic.index
+        segment_category = pan_index.segment_category[pan_index.segments(index)]
+        lut = np.zeros(len(segment_category) + 1, dtype=np.uint8)
+        lut[1:] = segment_category
+        return lut[self._panoptic.segment_map(index)]
+
     def __getitem__(self, index: int) -> Sample:
-        item = self._panoptic[index]
-        ids = item["ids"]
-        uniq, inv = np.unique(ids, return_inverse=True)
-        inv = inv.reshape(ids.shape)
-        id_to_cat = {info["id"]: info["category_id"] for info in item["segments"]}
-        cat_map = np.array(
-            [id_to_cat.get(seg_id, 0) for seg_id in uniq], dtype=np.uint8
-        )
-        labels = cat_map[inv]
-        return {"image": item["image"], "labels": Image.fromarray(labels)}
+        file_name = self._panoptic.index.file_names[index]
+        image = Image.open(self._panoptic.img_root / file_name)
+        if self._label_dir is not None:
+            labels = Image.open(self._label_dir / f"{Path(file_name).stem}.png")
+        else:
+            labels = Image.fromarray(self.labels(index))
+        return {"image": image, "labels": labels}
 
     @staticmethod
     def meta() -> Metadata:
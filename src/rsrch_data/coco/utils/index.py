@@ -0,0 +1,354 @@
+"""Columnar, memory-mapped indexes of COCO annotation files.
+
+Parsing `instances_{split}2017.json` into a `pycocotools.COCO` object takes
+tens of seconds and hundreds of MB of Python dicts -- in every dataloader
+worker. `load_instances_index` does that parse once and stores the result as
+flat arrays (see `cached_npy_arrays`): an image table, and an annotation
+table sorted by image, with each image's annotations at rows
+`ann_offsets[i]:ann_offsets[i + 1]`. Later loads memory-map the arrays, so
+workers share one copy through the page cache, and looking up a sample's
+annotations is a slice.
+
+Segmentations are stored without decoding them: polygons as one float64
+coordinate buffer (with per-ring and per-annotation offsets), RLEs as their
+compressed `counts` strings in one byte buffer.
+
+`load_panoptic_index` does the same for `panoptic_{split}2017.json`, with a
+table of segments (the `segments_info` entries) in place of annotations.
+"""
+
+import itertools
+import json
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+from pycocotools import mask as mask_utils
+
+from rsrch_data.utils.npy_cache import cached_npy_arrays
+from rsrch_data.utils.packed_strings import PackedStrings, pack_strings
+
+_INDEX_VERSION = 1
+"""Bump whenever the index arrays' layout or contents change."""
+
+
+def _offsets(lengths: Sequence[int]) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _build_index(ann_path: Path) -> dict[str, np.ndarray]:
+    """Parse an instances annotation file into the index arrays."""
+    with ann_path.open() as f:
+        ann_file = json.load(f)
+    images = ann_file["images"]
+    anns = ann_file["annotations"]
+    categories = ann_file["categories"]
+
+    image_ids = np.array([image["id"] for image in images], dtype=np.int64)
+    image_rows = {image_id: row for row, image_id in enumerate(image_ids.tolist())}
+    sizes = np.array(
+        [[image["width"], image["height"]] for image in images], dtype=np.int32
+    ).reshape(-1, 2)
+    file_names, file_name_offsets = pack_strings([i["file_name"] for i in images])
+    cat_names, cat_name_offsets = pack_strings([cat["name"] for cat in categories])
+
+    # Group annotations by image, keeping file order within an image (the
+    # order of `COCO.getAnnIds`).
+    ann_rows = np.array([image_rows[ann["image_id"]] for ann in anns], dtype=np.int64)
+    order = np.argsort(ann_rows, kind="stable")
+    anns = [anns[j] for j in order]
+    ann_offsets = _offsets(np.bincount(ann_rows, minlength=len(images)))
+
+    rings: list[list[float]] = []
+    num_rings = []
+    rle_counts = []
+    for ann, row in zip(anns, ann_rows[order].tolist(), strict=True):
+        segm = ann["segmentation"]
+        if isinstance(segm, list):
+            rings.extend(segm)
+            num_rings.append(len(segm))
+            rle_counts.append(b"")
+            continue
+        num_rings.append(0)
+        if isinstance(segm["counts"], list):  # Uncompressed RLE (crowds).
+            width, height = sizes[row].tolist()
+            segm = mask_utils.frPyObjects(segm, height, width)
+        counts = segm["counts"]
+        rle_counts.append(counts.encode() if isinstance(counts, str) else counts)
+    ring_offsets = _offsets([len(ring) for ring in rings])
+
+    return {
+        "image_ids": image_ids,
+        "sizes": sizes,
+        "file_names": file_names,
+        "file_name_offsets": file_name_offsets,
+        "ann_offsets": ann_offsets,
+        "ann_ids": np.array([ann["id"] for ann in anns], dtype=np.int64),
+        "bbox": np.array([ann["bbox"] for ann in anns], dtype=np.float32).reshape(
+            -1, 4
+        ),
+        "category": np.array([ann["category_id"] for ann in anns], dtype=np.int32),
+        "iscrowd": np.array([ann["iscrowd"] > 0 for ann in anns], dtype=bool),
+        "area": np.array([ann["area"] for ann in anns], dtype=np.float32),
+        "poly_offsets": _offsets(num_rings),
+        "ring_offsets": ring_offsets,
+        "poly_coords": np.fromiter(
+            itertools.chain.from_iterable(rings),
+            dtype=np.float64,
+            count=int(ring_offsets[-1]),
+        ),
+        "rle_offsets": _offsets([len(counts) for counts in rle_counts]),
+        "rle_counts": np.frombuffer(b"".join(rle_counts), dtype=np.uint8),
+        "category_ids": np.array([cat["id"] for cat in categories], dtype=np.int32),
+        "category_names": cat_names,
+        "category_name_offsets": cat_name_offsets,
+    }
+
+
+class InstancesIndex:
+    """Columnar view of a COCO instances annotation file.
+
+    Images (in the file's order, as `COCO.getImgIds`) are rows `0..N-1` of
+    `image_ids`, `sizes` and `file_names`. Annotations are rows `0..M-1` of
+    `ann_ids`, `bbox`, `category`, `iscrowd` and `area`, grouped by image:
+    image `i`'s are rows `ann_offsets[i]:ann_offsets[i + 1]` (see `anns`).
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray]) -> None:
+        """Wrap the arrays built by `load_instances_index`."""
+        self.image_ids: np.ndarray = arrays["image_ids"]
+        """`(N,)` int64 COCO image ids."""
+        self.sizes: np.ndarray = arrays["sizes"]
+        """`(N, 2)` int32 image `(width, height)`."""
+        self.file_names: Sequence[str] = PackedStrings(
+            arrays["file_names"], arrays["file_name_offsets"]
+        )
+        """Image file names, relative to the split's image directory."""
+        self.ann_offsets: np.ndarray = arrays["ann_offsets"]
+        """`(N + 1,)` int64 start of each image's annotation rows."""
+        self.ann_ids: np.ndarray = arrays["ann_ids"]
+        """`(M,)` int64 COCO annotation ids."""
+        self.bbox: np.ndarray = arrays["bbox"]
+        """`(M, 4)` float32 boxes, as `(x, y, width, height)`."""
+        self.category: np.ndarray = arrays["category"]
+        """`(M,)` int32 COCO category ids."""
+        self.iscrowd: np.ndarray = arrays["iscrowd"]
+        """`(M,)` bool crowd flags."""
+        self.area: np.ndarray = arrays["area"]
+        """`(M,)` float32 segmentation areas."""
+        self.category_ids: np.ndarray = arrays["category_ids"]
+        """`(K,)` int32 ids of the file's categories."""
+        self.category_names: Sequence[str] = PackedStrings(
+            arrays["category_names"], arrays["category_name_offsets"]
+        )
+        """Names of the file's categories, aligned with `category_ids`."""
+        self._poly_offsets = arrays["poly_offsets"]
+        self._ring_offsets = arrays["ring_offsets"]
+        self._poly_coords = arrays["poly_coords"]
+        self._rle_offsets = arrays["rle_offsets"]
+        self._rle_counts = arrays["rle_counts"]
+
+    def __len__(self) -> int:
+        return len(self.image_ids)
+
+    def anns(self, index: int) -> slice:
+        """Return the annotation rows of the image at `index`, as a slice."""
+        lo, hi = self.ann_offsets[index : index + 2].tolist()
+        return slice(lo, hi)
+
+    def segmentation(self, ann: int) -> list[list[float]] | dict:
+        """Return annotation row `ann`'s segmentation, in COCO's JSON format.
+
+        Polygons come back as a list of `[x0, y0, x1, y1, ...]` rings; RLEs
+        (including the file's uncompressed crowd RLEs) as a compressed RLE
+        dict, as accepted by `pycocotools.mask`.
+        """
+        lo, hi = self._rle_offsets[ann : ann + 2].tolist()
+        if hi > lo:
+            image = int(np.searchsorted(self.ann_offsets, ann, side="right")) - 1
+            width, height = self.sizes[image].tolist()
+            return {
+                "size": [height, width],
+                "counts": self._rle_counts[lo:hi].tobytes(),
+            }
+        lo, hi = self._poly_offsets[ann : ann + 2].tolist()
+        bounds = self._ring_offsets[lo : hi + 1].tolist()
+        return [
+            self._poly_coords[start:end].tolist()
+            for start, end in itertools.pairwise(bounds)
+        ]
+
+    def rle(self, ann: int) -> dict:
+        """Return annotation row `ann`'s segmentation as one compressed RLE.
+
+        Same as `COCO.annToRLE`: polygons are rasterized and merged.
+        """
+        segm = self.segmentation(ann)
+        if isinstance(segm, dict):
+            return segm
+        image = int(np.searchsorted(self.ann_offsets, ann, side="right")) - 1
+        width, height = self.sizes[image].tolist()
+        return mask_utils.merge(mask_utils.frPyObjects(segm, height, width))
+
+
+def load_instances_index(
+    data_root: str | Path, split: str, *, cache: bool = True
+) -> InstancesIndex:
+    """Load the columnar index of COCO's `instances_{split}2017.json`.
+
+    :param data_root: COCO root, containing `annotations/`.
+    :param split: `train` or `val`.
+    :param cache: Parse the annotation file only once, caching the index in
+        `annotations/_instances_{split}2017_index/` and memory-mapping it on
+        later loads (see `cached_npy_arrays`). Otherwise, build it in memory.
+    """
+    ann_dir = Path(data_root).expanduser() / "annotations"
+    ann_path = ann_dir / f"instances_{split}2017.json"
+    if not cache:
+        return InstancesIndex(_build_index(ann_path))
+    return InstancesIndex(
+        cached_npy_arrays(
+            ann_dir / f"_instances_{split}2017_index",
+            [ann_path],
+            lambda: _build_index(ann_path),
+            version=_INDEX_VERSION,
+        )
+    )
+
+
+def _build_panoptic_index(ann_path: Path) -> dict[str, np.ndarray]:
+    """Parse a panoptic annotation file into the index arrays."""
+    with ann_path.open() as f:
+        ann_file = json.load(f)
+    images = ann_file["images"]
+    categories = ann_file["categories"]
+
+    image_anns = {image["id"]: [] for image in images}
+    for ann in ann_file["annotations"]:
+        image_anns[ann["image_id"]].append(ann)
+    if any(len(anns) != 1 for anns in image_anns.values()):
+        msg = "Need to have 1 annotation per image"
+        raise RuntimeError(msg)
+    anns = [image_anns[image["id"]][0] for image in images]
+    segments = [segment for ann in anns for segment in ann["segments_info"]]
+
+    file_names, file_name_offsets = pack_strings([i["file_name"] for i in images])
+    ann_names, ann_name_offsets = pack_strings([ann["file_name"] for ann in anns])
+    cat_names, cat_name_offsets = pack_strings([cat["name"] for cat in categories])
+    supercats, supercat_offsets = pack_strings(
+        [cat["supercategory"] for cat in categories]
+    )
+    return {
+        "image_ids": np.array([image["id"] for image in images], dtype=np.int64),
+        "sizes": np.array(
+            [[image["width"], image["height"]] for image in images], dtype=np.int32
+        ).reshape(-1, 2),
+        "file_names": file_names,
+        "file_name_offsets": file_name_offsets,
+        "ann_file_names": ann_names,
+        "ann_file_name_offsets": ann_name_offsets,
+        "segment_offsets": _offsets([len(ann["segments_info"]) for ann in anns]),
+        "segment_ids": np.array([s["id"] for s in segments], dtype=np.uint32),
+        "segment_category": np.array(
+            [s["category_id"] for s in segments], dtype=np.int32
+        ),
+        "segment_iscrowd": np.array([s["iscrowd"] > 0 for s in segments], dtype=bool),
+        "segment_area": np.array([s["area"] for s in segments], dtype=np.int64),
+        "segment_bbox": np.array([s["bbox"] for s in segments], dtype=np.int32).reshape(
+            -1, 4
+        ),
+        "category_ids": np.array([cat["id"] for cat in categories], dtype=np.int32),
+        "category_names": cat_names,
+        "category_name_offsets": cat_name_offsets,
+        "category_supercategories": supercats,
+        "category_supercategory_offsets": supercat_offsets,
+        "category_isthing": np.array(
+            [cat["isthing"] > 0 for cat in categories], dtype=bool
+        ),
+    }
+
+
+class PanopticIndex:
+    """Columnar view of a COCO panoptic annotation file.
+
+    Images (in the file's order) are rows `0..N-1` of `image_ids`, `sizes`,
+    `file_names` and `ann_file_names`. Segments are rows `0..S-1` of the
+    `segment_*` arrays, grouped by image: image `i`'s are rows
+    `segment_offsets[i]:segment_offsets[i + 1]` (see `segments`), in
+    `segments_info` order.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray]) -> None:
+        """Wrap the arrays built by `load_panoptic_index`."""
+        self.image_ids: np.ndarray = arrays["image_ids"]
+        """`(N,)` int64 COCO image ids."""
+        self.sizes: np.ndarray = arrays["sizes"]
+        """`(N, 2)` int32 image `(width, height)`."""
+        self.file_names: Sequence[str] = PackedStrings(
+            arrays["file_names"], arrays["file_name_offsets"]
+        )
+        """Image file names, relative to the split's image directory."""
+        self.ann_file_names: Sequence[str] = PackedStrings(
+            arrays["ann_file_names"], arrays["ann_file_name_offsets"]
+        )
+        """Panoptic PNG names, relative to the split's annotation directory."""
+        self.segment_offsets: np.ndarray = arrays["segment_offsets"]
+        """`(N + 1,)` int64 start of each image's segment rows."""
+        self.segment_ids: np.ndarray = arrays["segment_ids"]
+        """`(S,)` uint32 segment ids, as encoded in the panoptic PNGs."""
+        self.segment_category: np.ndarray = arrays["segment_category"]
+        """`(S,)` int32 COCO category ids."""
+        self.segment_iscrowd: np.ndarray = arrays["segment_iscrowd"]
+        """`(S,)` bool crowd flags."""
+        self.segment_area: np.ndarray = arrays["segment_area"]
+        """`(S,)` int64 segment areas, in pixels."""
+        self.segment_bbox: np.ndarray = arrays["segment_bbox"]
+        """`(S, 4)` int32 boxes, as `(x, y, width, height)`."""
+        self.category_ids: np.ndarray = arrays["category_ids"]
+        """`(K,)` int32 ids of the file's categories."""
+        self.category_names: Sequence[str] = PackedStrings(
+            arrays["category_names"], arrays["category_name_offsets"]
+        )
+        """Names of the file's categories, aligned with `category_ids`."""
+        self.category_supercategories: Sequence[str] = PackedStrings(
+            arrays["category_supercategories"],
+            arrays["category_supercategory_offsets"],
+        )
+        """Supercategory names, aligned with `category_ids`."""
+        self.category_isthing: np.ndarray = arrays["category_isthing"]
+        """`(K,)` bool -- whether each category is a thing (vs. stuff)."""
+
+    def __len__(self) -> int:
+        return len(self.image_ids)
+
+    def segments(self, index: int) -> slice:
+        """Return the segment rows of the image at `index`, as a slice."""
+        lo, hi = self.segment_offsets[index : index + 2].tolist()
+        return slice(lo, hi)
+
+
+def load_panoptic_index(
+    data_root: str | Path, split: str, *, cache: bool = True
+) -> PanopticIndex:
+    """Load the columnar index of COCO's `panoptic_{split}2017.json`.
+
+    :param data_root: COCO root, containing `annotations/`.
+    :param split: `train` or `val`.
+    :param cache: Parse the annotation file only once, caching the index in
+        `annotations/_panoptic_{split}2017_index/` and memory-mapping it on
+        later loads (see `cached_npy_arrays`). Otherwise, build it in memory.
+    """
+    ann_dir = Path(data_root).expanduser() / "annotations"
+    ann_path = ann_dir / f"panoptic_{split}2017.json"
+    if not cache:
+        return PanopticIndex(_build_panoptic_index(ann_path))
+    return PanopticIndex(
+        cached_npy_arrays(
+            ann_dir / f"_panoptic_{split}2017_index",
+            [ann_path],
+            lambda: _build_panoptic_index(ann_path),
+            version=_INDEX_VERSION,
+        )
+    )
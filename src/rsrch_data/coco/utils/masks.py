@@ -0,0 +1,165 @@
+"""Lazily decoded COCO instance masks."""
+
+from collections.abc import Sequence
+
+import numpy as np
+from pycocotools import mask as mask_utils
+
+from .index import InstancesIndex
+
+
+class InstanceMasks(Sequence):
+    """The instance masks of one image, kept compressed until decoded.
+
+    Indexing returns an instance's segmentation as stored in the annotation
+    file (polygon rings, or a compressed RLE dict) without decoding it.
+    `decode` turns any subset of the instances into one `(N, H, W)` bool
+    array, decoding them all in a single `pycocotools` call -- at the
+    image's resolution, or straight at a target one.
+    """
+
+    def __init__(self, index: InstancesIndex, image: int) -> None:
+        """Refer to the annotations of row `image` of `index` (nothing is read).
+
+        :param index: Annotation index of the split.
+        :param image: Row of the image in `index`.
+        """
+        self._index = index
+        self._anns = index.anns(image)
+        width, height = index.sizes[image].tolist()
+        self.size: tuple[int, int] = (height, width)
+        """The masks' full-resolution `(height, width)`."""
+
+    def __len__(self) -> int:
+        return self._anns.stop - self._anns.start
+
+    def __getitem__(self, idx: int) -> list[list[float]] | dict:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            msg = f"Index {idx} out of range"
+            raise IndexError(msg)
+        return self._index.segmentation(self._anns.start + idx)
+
+    def rles(self, indices: Sequence[int] | None = None) -> list[dict]:
+        """Return instances' masks as compressed RLEs (see `InstancesIndex.rle`).
+
+        :param indices: Instances to return (default: all, in order).
+        """
+        if indices is None:
+            indices = range(len(self))
+        return [self._index.rle(self._anns.start + idx) for idx in indices]
+
+    def decode(
+        self,
+        indices: Sequence[int] | None = None,
+        size: tuple[int, int] | None = None,
+    ) -> np.ndarray:
+        """Decode instances' masks into one `(N, H, W)` bool array.
+
+        With `size`, polygons are rasterized directly at the target
+        resolution; RLEs are decoded at full resolution and then
+        nearest-neighbor resampled.
+
+        :param indices: Instances to decode (default: all, in order).
+        :param size: Target `(height, width)` (default: the image's).
+        """
+        if indices is None:
+            indices = range(len(self))
+        return decode_masks([self[idx] for idx in indices], self.size, size)
+
+
+class RLEMasks(Sequence):
+    """Instance masks given as compressed RLEs, kept compressed until decoded.
+
+    The same interface as `InstanceMasks`, for masks that don't come from an
+    `InstancesIndex` -- e.g. `COCOParquet`'s, stored as RLE bytes.
+    """
+
+    def __init__(self, counts: Sequence[bytes], size: tuple[int, int]) -> None:
+        """Wrap the compressed RLE `counts` of one image's instances.
+
+        :param counts: Each instance's compressed RLE counts string.
+        :param size: The masks' full-resolution `(height, width)`.
+        """
+        self._counts = counts
+        self.size = size
+        """The masks' full-resolution `(height, width)`."""
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __getitem__(self, idx: int) -> dict:
+        return {"size": list(self.size), "counts": self._counts[idx]}
+
+    def rles(self, indices: Sequence[int] | None = None) -> list[dict]:
+        """Return instances' masks as compressed RLE dicts.
+
+        :param indices: Instances to return (default: all, in order).
+        """
+        if indices is None:
+            indices = range(len(self))
+        return [self[idx] for idx in indices]
+
+    def decode(
+        self,
+        indices: Sequence[int] | None = None,
+        size: tuple[int, int] | None = None,
+    ) -> np.ndarray:
+        """Decode instances' masks into one `(N, H, W)` bool array.
+
+        :param indices: Instances to decode (default: all, in order).
+        :param size: Target `(height, width)` (default: the image's); masks
+            are nearest-neighbor resampled to it.
+        """
+        return decode_masks(self.rles(indices), self.size, size)
+
+
+def decode_masks(
+    segms: Sequence[list[list[float]] | dict],
+    size: tuple[int, int],
+    out_size: tuple[int, int] | None = None,
+) -> np.ndarray:
+    """Decode segmentations into one `(N, H, W)` bool array.
+
+    With `out_size`, polygons are rasterized directly at the target
+    resolution; RLEs are decoded at full resolution and then nearest-neighbor
+    resampled.
+
+    :param segms: Segmentations in COCO's JSON format -- polygon rings, or
+        compressed RLE dicts.
+    :param size: The segmentations' `(height, width)`.
+    :param out_size: Target `(height, width)` (default: `size`).
+    """
+    height, width = size
+    out_height, out_width = out_size if out_size is not None else size
+    resize = (out_height, out_width) != (height, width)
+    scale = np.array([out_width / width, out_height / height])
+
+    masks = np.zeros((len(segms), out_height, out_width), dtype=bool)
+    direct, direct_pos = [], []  # Decoded straight at the output size.
+    full, full_pos = [], []  # Decoded at full size, then resampled.
+    for pos, segm in enumerate(segms):
+        if isinstance(segm, dict):
+            (full if resize else direct).append(segm)
+            (full_pos if resize else direct_pos).append(pos)
+            continue
+        rings = segm
+        if resize:
+            rings = [
+                (np.reshape(ring, (-1, 2)) * scale).ravel().tolist() for ring in segm
+            ]
+        rles = mask_utils.frPyObjects(rings, out_height, out_width)
+        direct.append(mask_utils.merge(rles))
+        direct_pos.append(pos)
+
+    if direct:
+        # `decode` returns `(H, W, N)`; one batched call for all of them.
+        masks[direct_pos] = np.moveaxis(mask_utils.decode(direct), -1, 0)
+    if full:
+        rows = (np.arange(out_height) + 0.5) * (height / out_height)
+        cols = (np.arange(out_width) + 0.5) * (width / out_width)
+        decoded = mask_utils.decode(full)
+        sampled = decoded[rows.astype(np.intp)[:, None], cols.astype(np.intp)]
+        masks[full_pos] = np.moveaxis(sampled, -1, 0)
+    return masks
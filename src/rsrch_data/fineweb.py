@@ -1,9 +1,10 @@
 """FineWeb data loading."""
 
+from collections.abc import Sequence
 from pathlib import Path
 from typing import Literal, TypedDict
 
-from rsrch_data.parquet import ParquetDataset
+from rsrch_data.parquet import Filters, ParquetDataset
 from rsrch_data.registry import register_dataset
 
 
@@ -24,17 +25,34 @@ class Sample(TypedDict):
 
 @register_dataset("fineweb")
 class Fineweb(ParquetDataset[Sample]):
-    """Iterable loader over FineWeb parquet files."""
+    """Iterable loader over FineWeb parquet files.
+
+    Quality-filtered subsets can be read directly, without an offline
+    filtering pass, e.g.
+    `Fineweb(..., columns=["text"], filters=[("int_score", ">=", 3)])`.
+    """
 
     def __init__(
         self,
         data_root: str | Path,
         subset: Literal["sample-10BT"],
         batch_size: int,
+        columns: Sequence[str] | None = None,
+        filters: Filters | None = None,
+        num_threads: int = 0,
     ):
-        """Load the FineWeb `subset` parquet shards from `data_root`."""
+        """Load the FineWeb `subset` parquet shards from `data_root`.
+
+        See `ParquetDataset` for `columns`/`filters`/`num_threads`.
+        """
         subdir = {"sample-10BT": "sample/10BT"}[subset]
         subset_root = Path(data_root) / subdir
         pq_files = sorted([*subset_root.glob("*.parquet")])
-        super().__init__(pq_files, batch_size)
+        super().__init__(
+            pq_files,
+            batch_size,
+            columns=columns,
+            filters=filters,
+            num_threads=num_threads,
+        )
         self.data_root = Path(data_root)
@@ -1,18 +1,24 @@
 """ImageNet data loading."""
 
-import bisect
+import contextlib
 import io
-from collections.abc import Iterable, Iterator, Sequence
+import json
+from collections.abc import Iterator, Sequence
 from pathlib import Path
-from typing import Literal
+from typing import Literal, TypedDict
 
+import numpy as np
 import pandas as pd
 import pyarrow as pa
-import pyarrow.parquet as pq
 from PIL import Image
 
 from rsrch_data.registry import register_dataset
-from rsrch_data.types.image_cls import Metadata, Sample
+from rsrch_data.types.image_cls import ArrayBatch, ArraySample, Metadata, Sample
+from rsrch_data.utils.image_sizes import cached_image_sizes
+from rsrch_data.utils.misc import atomic_open
+from rsrch_data.utils.packed_strings import PackedStrings, pack_strings
+from rsrch_data.utils.parquet_shards import ParquetShards
+from rsrch_data.utils.parquet_writer import IndexOptions
 
 
 def parse_loc_synset_mapping(path: str | Path) -> pd.DataFrame:
@@ -34,6 +40,31 @@ def parse_loc_synset_mapping(path: str | Path) -> pd.DataFrame:
     )
 
 
+_INDEX_VERSION = 1
+"""Bump whenever `ImageNet`'s cached index layout or contents change."""
+
+
+class _LabelNames(Sequence):
+    """Read-only sequence mapping each entry of `labels` to its name."""
+
+    def __init__(self, labels: np.ndarray, names: Sequence[str]) -> None:
+        self._labels = labels
+        self._names = names
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def __getitem__(self, idx: int) -> str:
+        return self._names[self._labels[idx]]
+
+
+def _load_array(path: Path, dtype: type) -> np.ndarray:
+    # np.memmap can't map empty files.
+    if path.stat().st_size == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
 @register_dataset("imagenet")
 class ImageNet(Sequence):
     """ImageNet dataset.
@@ -66,15 +97,30 @@ class ImageNet(Sequence):
     └── LOC_synset_mapping.txt     # A list of labels with WordNet IDs
     └── LOC_train_solution.csv
     └── LOC_val_solution.csv
+    └── _{split}_index/            # Cached index, built on first load
+    └── _{split}_image_sizes.npy   # Cached image sizes, see `image_sizes`
     ```
+
+    The image paths and labels are parsed from the text files once, then
+    cached under `_{split}_index/` (keyed on the sizes and mtimes of the files
+    they came from) as flat arrays that later loads memory-map -- so
+    construction is near-instant, and worker processes share the index's
+    pages instead of each holding a list of Python strings. `paths` and
+    `wnids` are read-only sequence views over those arrays.
     """
 
     def __init__(
         self,
         data_root: str | Path,
         split: Literal["train", "val", "test"] = "train",
+        *,
+        cache_index: bool = True,
     ):
-        """Index ImageNet `split` image paths and WordNet-ID labels from `data_root`."""
+        """Index ImageNet `split` image paths and WordNet-ID labels from `data_root`.
+
+        :param cache_index: Load/save the index from/to `_{split}_index/`. If
+            the root isn't writable, the index is just rebuilt in memory.
+        """
         super().__init__()
         self.root = Path(data_root).expanduser()
         self.split = split
@@ -82,38 +128,126 @@ class ImageNet(Sequence):
         self.img_root = self.root / "ILSVRC/Data/CLS-LOC" / split
         self.ann_root = self.root / "ILSVRC/Annotations/CLS-LOC" / split
 
-        cls_lists = {"train": "train_cls.txt", "val": "val.txt", "test": "test.txt"}
-        cls_list = self.root / "ILSVRC/ImageSets/CLS-LOC" / cls_lists[split]
-
-        self.paths: list[str] = []
-        with cls_list.open() as f:
-            for line in f:
-                path, index = line.strip().split(" ")
-                if int(index) - 1 != len(self.paths):
-                    msg = "Invalid class order"
-                    raise RuntimeError(msg)
-                self.paths.append(path)
-
         synset_df = parse_loc_synset_mapping(self.root / "LOC_synset_mapping.txt")
         self.wnid_to_label = {
             wnid: label for label, wnid in enumerate(synset_df["wnid"])
         }
 
-        if split == "train":
-            self.wnids = []
-            for path in self.paths:
-                wnid = path.split("/")[0]
-                self.wnids.append(wnid)
-        elif split == "val":
+        cls_lists = {"train": "train_cls.txt", "val": "val.txt", "test": "test.txt"}
+        sources = [
+            self.root / "ILSVRC/ImageSets/CLS-LOC" / cls_lists[split],
+            self.root / "LOC_synset_mapping.txt",
+        ]
+        if split == "val":
+            sources.append(self.root / "LOC_val_solution.csv")
+        key = {
+            "version": _INDEX_VERSION,
+            "sources": {
+                str(path.relative_to(self.root)): [
+                    path.stat().st_size,
+                    path.stat().st_mtime_ns,
+                ]
+                for path in sources
+            },
+        }
+
+        index_dir = self.root / f"_{split}_index"
+        index = self._read_index(index_dir, key) if cache_index else None
+        if index is None:
+            index = self._build_index(sources[0])
+            if cache_index:
+                # Read-only root: keep the in-memory index.
+                with contextlib.suppress(OSError):
+                    self._write_index(index_dir, key, *index)
+        data, offsets, labels = index
+
+        self.paths: Sequence[str] = PackedStrings(data, offsets)
+        # -1 for the unlabeled test split.
+        self.labels: np.ndarray = labels
+        if split in ("train", "val"):
+            self.wnids: Sequence[str] = _LabelNames(labels, list(synset_df["wnid"]))
+
+    def _build_index(self, cls_list: Path) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Parse the split's file list (and labels) into index arrays."""
+        cls_df = pd.read_csv(
+            cls_list,
+            sep=" ",
+            header=None,
+            names=["path", "index"],
+            dtype={"path": str, "index": np.int64},
+        )
+        if not np.array_equal(cls_df["index"], np.arange(1, len(cls_df) + 1)):
+            msg = "Invalid class order"
+            raise RuntimeError(msg)
+        paths: list[str] = cls_df["path"].tolist()
+
+        if self.split == "train":
+            wnids = [path[: path.find("/")] for path in paths]
+        elif self.split == "val":
             # We get the IDs from the solution file, because it's faster than
             # parsing all the XML files
             sol_df = pd.read_csv(self.root / "LOC_val_solution.csv")
-            wnids_map = {}
-            for _, row in sol_df.iterrows():
-                pred: str = row["PredictionString"]
-                wnid = pred[: pred.find(" ")]
-                wnids_map[row["ImageId"]] = wnid
-            self.wnids = [wnids_map[path] for path in self.paths]
+            wnids_map = {
+                image_id: pred[: pred.find(" ")]
+                for image_id, pred in zip(
+                    sol_df["ImageId"], sol_df["PredictionString"], strict=True
+                )
+            }
+            wnids = [wnids_map[path] for path in paths]
+        else:
+            wnids = None
+
+        if wnids is None:
+            labels = np.full(len(paths), -1, dtype=np.int32)
+        else:
+            labels = np.fromiter(
+                (self.wnid_to_label[wnid] for wnid in wnids),
+                dtype=np.int32,
+                count=len(wnids),
+            )
+        data, offsets = pack_strings(paths)
+        return data, offsets, labels
+
+    @staticmethod
+    def _read_index(
+        index_dir: Path, key: dict
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray] | None:
+        """Memory-map the cached index in `index_dir`, or None if it's stale."""
+        try:
+            with (index_dir / "key.json").open() as f:
+                if json.load(f) != key:
+                    return None
+            return (
+                _load_array(index_dir / "paths.bin", np.uint8),
+                _load_array(index_dir / "offsets.bin", np.int64),
+                _load_array(index_dir / "labels.bin", np.int32),
+            )
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_index(
+        index_dir: Path,
+        key: dict,
+        data: np.ndarray,
+        offsets: np.ndarray,
+        labels: np.ndarray,
+    ) -> None:
+        """Save the index to `index_dir`, `key.json` last.
+
+        Every file is replaced atomically, so concurrent loads (e.g. several
+        workers on a first run) never see a partial file.
+        """
+        index_dir.mkdir(exist_ok=True)
+        files = {
+            "paths.bin": data.tobytes(),
+            "offsets.bin": offsets.tobytes(),
+            "labels.bin": labels.tobytes(),
+            "key.json": json.dumps(key).encode(),
+        }
+        for name, content in files.items():
+            with atomic_open(index_dir / name) as f:
+                f.write(content)
 
     def __len__(self) -> int:
         """Return total number of samples."""
@@ -126,11 +260,22 @@ class ImageNet(Sequence):
         img = Image.open(img_path)
 
         if self.split in ("train", "val"):
-            wnid = self.wnids[idx]
-            label = self.wnid_to_label[wnid]
-            return {"image": img, "label": label}
+            return {"image": img, "label": int(self.labels[idx])}
         return img
 
+    def image_sizes(self, num_threads: int = 32) -> np.ndarray:
+        """Return every image's `(width, height)`, as an `(N, 2)` int32 array.
+
+        Read from the image file headers (no decoding) on first call, then
+        cached as `<data_root>/_{split}_image_sizes.npy` -- see `cached_image_sizes`.
+        """
+        return cached_image_sizes(
+            self.img_root,
+            [path + ".JPEG" for path in self.paths],
+            self.root / f"_{self.split}_image_sizes.npy",
+            num_threads,
+        )
+
     def meta(self) -> Metadata:
         """Build image-classification metadata from the synset mapping file."""
         loc_synset_mapping_txt = self.root / "LOC_synset_mapping.txt"
@@ -161,6 +306,16 @@ PARQUET_COMPRESSION = {
     "orig_index": "snappy",
 }
 
+PARQUET_INDEX = IndexOptions(
+    statistics=("label", "wnid", "image_id", "orig_index"),
+    page_index=True,
+    summary=True,
+)
+"""Read-acceleration metadata for `ImageNetParquet` shards: statistics and page
+indexes for the key columns (none for `image` -- min/max of JPEG bytes prunes
+nothing), plus the `_{split}_metadata` summary `ImageNetParquet` opens first.
+Writers add `bloom_filters=("image_id",)` on top when pyarrow supports it."""
+
 
 class ParquetSample(Sample):
     """`ImageNetParquet` sample.
@@ -183,7 +338,7 @@ _NEEDED_COLUMNS = ("image", "label", "image_id", "orig_index")
 
 
 @register_dataset("imagenet-parquet")
-class ImageNetParquet(Iterable):
+class ImageNetParquet(ParquetShards[ParquetSample]):
     """Sequential-only loader over pre-shuffled ImageNet Parquet shards.
 
     Produced by `rsrch_data/scripts/pack_in1k_to_parquet.py`. The rows are
@@ -197,56 +352,33 @@ class ImageNetParquet(Iterable):
     <data_root>/
     ├── {split}-00000-of-000NN.parquet
     ├── ...
+    ├── _{split}_metadata          # Optional summary of every shard's footer
     └── LOC_synset_mapping.txt
     ```
     """
 
+    columns = _NEEDED_COLUMNS
+
     def __init__(
         self,
         data_root: str | Path,
         split: Literal["train", "val"],
+        *,
+        prefetch: int = 1,
     ) -> None:
         """Index parquet shard footers (no data read) for `split`.
 
+        If the `_{split}_metadata` summary (see `PARQUET_INDEX`) exists and
+        isn't stale (see `ParquetShards`), the whole index comes from that one
+        file; otherwise every shard's footer is read.
+
         :param data_root: Directory of Parquet shards, as written by
             `pack_in1k_to_parquet.py`.
         :param split: Which split's shards to load.
+        :param prefetch: Row groups read ahead of the one being iterated (see
+            `ParquetShards`).
         """
-        self.root = Path(data_root).expanduser()
-        self.split = split
-
-        self.files = sorted(self.root.glob(f"{split}-*.parquet"))
-        if not self.files:
-            msg = f"No {split}-*.parquet shards found under {self.root}"
-            raise FileNotFoundError(msg)
-
-        # Cumulative row offsets per file, and per-row-group row counts within
-        # each file -- built entirely from parquet footers, no data read.
-        self._offsets = [0]
-        self._row_group_rows: list[list[int]] = []
-        for file in self.files:
-            pf = pq.ParquetFile(file)
-            group_rows = [
-                pf.metadata.row_group(i).num_rows
-                for i in range(pf.metadata.num_row_groups)
-            ]
-            self._row_group_rows.append(group_rows)
-            self._offsets.append(self._offsets[-1] + sum(group_rows))
-
-    def __len__(self) -> int:
-        """Return total number of samples across all shards."""
-        return self._offsets[-1]
-
-    def _locate(self, idx: int) -> tuple[int, int, int]:
-        """Map a global row index to (file_idx, row_group_idx, local_offset)."""
-        file_idx = bisect.bisect_right(self._offsets, idx) - 1
-        offset_in_file = idx - self._offsets[file_idx]
-        for row_group_idx, num_rows in enumerate(self._row_group_rows[file_idx]):
-            if offset_in_file < num_rows:
-                return file_idx, row_group_idx, offset_in_file
-            offset_in_file -= num_rows
-        msg = f"Index {idx} out of range for {self!r}"
-        raise IndexError(msg)
+        super().__init__(data_root, split, prefetch=prefetch)
 
     @staticmethod
     def _row_to_sample(table: pa.Table, local_offset: int) -> ParquetSample:
@@ -259,42 +391,120 @@ class ImageNetParquet(Iterable):
             "orig_index": table.column("orig_index")[local_offset].as_py(),
         }
 
-    def iter_from(self, start: int = 0) -> Iterator[ParquetSample]:
-        """Iterate samples sequentially, starting at global row `start`.
+    def _samples(self, table: pa.Table, start: int) -> Iterator[ParquetSample]:
+        for row in range(start, table.num_rows):
+            yield self._row_to_sample(table, row)
+
+    def meta(self) -> Metadata:
+        """Build image-classification metadata from the synset mapping file."""
+        synset_df = parse_loc_synset_mapping(self.root / "LOC_synset_mapping.txt")
+        label_names = synset_df["name"]
+        return Metadata(dict(enumerate(label_names)))
+
+
+class ArrayMetadata(TypedDict):
+    """JSON sidecar of an `ImageNetArray` split.
+
+    Written by `export_in1k_array.py` once the arrays are complete.
+    """
+
+    num_samples: int
+    height: int
+    width: int
+    policy: str
+    """Crop/resize policy the images were exported with."""
+    resample: str
+    """PIL resampling filter the images were exported with."""
+
+
+def array_paths(data_root: str | Path, split: str) -> tuple[Path, Path, Path]:
+    """Return an `ImageNetArray` split's images, labels and sidecar paths."""
+    data_root = Path(data_root)
+    return (
+        data_root / f"{split}_images.bin",
+        data_root / f"{split}_labels.bin",
+        data_root / f"{split}.json",
+    )
+
 
-        Reads one row group at a time, in order, with no cache and no lock:
-        this is meant for exactly one sequential reader (see class
-        docstring), so there's nothing to coordinate. `start` costs one
-        `_locate` bisect (no data read) -- the first row group read then
-        lands exactly on `start`'s row group, not row 0, so resuming mid-run
-        is cheap regardless of how far in `start` is.
+@register_dataset("imagenet-array")
+class ImageNetArray(Sequence):
+    """Fixed-resolution ImageNet stored as raw uint8 pixels.
 
-        :param start: Global row index to begin at (negative indexes from
-            the end, as with `list`).
+    Produced by `rsrch_data/scripts/export_in1k_array.py` from `ImageNet` or
+    `ImageNetParquet`, with every image already cropped/resized to the same
+    `(H, W)` -- meant for low-resolution (32/64/128px) training, where the
+    whole dataset fits as pixels and decoding would dominate the epoch.
+    Samples are in the source dataset's order.
+
+    Both arrays are memory-mapped: `__getitem__` returns zero-copy views,
+    and `gather` reads a whole batch with one fancy-index per array.
+
+    File structure:
+    ```
+    <data_root>/
+    ├── {split}_images.bin         # (N, H, W, 3) uint8, C order
+    ├── {split}_labels.bin         # (N,) int32
+    ├── {split}.json               # `ArrayMetadata`
+    └── LOC_synset_mapping.txt
+    ```
+    """
+
+    def __init__(
+        self,
+        data_root: str | Path,
+        split: Literal["train", "val"] = "train",
+    ) -> None:
+        """Memory-map the `split` arrays under `data_root` (no data read).
+
+        :param data_root: Directory written by `export_in1k_array.py`.
+        :param split: Which split's arrays to load.
+        """
+        self.root = Path(data_root).expanduser()
+        self.split = split
+
+        images_path, labels_path, meta_path = array_paths(self.root, split)
+        with meta_path.open() as f:
+            self._meta: ArrayMetadata = json.load(f)
+        shape = (self._meta["num_samples"], self._meta["height"], self._meta["width"])
+        self.images = np.memmap(
+            images_path, dtype=np.uint8, mode="r", shape=(*shape, 3)
+        )
+        self.labels = np.memmap(labels_path, dtype=np.int32, mode="r", shape=shape[:1])
+
+    def __len__(self) -> int:
+        """Return total number of samples."""
+        return len(self.labels)
+
+    def __getitem__(self, idx: int) -> ArraySample:
+        """Return sample `idx`, with the image as a view into the memmap."""
+        return {"image": self.images[idx], "label": int(self.labels[idx])}
+
+    def gather(self, indices: Sequence[int] | np.ndarray) -> ArrayBatch:
+        """Read the samples at `indices` as one stacked batch.
+
+        :param indices: Sample indices, in the order wanted in the batch
+            (duplicates and negative indices allowed, as with NumPy).
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        return {
+            "image": np.asarray(self.images[indices]),
+            "label": np.asarray(self.labels[indices]),
+        }
+
+    def __getitems__(self, indices: Sequence[int] | np.ndarray) -> ArrayBatch:
+        """Batch API shared with the in-memory datasets -- same as `gather`.
+
+        PyTorch's map-style `DataLoader` calls this, when defined, instead of
+        `__getitem__` per index, and passes the already-stacked batch to
+        `collate_fn` -- so pass e.g. `collate_fn=torch.utils.data.default_convert`
+        rather than relying on `default_collate`.
         """
-        if start < 0:
-            start += len(self)
-        if not 0 <= start <= len(self):
-            msg = f"start={start} out of range for {self!r}"
-            raise IndexError(msg)
-        if start == len(self):
-            return
-
-        file_idx, row_group_idx, local_offset = self._locate(start)
-        while file_idx < len(self.files):
-            pf = pq.ParquetFile(self.files[file_idx])
-            table = pf.read_row_group(row_group_idx, columns=list(_NEEDED_COLUMNS))
-            for row in range(local_offset, table.num_rows):
-                yield self._row_to_sample(table, row)
-            local_offset = 0
-            row_group_idx += 1
-            if row_group_idx >= len(self._row_group_rows[file_idx]):
-                row_group_idx = 0
-                file_idx += 1
-
-    def __iter__(self) -> Iterator[ParquetSample]:
-        """Iterate every sample sequentially, from the start."""
-        return self.iter_from(0)
+        return self.gather(indices)
+
+    def array_meta(self) -> ArrayMetadata:
+        """Return the JSON sidecar: image size and export settings."""
+        return self._meta
 
     def meta(self) -> Metadata:
         """Build image-classification metadata from the synset mapping file."""
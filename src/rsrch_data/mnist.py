@@ -10,7 +10,8 @@ from PIL import Image
 from ruamel.yaml import YAML
 
 from rsrch_data.registry import register_dataset
-from rsrch_data.types.image_cls import Metadata, Sample
+from rsrch_data.types.image_cls import ArrayBatch, ArraySample, Metadata, Sample
+from rsrch_data.utils.npy_cache import cached_npy_arrays
 
 
 def load_idx(fp: IO[bytes]) -> np.ndarray:
@@ -44,7 +45,8 @@ class MNIST(Sequence):
     ├── train-labels-idx1-ubyte
     ├── t10k-labels-idx1-ubyte
     ├── train-images-idx3-ubyte
-    └── t10k-images-idx3-ubyte
+    ├── t10k-images-idx3-ubyte
+    └── _{split}_npy/              # `.npy` conversion, made on first load
     ```
     """
 
@@ -52,25 +54,77 @@ class MNIST(Sequence):
         self,
         data_root: str | Path,
         split: Literal["train", "test"] = "train",
+        *,
+        as_array: bool = False,
+        cache: bool = True,
     ):
-        """Load MNIST images/labels for `split` from `data_root`."""
+        """Load MNIST images/labels for `split` from `data_root`.
+
+        :param as_array: Return each sample's image as a `(28, 28)` uint8 array
+            view instead of a PIL image (see also `gather`).
+        :param cache: Parse the IDX files only once, then memory-map the
+            converted arrays from `_{split}_npy/` (see `cached_npy_arrays`).
+        """
         data_root = Path(data_root)
+        self.as_array = as_array
         prefix = {"train": "train", "test": "t10k"}[split]
-
-        with (data_root / f"{prefix}-images-idx3-ubyte").open("rb") as f:
-            self.images = load_idx(f)
-
-        with (data_root / f"{prefix}-labels-idx1-ubyte").open("rb") as f:
-            self.labels = load_idx(f)
+        sources = {
+            "images": data_root / f"{prefix}-images-idx3-ubyte",
+            "labels": data_root / f"{prefix}-labels-idx1-ubyte",
+        }
+
+        def convert() -> dict[str, np.ndarray]:
+            arrays = {}
+            for name, path in sources.items():
+                with path.open("rb") as f:
+                    arrays[name] = load_idx(f)
+            return arrays
+
+        arrays = (
+            cached_npy_arrays(
+                data_root / f"_{split}_npy", list(sources.values()), convert
+            )
+            if cache
+            else convert()
+        )
+        self.images = arrays["images"]
+        self.labels = arrays["labels"]
 
     def __len__(self):
         return len(self.labels)
 
-    def __getitem__(self, index: int) -> Sample:
+    def __getitem__(self, index: int) -> Sample | ArraySample:
+        if self.as_array:
+            return {"image": self.images[index], "label": int(self.labels[index])}
         image = Image.fromarray(self.images[index])
         label = self.labels[index]
         return {"image": image, "label": label}
 
+    def gather(self, indices: Sequence[int] | np.ndarray) -> ArrayBatch:
+        """Return the samples at `indices` as stacked arrays (in either mode).
+
+        :param indices: Sample indices, in batch order.
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        return {"image": self.images[indices], "label": self.labels[indices]}
+
+    def __getitems__(
+        self, indices: Sequence[int] | np.ndarray
+    ) -> ArrayBatch | list[Sample]:
+        """Return the samples at `indices`: `gather`'s batch if `as_array`.
+
+        PyTorch's map-style `DataLoader` calls this, when defined, instead of
+        `__getitem__` per index, and passes the result to `collate_fn`.
+        Without `as_array`, it's a list of samples (PIL images), as
+        `default_collate` expects; with it, an already-stacked batch, so pass
+        e.g. `collate_fn=torch.utils.data.default_convert`.
+
+        :param indices: Sample indices, in batch order.
+        """
+        if not self.as_array:
+            return [self[int(index)] for index in indices]
+        return self.gather(indices)
+
     @staticmethod
     def meta() -> Metadata:
         """Return class metadata loaded from the bundled YAML."""
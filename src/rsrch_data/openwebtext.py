@@ -3,7 +3,7 @@
 from pathlib import Path
 from typing import Literal, TypedDict
 
-from rsrch_data.parquet import ParquetDataset
+from rsrch_data.parquet import Filters, ParquetDataset
 from rsrch_data.registry import register_dataset
 
 
@@ -22,10 +22,20 @@ class OpenWebText(ParquetDataset[Sample]):
         data_root: str | Path,
         batch_size: int,
         split: Literal["train"] = "train",
+        filters: Filters | None = None,
+        num_threads: int = 0,
     ):
-        """Load the OpenWebText `split` parquet shards from `data_root`."""
+        """Load the OpenWebText `split` parquet shards from `data_root`.
+
+        See `ParquetDataset` for `filters`/`num_threads`.
+        """
         data_root = Path(data_root)
         pq_files = sorted([*(data_root / "plain_text").glob(f"{split}-*.parquet")])
-        super().__init__(pq_files, batch_size=batch_size)
+        super().__init__(
+            pq_files,
+            batch_size=batch_size,
+            filters=filters,
+            num_threads=num_threads,
+        )
         self.data_root = data_root
         self.split = split
@@ -1,69 +1,190 @@
 """Generic iterable loader for Parquet files."""
 
-from collections.abc import Iterable, Iterator
+import itertools
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Generic, TypeVar
+from typing import Any, Generic, TypeVar
 
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pads
 import pyarrow.parquet as pq
 
 SampleT = TypeVar("SampleT")
 
+Filters = pc.Expression | list[tuple[str, str, Any]] | list[list[tuple[str, str, Any]]]
+"""Row filter: either a `pyarrow.compute.Expression`, or DNF `(column, op, value)`
+tuples as accepted by `pq.read_table(filters=...)`, e.g.
+`[("language_score", ">=", 0.9), ("dump", "in", {"CC-MAIN-2024-10"})]`."""
+
 
 class ParquetDataset(Iterable[SampleT], Generic[SampleT]):
     """Iterates over one or more Parquet files."""
 
-    def __init__(self, pq_files: list[str | Path], batch_size: int):
-        """Wrap a list of Parquet files, iterated in `batch_size` row batches."""
+    def __init__(
+        self,
+        pq_files: list[str | Path],
+        batch_size: int,
+        columns: Sequence[str] | None = None,
+        filters: Filters | None = None,
+        num_threads: int = 0,
+    ):
+        """Wrap a list of Parquet files, iterated in `batch_size` row batches.
+
+        :param pq_files: Parquet files, iterated in this order.
+        :param batch_size: Rows decoded per batch.
+        :param columns: If given, only these columns are decoded -- samples
+            then only carry these keys.
+        :param filters: If given, only rows matching it are yielded (and
+            counted by `len`/`iter_from`). Pushed down to pyarrow: row groups
+            whose column statistics rule out any match are skipped without
+            being read, and filter-only columns needn't be in `columns`.
+        :param num_threads: If positive, decode up to this many upcoming row
+            groups (across file boundaries) concurrently on a thread pool --
+            pyarrow releases the GIL while decompressing -- while still
+            yielding rows in exact global order. `0` reads serially on the
+            calling thread.
+        """
         self._pq_files = pq_files
         self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.columns = list(columns) if columns is not None else None
+        if filters is not None and not isinstance(filters, pc.Expression):
+            filters = pq.filters_to_expression(filters)
+        self.filter: pc.Expression | None = filters
 
     def __len__(self) -> int:
-        total = 0
-        for pq_file_path in self._pq_files:
-            pf = pq.ParquetFile(pq_file_path)
-            total += pf.metadata.num_rows
-        return total
+        if self.filter is None:
+            total = 0
+            for pq_file_path in self._pq_files:
+                pf = pq.ParquetFile(pq_file_path)
+                total += pf.metadata.num_rows
+            return total
+        return sum(self._num_rows(fragment) for fragment in self._row_groups())
 
     def __iter__(self) -> Iterator[SampleT]:
         return self.iter_from(0)
 
+    def _row_groups(self) -> Iterator[pads.ParquetFileFragment]:
+        """Yield one fragment per row group across all files, in order.
+
+        With a filter set, row groups its statistics rule out are dropped
+        here, from footer metadata alone.
+        """
+        for pq_file_path in self._pq_files:
+            dataset = pads.dataset(pq_file_path, format="parquet")
+            for fragment in dataset.get_fragments():
+                yield from fragment.split_by_row_group(self.filter)
+
+    def _num_rows(self, fragment: pads.ParquetFileFragment) -> int:
+        """Count `fragment`'s rows, after filtering.
+
+        Footer metadata only when unfiltered; otherwise only the filter's own
+        columns are read.
+        """
+        if self.filter is None:
+            return fragment.row_groups[0].num_rows
+        return fragment.count_rows(filter=self.filter)
+
     def _iter_batches_from(
-        self, pf: pq.ParquetFile, local_offset: int
+        self, fragment: pads.ParquetFileFragment, local_offset: int
     ) -> Iterator[SampleT]:
-        for batch in pf.iter_batches(self.batch_size):
+        batches = fragment.to_batches(
+            columns=self.columns, filter=self.filter, batch_size=self.batch_size
+        )
+        for batch in batches:
             if local_offset >= batch.num_rows:
                 local_offset -= batch.num_rows
                 continue
-            yield from batch.to_pylist()[local_offset:]
+            yield from batch.slice(local_offset).to_pylist()
             local_offset = 0
 
+    def _read_row_group(
+        self, fragment: pads.ParquetFileFragment, local_offset: int
+    ) -> pa.Table:
+        # Runs on a pool thread; pyarrow's own intra-fragment threading is
+        # off, since parallelism here comes from decoding several row groups
+        # at once.
+        table = fragment.to_table(
+            columns=self.columns, filter=self.filter, use_threads=False
+        )
+        return table.slice(local_offset)
+
+    def _iter_row_groups(
+        self, row_groups: Iterator[tuple[pads.ParquetFileFragment, int]]
+    ) -> Iterator[SampleT]:
+        """Yield the samples of `(fragment, local_offset)` pairs, in order.
+
+        With `num_threads > 0`, keeps that many row groups decoding ahead of
+        the consumer, so at most `num_threads` decoded row groups are held in
+        memory at a time. Conversion to Python objects needs the GIL
+        regardless, so it stays on the calling thread, one `batch_size`
+        batch at a time.
+        """
+        if self.num_threads <= 0:
+            for fragment, local_offset in row_groups:
+                yield from self._iter_batches_from(fragment, local_offset)
+            return
+
+        pending: deque[Future[pa.Table]] = deque()
+        with ThreadPoolExecutor(self.num_threads) as pool:
+            try:
+                for fragment, local_offset in row_groups:
+                    pending.append(
+                        pool.submit(self._read_row_group, fragment, local_offset)
+                    )
+                    if len(pending) >= self.num_threads:
+                        yield from self._table_to_samples(pending.popleft().result())
+                while pending:
+                    yield from self._table_to_samples(pending.popleft().result())
+            finally:
+                # If the consumer stops early, don't decode row groups that
+                # will never be read.
+                for future in pending:
+                    future.cancel()
+
+    def _table_to_samples(self, table: pa.Table) -> Iterator[SampleT]:
+        for batch in table.to_batches(max_chunksize=self.batch_size):
+            yield from batch.to_pylist()
+
     def iter_from(self, start: int = 0) -> Iterator[SampleT]:
         """Iterate samples sequentially, starting at global row `start`.
 
-        File boundaries are skipped for free via each file's row count
-        (Parquet footer metadata, no data read); the target file is then
-        read in `batch_size` batches as usual, discarding whole batches
-        until `start`'s row is reached -- wasted reads are bounded to at
-        most one file's worth, not the whole dataset.
+        Row-group boundaries are skipped for free via the row counts in each
+        file's Parquet footer (no data read); reading then starts at the row
+        group containing `start`'s row, in `batch_size` batches as usual,
+        discarding rows only up to `start` within that group -- wasted reads
+        are bounded to at most one row group's worth, not one file's (as
+        with `ImageNetParquet.iter_from`).
+
+        With a filter set, `start` counts *matching* rows, so a resumed run
+        picks up exactly where a previous one stopped yielding. Skipping a
+        row group then costs reading its filter columns (only), unless its
+        statistics already rule it out.
 
         :param start: Global row index to begin at.
         """
         if start < 0:
             start += len(self)
-        if not 0 <= start <= len(self):
+        if start < 0:
             msg = f"start={start} out of range for {self!r}"
             raise IndexError(msg)
-        if start == len(self):
-            return
 
         remaining = start
-        for file_idx, pq_file_path in enumerate(self._pq_files):
-            pf = pq.ParquetFile(pq_file_path)
-            file_rows = pf.metadata.num_rows
-            if remaining >= file_rows:
-                remaining -= file_rows
+        fragments = self._row_groups()
+        for fragment in fragments:
+            group_rows = self._num_rows(fragment)
+            if remaining >= group_rows:
+                remaining -= group_rows
                 continue
-            yield from self._iter_batches_from(pf, remaining)
-            for next_path in self._pq_files[file_idx + 1 :]:
-                yield from self._iter_batches_from(pq.ParquetFile(next_path), 0)
+            rest = ((next_fragment, 0) for next_fragment in fragments)
+            yield from self._iter_row_groups(
+                itertools.chain([(fragment, remaining)], rest)
+            )
             return
+
+        if remaining > 0:
+            msg = f"start={start} out of range for {self!r}"
+            raise IndexError(msg)
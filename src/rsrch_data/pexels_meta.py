@@ -1,9 +1,10 @@
 """Pexels photo metadata loader."""
 
+from collections.abc import Sequence
 from pathlib import Path
 from typing import TypedDict
 
-from rsrch_data.parquet import ParquetDataset
+from rsrch_data.parquet import Filters, ParquetDataset
 from rsrch_data.registry import register_dataset
 
 
@@ -28,8 +29,20 @@ class PexelsMeta(ParquetDataset[Sample]):
         self,
         data_root: str | Path,
         batch_size: int,
+        columns: Sequence[str] | None = None,
+        filters: Filters | None = None,
+        num_threads: int = 0,
     ):
-        """Load the Pexels photo metadata parquet file from `data_root`."""
+        """Load the Pexels photo metadata parquet file from `data_root`.
+
+        See `ParquetDataset` for `columns`/`filters`/`num_threads`.
+        """
         data_root = Path(data_root)
-        super().__init__([data_root / "photos_sequential.parquet"], batch_size)
+        super().__init__(
+            [data_root / "photos_sequential.parquet"],
+            batch_size,
+            columns=columns,
+            filters=filters,
+            num_threads=num_threads,
+        )
         self.data_root = data_root
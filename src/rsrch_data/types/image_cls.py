@@ -5,6 +5,7 @@ from functools import cached_property
 from pprint import pformat
 from typing import TypedDict
 
+import numpy as np
 from PIL import Image
 
 from .utils import is_contiguous
@@ -17,6 +18,28 @@ class Sample(TypedDict):
     label: int
 
 
+class ArraySample(TypedDict):
+    """An image classification sample with the image as a raw array.
+
+    :param image: `(H, W)` or `(H, W, C)` uint8 array -- typically a
+        read-only view into the dataset's storage (no copy).
+    """
+
+    image: np.ndarray
+    label: int
+
+
+class ArrayBatch(TypedDict):
+    """A stacked batch of image classification samples.
+
+    :param image: `(B, H, W)` or `(B, H, W, C)` uint8.
+    :param label: `(B,)` integer labels.
+    """
+
+    image: np.ndarray
+    label: np.ndarray
+
+
 class Metadata:
     """Metadata for image classification."""
 
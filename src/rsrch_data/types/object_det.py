@@ -5,6 +5,7 @@ from functools import cached_property
 from pprint import pformat
 from typing import NamedTuple, TypedDict
 
+import numpy as np
 from PIL import Image
 
 from .utils import is_contiguous
@@ -33,6 +34,55 @@ class Sample(TypedDict):
     dets: list[Detection]
 
 
+class ArraySample(TypedDict):
+    """An object detection sample with its annotations as arrays.
+
+    :param boxes: `(N, 4)` float32 boxes, as `(x, y, width, height)`.
+    :param labels: `(N,)` int64 category ids.
+    :param iscrowd: `(N,)` bool crowd flags.
+    """
+
+    image: Image.Image
+    boxes: np.ndarray
+    labels: np.ndarray
+    iscrowd: np.ndarray
+
+
+class PaddedBatch(TypedDict):
+    """A batch of `ArraySample`s, with annotations padded to a common length.
+
+    :param image: The batch's images.
+    :param boxes: `(B, N_max, 4)` float32, zero-padded.
+    :param labels: `(B, N_max)` int64, padded with the collate's `pad_label`.
+    :param iscrowd: `(B, N_max)` bool, padded with False.
+    :param num_boxes: `(B,)` int64 number of real (non-padding) boxes.
+    """
+
+    image: list[Image.Image]
+    boxes: np.ndarray
+    labels: np.ndarray
+    iscrowd: np.ndarray
+    num_boxes: np.ndarray
+
+
+class ConcatBatch(TypedDict):
+    """A batch of `ArraySample`s, with annotations concatenated.
+
+    :param image: The batch's images.
+    :param boxes: `(M, 4)` float32, every sample's boxes in batch order.
+    :param labels: `(M,)` int64.
+    :param iscrowd: `(M,)` bool.
+    :param offsets: `(B + 1,)` int64 -- sample `i`'s annotations are rows
+        `offsets[i]:offsets[i + 1]`.
+    """
+
+    image: list[Image.Image]
+    boxes: np.ndarray
+    labels: np.ndarray
+    iscrowd: np.ndarray
+    offsets: np.ndarray
+
+
 class Metadata:
     """Metadata for object detection."""
 
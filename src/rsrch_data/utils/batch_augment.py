@@ -0,0 +1,219 @@
+"""Vectorized augmentation of whole image batches.
+
+The ops here take a `(B, H, W)` or `(B, H, W, C)` uint8 batch -- e.g. the
+`"image"` of a `CIFAR10`/`CIFAR100`/`MNIST` `gather` batch -- draw every
+sample's random parameters in one call to a `np.random.Generator`, and apply
+them with array indexing, so the per-batch cost is a handful of NumPy calls
+instead of a Python-level loop over PIL images. `BatchAugment` chains them
+into the usual small-image training recipe (pad-and-crop, flip, cutout,
+normalize).
+
+Inputs are never modified (they are often read-only memmaps); every op
+returns a new array.
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+
+
+def _rows(images: np.ndarray) -> np.ndarray:
+    """Return `images` as `(B, H, W * C)` -- each image row one run of bytes.
+
+    Elementwise ops on this view have a long contiguous inner loop, rather
+    than NumPy's slow per-pixel loop over 1-3 channels.
+    """
+    return np.ascontiguousarray(images).reshape(*images.shape[:2], -1)
+
+
+def _mirror(images: np.ndarray, flip: np.ndarray) -> None:
+    """Mirror `images[flip]` left-to-right, in place."""
+    index = np.flatnonzero(flip)
+    width = images.shape[2]
+    channels = int(np.prod(images.shape[3:]))
+    # Reverse the pixel order, but not the channel order within each pixel.
+    perm = (np.arange(width)[::-1, None] * channels + np.arange(channels)).ravel()
+    rows = images.reshape(*images.shape[:2], -1)
+    rows[index] = rows[index][:, :, perm]
+
+
+def _crop(
+    images: np.ndarray, padding: int, fill: int, top: np.ndarray, left: np.ndarray
+) -> np.ndarray:
+    """Pad `images` by `padding` per side and crop each back at `(top, left)`."""
+    num, height, width = images.shape[:3]
+    pad_width = [(0, 0), (padding, padding), (padding, padding)]
+    pad_width += [(0, 0)] * (images.ndim - 3)
+    padded = np.pad(images, pad_width, constant_values=fill)
+    # `windows[b, y, x]` is row `y` of image `b`, starting at column `x` -- so
+    # the crops are gathered a whole row at a time, not pixel by pixel.
+    strides = padded.strides
+    windows = np.lib.stride_tricks.as_strided(
+        padded,
+        (num, height + 2 * padding, 2 * padding + 1, width, *images.shape[3:]),
+        (*strides[:3], *strides[2:]),
+        writeable=False,
+    )
+    rows = top[:, None] + np.arange(height)
+    return windows[np.arange(num)[:, None], rows, left[:, None]]
+
+
+def random_crop(
+    images: np.ndarray, padding: int, rng: np.random.Generator, *, fill: int = 0
+) -> np.ndarray:
+    """Pad each image by `padding` pixels on every side, then crop it back.
+
+    Crops are taken at independent uniformly random offsets, so each image is
+    shifted by up to `padding` pixels in each direction.
+
+    :param images: `(B, H, W)` or `(B, H, W, C)` batch.
+    :param padding: Pixels of padding per side.
+    :param rng: Generator to draw the offsets from.
+    :param fill: Value of the padding pixels.
+    """
+    top = rng.integers(0, 2 * padding + 1, size=len(images))
+    left = rng.integers(0, 2 * padding + 1, size=len(images))
+    return _crop(images, padding, fill, top, left)
+
+
+def random_flip(
+    images: np.ndarray, rng: np.random.Generator, p: float = 0.5
+) -> np.ndarray:
+    """Mirror each image left-to-right with probability `p`.
+
+    :param images: `(B, H, W)` or `(B, H, W, C)` batch.
+    :param rng: Generator to draw the flips from.
+    :param p: Flip probability.
+    """
+    out = images.copy()
+    _mirror(out, rng.random(len(images)) < p)
+    return out
+
+
+def cutout(
+    images: np.ndarray,
+    size: int,
+    rng: np.random.Generator,
+    *,
+    p: float = 1.0,
+    fill: int = 0,
+) -> np.ndarray:
+    """Fill a random `size x size` square of each image with `fill`.
+
+    Square centers are uniform over the image, and squares are clipped at its
+    borders (as in DeVries & Taylor, 2017).
+
+    :param images: `(B, H, W)` or `(B, H, W, C)` uint8 batch.
+    :param size: Side of the square, in pixels.
+    :param rng: Generator to draw the squares from.
+    :param p: Probability of applying cutout to each image.
+    :param fill: Value of the cut-out pixels.
+    """
+    num, height, width = images.shape[:3]
+    top = rng.integers(0, height, size=num) - size // 2
+    left = rng.integers(0, width, size=num) - size // 2
+    apply = rng.random(num) < p
+
+    rows = _rows(images)
+    channels = rows.shape[2] // width
+    ys = np.arange(height) - top[:, None]
+    xs = np.arange(rows.shape[2]) // channels - left[:, None]
+    in_rows = (ys >= 0) & (ys < size) & apply[:, None]
+    in_cols = (xs >= 0) & (xs < size)
+    # uint8 0/1 masks keep this a plain contiguous multiply(-add).
+    cut = (in_rows[:, :, None] & in_cols[:, None, :]).view(np.uint8)
+    out = rows * (1 - cut)
+    if fill:
+        out += cut * np.uint8(fill)
+    return out.reshape(images.shape)
+
+
+def normalize(
+    images: np.ndarray, mean: float | Sequence[float], std: float | Sequence[float]
+) -> np.ndarray:
+    """Scale uint8 pixels to `[0, 1]`, then standardize them per channel.
+
+    Computes `(images / 255 - mean) / std` as one multiply and one add, over
+    whole image rows at a time.
+
+    :param images: `(B, H, W)` or `(B, H, W, C)` uint8 batch.
+    :param mean: Per-channel (or scalar) mean, on the `[0, 1]` scale.
+    :param std: Per-channel (or scalar) standard deviation, likewise.
+    :return: float32 batch of the same shape.
+    """
+    rows = _rows(images)
+    mean = np.asarray(mean, dtype=np.float32)
+    std = np.asarray(std, dtype=np.float32)
+    # Repeat the per-channel constants along a row's `W * C` values.
+    scale = np.resize(1 / (255 * std), rows.shape[2])
+    bias = np.resize(mean / std, rows.shape[2])
+    out = np.multiply(rows, scale, dtype=np.float32)
+    out -= bias
+    return out.reshape(images.shape)
+
+
+class BatchAugment:
+    """The standard small-image training augmentation, applied per batch.
+
+    Random pad-and-crop, horizontal flip, then optional cutout and
+    normalization. Random parameters come from a
+    generator seeded with `seed`, so a run's augmentations are reproducible.
+
+    Example:
+    ```python
+    ds = CIFAR10(data_root, as_array=True)
+    augment = BatchAugment(
+        cutout_size=16, mean=(0.491, 0.482, 0.447), std=(0.247, 0.243, 0.262)
+    )
+    images = augment(ds.gather(indices)["image"])  # (B, 32, 32, 3) float32
+    ```
+
+    """
+
+    def __init__(
+        self,
+        *,
+        padding: int = 4,
+        flip: bool = True,
+        cutout_size: int = 0,
+        mean: float | Sequence[float] | None = None,
+        std: float | Sequence[float] | None = None,
+        fill: int = 0,
+        seed: int = 0,
+    ) -> None:
+        """Configure the augmentation pipeline.
+
+        :param padding: Pixels of padding per side for the random crop (0 to
+            disable cropping).
+        :param flip: Mirror half of the images left-to-right.
+        :param cutout_size: Side of the cutout square (0 to disable cutout).
+        :param mean: Per-channel mean on the `[0, 1]` scale; with `std`,
+            normalize to float32 (see `normalize`). Omit both to keep uint8.
+        :param std: Per-channel standard deviation, likewise.
+        :param fill: Value of the padding and cut-out pixels.
+        :param seed: Seed for the random parameters.
+        """
+        if (mean is None) != (std is None):
+            msg = "`mean` and `std` must be given together"
+            raise ValueError(msg)
+        self.padding = padding
+        self.flip = flip
+        self.cutout_size = cutout_size
+        self.mean = mean
+        self.std = std
+        self.fill = fill
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, images: np.ndarray) -> np.ndarray:
+        """Augment a `(B, H, W)` or `(B, H, W, C)` uint8 batch."""
+        if self.padding > 0:
+            images = random_crop(images, self.padding, self.rng, fill=self.fill)
+        if self.flip:
+            if self.padding == 0:
+                images = images.copy()
+            _mirror(images, self.rng.random(len(images)) < 0.5)
+        if self.cutout_size > 0:
+            images = cutout(images, self.cutout_size, self.rng, fill=self.fill)
+        if self.mean is not None:
+            images = normalize(images, self.mean, self.std)
+        return images
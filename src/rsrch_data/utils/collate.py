@@ -0,0 +1,66 @@
+"""Batch collation for samples with a variable number of annotations."""
+
+from collections.abc import Sequence
+from typing import Literal
+
+import numpy as np
+
+from rsrch_data.types.object_det import ArraySample, ConcatBatch, PaddedBatch
+
+
+def collate_detections(
+    samples: Sequence[ArraySample],
+    mode: Literal["pad", "concat"] = "pad",
+    *,
+    pad_label: int = -1,
+) -> PaddedBatch | ConcatBatch:
+    """Collate array-mode detection samples into one batch of arrays.
+
+    Each annotation field is concatenated across the batch in one call; in
+    `pad` mode the rows are then scattered into `(B, N_max, ...)` arrays in
+    one more, so the cost doesn't grow with the number of boxes per sample.
+
+    :param samples: Samples with `boxes`, `labels` and `iscrowd` arrays (e.g.
+        from `COCODetection` with `as_array=True`).
+    :param mode: `pad` for a `PaddedBatch`, `concat` for a `ConcatBatch`.
+    :param pad_label: Label of padding boxes, in `pad` mode.
+    """
+    counts = np.array([len(sample["boxes"]) for sample in samples], dtype=np.int64)
+    offsets = np.zeros(len(samples) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    images = [sample["image"] for sample in samples]
+    boxes = np.concatenate([sample["boxes"] for sample in samples]).astype(
+        np.float32, copy=False
+    )
+    labels = np.concatenate([sample["labels"] for sample in samples]).astype(
+        np.int64, copy=False
+    )
+    iscrowd = np.concatenate([sample["iscrowd"] for sample in samples]).astype(
+        bool, copy=False
+    )
+
+    if mode == "concat":
+        return {
+            "image": images,
+            "boxes": boxes,
+            "labels": labels,
+            "iscrowd": iscrowd,
+            "offsets": offsets,
+        }
+
+    max_boxes = int(counts.max(initial=0))
+    rows = np.repeat(np.arange(len(samples)), counts)
+    cols = np.arange(len(boxes)) - offsets[rows]
+    padded_boxes = np.zeros((len(samples), max_boxes, 4), dtype=np.float32)
+    padded_boxes[rows, cols] = boxes
+    padded_labels = np.full((len(samples), max_boxes), pad_label, dtype=np.int64)
+    padded_labels[rows, cols] = labels
+    padded_iscrowd = np.zeros((len(samples), max_boxes), dtype=bool)
+    padded_iscrowd[rows, cols] = iscrowd
+    return {
+        "image": images,
+        "boxes": padded_boxes,
+        "labels": padded_labels,
+        "iscrowd": padded_iscrowd,
+        "num_boxes": counts,
+    }
@@ -0,0 +1,218 @@
+"""Header-only image size probing, and aspect-ratio bucketed batching.
+
+`probe_image_size` reads an image's width/height from its first bytes (JPEG
+SOF segment / PNG IHDR chunk) without decoding anything, and
+`cached_image_sizes` runs it over a whole dataset on a thread pool, caching
+the resulting `(N, 2)` array next to the data. Datasets expose that as an
+`image_sizes()` method, which `AspectRatioBatchSampler` consumes.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import struct
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+from PIL import Image
+
+from rsrch_data.utils.misc import atomic_open
+
+_CACHE_VERSION = 1
+"""Bump whenever the cached size array's layout or contents change."""
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+"""Start-of-frame markers (every `0xCn` but DHT, JPG and DAC), whose segment
+holds the frame's height and width."""
+
+_JPEG_STANDALONE_MARKERS = frozenset([0x01, *range(0xD0, 0xDA)])
+"""Markers without a length field (TEM, RSTn, SOI, EOI)."""
+
+
+def _jpeg_size(f: BinaryIO) -> tuple[int, int] | None:
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":  # Fill bytes before the marker code.
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        header = f.read(2)
+        if len(header) < 2:
+            return None
+        (length,) = struct.unpack(">H", header)
+        if marker in _JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            _, height, width = struct.unpack(">BHH", frame)
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def probe_image_size(path: str | Path) -> tuple[int, int]:
+    """Return an image's `(width, height)` from its file header.
+
+    JPEG and PNG are parsed directly (a few reads, no decode); anything else
+    falls back to PIL, which also only reads the header.
+    """
+    with Path(path).open("rb") as f:
+        head = f.read(24)
+        if head.startswith(_PNG_SIGNATURE) and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head.startswith(b"\xff\xd8"):
+            size = _jpeg_size(f)
+            if size is not None:
+                return size
+    with Image.open(path) as image:
+        return image.size
+
+
+def probe_image_sizes(paths: Sequence[str | Path], num_threads: int = 32) -> np.ndarray:
+    """Probe every image's size on a thread pool (see `probe_image_size`).
+
+    :return: `(len(paths), 2)` int32 array of `(width, height)`.
+    """
+    sizes = np.empty((len(paths), 2), dtype=np.int32)
+    with ThreadPoolExecutor(num_threads) as pool:
+        for i, size in enumerate(pool.map(probe_image_size, paths)):
+            sizes[i] = size
+    return sizes
+
+
+def cached_image_sizes(
+    img_dir: str | Path,
+    file_names: Sequence[str],
+    cache_path: str | Path,
+    num_threads: int = 32,
+) -> np.ndarray:
+    """Return the sizes of `img_dir`'s `file_names`, probed only once.
+
+    The `(N, 2)` int32 `(width, height)` array is saved to `cache_path` (a
+    `.npy` file, memory-mapped on later calls) with a `.json` key beside it,
+    matched against `file_names` -- relative names, so the dataset can move.
+    If the directory isn't writable, the sizes are just probed every time.
+
+    :param img_dir: Directory the images are in.
+    :param file_names: Image paths relative to `img_dir`, in dataset order.
+    :param cache_path: Where to cache the sizes.
+    :param num_threads: Threads to probe headers with.
+    """
+    img_dir = Path(img_dir)
+    cache_path = Path(cache_path)
+    key_path = cache_path.with_suffix(".json")
+    key = {
+        "version": _CACHE_VERSION,
+        "num_images": len(file_names),
+        "file_names_sha256": hashlib.sha256("\0".join(file_names).encode()).hexdigest(),
+    }
+
+    with contextlib.suppress(FileNotFoundError), key_path.open() as f:
+        if json.load(f) == key:
+            return np.load(cache_path, mmap_mode="r")
+
+    sizes = probe_image_sizes([img_dir / name for name in file_names], num_threads)
+    # Read-only dataset: keep the probed sizes in memory.
+    with contextlib.suppress(OSError):
+        for path, save in (
+            (cache_path, lambda f: np.save(f, sizes)),
+            (key_path, lambda f: f.write(json.dumps(key).encode())),
+        ):
+            # Key last, so concurrent loaders never match a partial cache.
+            with atomic_open(path) as f:
+                save(f)
+    return sizes
+
+
+class AspectRatioBatchSampler:
+    """Batch sampler drawing each batch from a single aspect-ratio bucket.
+
+    Images are bucketed by `width / height`, then every batch is formed from
+    one bucket, so batches can be resized/padded to a shared shape with
+    little distortion or waste. Yields lists of dataset indices -- usable as
+    e.g. a PyTorch `DataLoader`'s `batch_sampler`.
+
+    With `shuffle`, indices are shuffled within buckets and the batches of
+    all buckets are interleaved at random, reproducibly from `seed` and the
+    epoch (see `set_epoch`).
+    """
+
+    def __init__(
+        self,
+        sizes: np.ndarray,
+        batch_size: int,
+        *,
+        num_buckets: int = 8,
+        bucket_edges: Sequence[float] | None = None,
+        shuffle: bool = True,
+        drop_last: bool = False,
+        seed: int = 0,
+    ) -> None:
+        """Bucket images by aspect ratio.
+
+        :param sizes: `(N, 2)` `(width, height)` array, as returned by a
+            dataset's `image_sizes()`.
+        :param batch_size: Indices per batch.
+        :param num_buckets: Number of equally-populated buckets (quantiles of
+            the aspect ratio) -- ignored if `bucket_edges` is given.
+        :param bucket_edges: Explicit increasing aspect-ratio (`w / h`)
+            boundaries between buckets, e.g. `(0.8, 1.25)` for portrait,
+            square-ish and landscape.
+        :param shuffle: Shuffle within buckets and across batches.
+        :param drop_last: Drop each bucket's last batch if it's incomplete.
+        :param seed: Base seed for shuffling.
+        """
+        sizes = np.asarray(sizes)
+        log_ratios = np.log(sizes[:, 0] / sizes[:, 1])
+        if bucket_edges is None:
+            quantiles = np.linspace(0, 1, num_buckets + 1)[1:-1]
+            log_edges = np.unique(np.quantile(log_ratios, quantiles))
+        else:
+            log_edges = np.log(np.asarray(bucket_edges, dtype=np.float64))
+        bucket_ids = np.digitize(log_ratios, log_edges)
+
+        order = np.argsort(bucket_ids, kind="stable")
+        _, starts = np.unique(bucket_ids[order], return_index=True)
+        self.buckets: list[np.ndarray] = np.split(order, starts[1:])
+        """Dataset indices in each (non-empty) bucket, in ascending order."""
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int) -> None:
+        """Set the epoch, which (with `seed`) determines the shuffle order."""
+        self.epoch = epoch
+
+    def __len__(self) -> int:
+        """Return the number of batches per epoch."""
+        if self.drop_last:
+            return sum(len(bucket) // self.batch_size for bucket in self.buckets)
+        return sum(-(-len(bucket) // self.batch_size) for bucket in self.buckets)
+
+    def __iter__(self) -> Iterator[list[int]]:
+        """Yield one epoch's batches of dataset indices."""
+        rng = np.random.default_rng([self.seed, self.epoch])
+        batches = []
+        for bucket in self.buckets:
+            indices = rng.permutation(bucket) if self.shuffle else bucket
+            for lo in range(0, len(indices), self.batch_size):
+                batch = indices[lo : lo + self.batch_size]
+                if len(batch) == self.batch_size or not self.drop_last:
+                    batches.append(batch.tolist())
+        if self.shuffle:
+            yield from (batches[i] for i in rng.permutation(len(batches)))
+        else:
+            yield from batches
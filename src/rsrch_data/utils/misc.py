@@ -1,6 +1,12 @@
 """Miscellaneous utility functions."""
 
+import os
 import re
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO
 
 
 def parse_size(size: str) -> int:
@@ -29,3 +35,24 @@ def parse_size(size: str) -> int:
     exp = {"K": 1, "M": 2, "G": 3, "T": 4, "P": 5}[prefix]
     base = 1000 if (has_b and not iec) else 1024
     return int(value * base**exp)
+
+
+@contextmanager
+def atomic_open(path: str | Path) -> Iterator[BinaryIO]:
+    """Open `path` for binary writing, replacing it only once fully written.
+
+    Writes go to a temporary file in the same directory, renamed over `path`
+    when the block exits cleanly (and deleted if it raises), so concurrent
+    readers see either the old file or the complete new one, never a
+    partial write.
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            os.fchmod(f.fileno(), 0o644)  # mkstemp's default is 0o600.
+            yield f
+        Path(tmp_path).replace(path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
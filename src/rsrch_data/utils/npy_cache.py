@@ -0,0 +1,70 @@
+"""One-time conversion of in-memory datasets to memory-mapped `.npy` files."""
+
+import contextlib
+import json
+from collections.abc import Callable, Sequence
+from pathlib import Path
+
+import numpy as np
+
+from rsrch_data.utils.misc import atomic_open
+
+_CACHE_VERSION = 1
+"""Bump whenever the layout of the converted arrays changes."""
+
+
+def stat_key(sources: Sequence[Path]) -> dict[str, list[int]]:
+    """Return `{name: [size, mtime_ns]}` of `sources`, to detect changes."""
+    return {
+        path.name: [path.stat().st_size, path.stat().st_mtime_ns] for path in sources
+    }
+
+
+def cached_npy_arrays(
+    cache_dir: str | Path,
+    sources: Sequence[Path],
+    convert: Callable[[], dict[str, np.ndarray]],
+    version: int = 0,
+) -> dict[str, np.ndarray]:
+    """Load arrays converted from `sources`, converting only the first time.
+
+    `convert` (which should verify `sources`, e.g. by checksum, and parse
+    them) runs once; its arrays are saved as `{cache_dir}/{name}.npy`, and a
+    `ledger.json` recording every source's size and mtime is written last.
+    Later calls whose sources still match the ledger skip straight to
+    `np.load(mmap_mode="r")` -- no reading, hashing or parsing, and all
+    processes share the same page cache. Any change to a source reruns
+    `convert`. If `cache_dir` can't be written, `convert`'s arrays are just
+    returned as-is.
+
+    :param cache_dir: Directory for the `.npy` files and ledger.
+    :param sources: Files the arrays are derived from.
+    :param convert: Verifies and loads `sources`, returning named arrays.
+    :param version: Version of `convert`'s output format -- bump it to
+        invalidate caches written by an older layout.
+    """
+    cache_dir = Path(cache_dir)
+    ledger_path = cache_dir / "ledger.json"
+    key = {
+        "version": [_CACHE_VERSION, version],
+        "sources": stat_key(sources),
+    }
+
+    with contextlib.suppress(FileNotFoundError), ledger_path.open() as f:
+        ledger = json.load(f)
+        if {k: ledger[k] for k in key if k in ledger} == key:
+            return {
+                name: np.load(cache_dir / f"{name}.npy", mmap_mode="r")
+                for name in ledger["arrays"]
+            }
+
+    arrays = convert()
+    # Read-only dataset: keep the converted arrays in memory.
+    with contextlib.suppress(OSError):
+        cache_dir.mkdir(exist_ok=True)
+        for name, array in arrays.items():
+            with atomic_open(cache_dir / f"{name}.npy") as f:
+                np.save(f, np.ascontiguousarray(array))
+        with atomic_open(ledger_path) as f:
+            f.write(json.dumps(key | {"arrays": list(arrays)}).encode())
+    return arrays
@@ -0,0 +1,38 @@
+"""Compact string sequences, for memory-mapped dataset indexes."""
+
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class PackedStrings(Sequence):
+    """Read-only sequence of strings stored as one UTF-8 buffer plus offsets.
+
+    Both arrays can be memory-mapped, so a few million strings cost no Python
+    objects (and no memory per process) until they are accessed.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray) -> None:
+        """Wrap `data`, a uint8 buffer, and its `len + 1` int64 `offsets`."""
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            msg = f"Index {idx} out of range"
+            raise IndexError(msg)
+        lo, hi = self._offsets[idx], self._offsets[idx + 1]
+        return self._data[lo:hi].tobytes().decode()
+
+
+def pack_strings(strings: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Encode `strings` into the `(data, offsets)` arrays of `PackedStrings`."""
+    encoded = [string.encode() for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
@@ -0,0 +1,188 @@
+"""Sequential reader base for pre-shuffled, sharded Parquet datasets."""
+
+import bisect
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Generic, TypeVar
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .parquet_writer import summary_path
+
+SampleT = TypeVar("SampleT")
+
+
+class ParquetShards(ABC, Iterable[SampleT], Generic[SampleT]):
+    """Sequential-only reader over `{split}-*.parquet` shards.
+
+    The shards are the output of `write_sharded_parquet` -- rows pre-shuffled
+    by the pack script, so they're meant to be read back in order, one row
+    group at a time. Subclasses pick the columns to read (`columns`) and turn
+    each row group into samples (`_samples`).
+    """
+
+    columns: Sequence[str] | None = None
+    """Columns read from each row group (default: all of them)."""
+
+    def __init__(
+        self,
+        data_root: str | Path,
+        split: str,
+        *,
+        prefetch: int = 1,
+    ) -> None:
+        """Index parquet shard footers (no data read) for `split`.
+
+        If the `_{split}_metadata` summary (see `IndexOptions.summary`)
+        exists, the whole index comes from that one file; otherwise every
+        shard's footer is read. So is a summary that looks stale -- one
+        listing other files than `{split}-*.parquet`, or older than any of
+        them (i.e. left over from before the shards were rewritten).
+
+        :param data_root: Directory of Parquet shards.
+        :param split: Which split's shards to load.
+        :param prefetch: Row groups to read ahead, on a background thread,
+            of the one being iterated -- so I/O and decompression overlap
+            with the consumer (pyarrow releases the GIL while reading).
+            `0` reads each row group on the calling thread, when needed.
+        """
+        self.root = Path(data_root).expanduser()
+        self.split = split
+        self.prefetch = prefetch
+
+        # Cumulative row offsets per file, and per-row-group row counts within
+        # each file -- built entirely from parquet footers, no data read.
+        files = sorted(self.root.glob(f"{split}-*.parquet"))
+        summary = summary_path(self.root, split)
+        index = self._index_summary(summary, files) if summary.exists() else None
+        if index is None:
+            index = self._index_footers(files)
+        self.files, self._row_group_rows = index
+        if not self.files:
+            msg = f"No {split}-*.parquet shards found under {self.root}"
+            raise FileNotFoundError(msg)
+
+        self._offsets = [0]
+        for group_rows in self._row_group_rows:
+            self._offsets.append(self._offsets[-1] + sum(group_rows))
+
+    def _index_footers(self, files: list[Path]) -> tuple[list[Path], list[list[int]]]:
+        row_group_rows = []
+        for file in files:
+            metadata = pq.ParquetFile(file).metadata
+            row_group_rows.append(
+                [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+            )
+        return files, row_group_rows
+
+    def _index_summary(
+        self, summary: Path, shards: list[Path]
+    ) -> tuple[list[Path], list[list[int]]] | None:
+        """Index `shards` from `summary`, or return `None` if it's stale."""
+        summary_mtime = summary.stat().st_mtime
+        if any(shard.stat().st_mtime > summary_mtime for shard in shards):
+            return None
+        metadata = pq.read_metadata(summary)
+        files: list[Path] = []
+        row_group_rows: list[list[int]] = []
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            file = self.root / row_group.column(0).file_path
+            if not files or files[-1] != file:
+                files.append(file)
+                row_group_rows.append([])
+            row_group_rows[-1].append(row_group.num_rows)
+        if files != shards:
+            return None
+        return files, row_group_rows
+
+    def __len__(self) -> int:
+        """Return total number of samples across all shards."""
+        return self._offsets[-1]
+
+    def _locate(self, idx: int) -> tuple[int, int, int]:
+        """Map a global row index to (file_idx, row_group_idx, local_offset)."""
+        file_idx = bisect.bisect_right(self._offsets, idx) - 1
+        offset_in_file = idx - self._offsets[file_idx]
+        for row_group_idx, num_rows in enumerate(self._row_group_rows[file_idx]):
+            if offset_in_file < num_rows:
+                return file_idx, row_group_idx, offset_in_file
+            offset_in_file -= num_rows
+        msg = f"Index {idx} out of range for {self!r}"
+        raise IndexError(msg)
+
+    @abstractmethod
+    def _samples(self, table: pa.Table, start: int) -> Iterator[SampleT]:
+        """Yield the samples of rows `start:` of one row group's `table`."""
+
+    def _row_groups(
+        self, file_idx: int, row_group_idx: int
+    ) -> Iterator[tuple[pq.ParquetFile, int]]:
+        """Yield every row group from the given one on, opening each file once."""
+        for file, group_rows in zip(
+            self.files[file_idx:], self._row_group_rows[file_idx:], strict=True
+        ):
+            pf = pq.ParquetFile(file)
+            for group in range(row_group_idx, len(group_rows)):
+                yield pf, group
+            row_group_idx = 0
+
+    def _read_row_group(self, pf: pq.ParquetFile, row_group_idx: int) -> pa.Table:
+        columns = list(self.columns) if self.columns is not None else None
+        return pf.read_row_group(row_group_idx, columns=columns)
+
+    def iter_from(self, start: int = 0) -> Iterator[SampleT]:
+        """Iterate samples sequentially, starting at global row `start`.
+
+        Reads one row group at a time, in order (up to `prefetch` of them
+        ahead), with no cache and no lock: this is meant for exactly one
+        sequential reader (see class docstring), so there's nothing to
+        coordinate. `start` costs one `_locate` bisect (no data read) -- the
+        first row group read then lands exactly on `start`'s row group, not
+        row 0, so resuming mid-run is cheap regardless of how far in `start`
+        is.
+
+        :param start: Global row index to begin at (negative indexes from
+            the end, as with `list`).
+        """
+        if start < 0:
+            start += len(self)
+        if not 0 <= start <= len(self):
+            msg = f"start={start} out of range for {self!r}"
+            raise IndexError(msg)
+        if start == len(self):
+            return
+
+        file_idx, row_group_idx, local_offset = self._locate(start)
+        row_groups = self._row_groups(file_idx, row_group_idx)
+        if self.prefetch <= 0:
+            for pf, group in row_groups:
+                yield from self._samples(self._read_row_group(pf, group), local_offset)
+                local_offset = 0
+            return
+
+        pending: deque[Future[pa.Table]] = deque()
+        with ThreadPoolExecutor(1) as pool:
+            try:
+                for pf, group in row_groups:
+                    pending.append(pool.submit(self._read_row_group, pf, group))
+                    if len(pending) > self.prefetch:
+                        table = pending.popleft().result()
+                        yield from self._samples(table, local_offset)
+                        local_offset = 0
+                while pending:
+                    yield from self._samples(pending.popleft().result(), local_offset)
+                    local_offset = 0
+            finally:
+                # If the consumer stops early, don't read row groups that
+                # will never be used.
+                for future in pending:
+                    future.cancel()
+
+    def __iter__(self) -> Iterator[SampleT]:
+        """Iterate every sample sequentially, from the start."""
+        return self.iter_from(0)
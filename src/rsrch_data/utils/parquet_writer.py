@@ -1,23 +1,385 @@
 """Generic helper for writing rows to size-capped, row-grouped Parquet shards."""
 
+import json
 import os
 import shutil
 import tempfile
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
 
 import pyarrow as pa
 import pyarrow.parquet as pq
 
+Chunk = dict | pa.RecordBatch | pa.Table
+"""One `write_sharded_parquet` input item: a row dict (or, with `columnar=True`,
+a column dict of equal-length lists), or an Arrow batch/table of rows."""
 
-def write_sharded_parquet(  # noqa: C901
-    rows: Iterable[dict],
+Rows = Iterable[Chunk] | Callable[[int], Iterable[Chunk]]
+"""`write_sharded_parquet` input: an iterable of chunks, or a callable returning
+one that starts at the given row index (needed to resume from a journal)."""
+
+
+@dataclass(frozen=True)
+class IndexOptions:
+    """Read-acceleration metadata to write alongside the shards' data.
+
+    :param statistics: Write min/max column statistics for every column
+        (`True`), none (`False`), or only the named ones -- readers use them
+        to skip row groups a filter rules out. Worth restricting for large
+        binary columns (e.g. JPEG bytes), whose min/max is useless.
+    :param page_index: Write a page index (column + offset index) for the
+        columns with statistics, so readers can also skip individual pages
+        within a row group.
+    :param bloom_filters: Columns to write per-row-group Bloom filters for --
+        point lookups on high-cardinality id columns, which min/max
+        statistics can't prune. Needs pyarrow>=24.
+    :param summary: Also write a `_{prefix}_metadata` file: every shard's
+        footer (row groups, row counts, statistics) concatenated into one
+        Parquet metadata file, with each row group pointing at its shard --
+        so readers can plan the whole dataset from one small read.
+    """
+
+    statistics: bool | tuple[str, ...] = True
+    page_index: bool = False
+    bloom_filters: tuple[str, ...] = ()
+    summary: bool = False
+
+    def writer_kwargs(self, row_group_size: int) -> dict:
+        """Build the matching `pq.ParquetWriter` keyword arguments."""
+        kwargs = {
+            "write_statistics": (
+                self.statistics
+                if isinstance(self.statistics, bool)
+                else list(self.statistics)
+            ),
+            "write_page_index": self.page_index,
+        }
+        if self.bloom_filters:
+            if int(pa.__version__.split(".")[0]) < 24:
+                msg = f"Bloom filters need pyarrow>=24 (have {pa.__version__})"
+                raise RuntimeError(msg)
+            # Filters are per row group, so that's how many distinct values
+            # each one can see at most.
+            kwargs["bloom_filter_options"] = {
+                column: {"ndv": row_group_size} for column in self.bloom_filters
+            }
+        return kwargs
+
+
+def summary_path(output_dir: Path, prefix: str) -> Path:
+    """Path of the `IndexOptions.summary` file for `prefix`'s shards.
+
+    Underscore-prefixed (as with Spark/Dask's `_metadata`), and deliberately
+    not matching `{prefix}-*.parquet`, so shard globs never pick it up.
+    """
+    return output_dir / f"_{prefix}_metadata"
+
+
+class _Journal:
+    """Progress journal of a resumable `_write_shards` run.
+
+    A JSON file, atomically rewritten on every shard open/close, recording
+    the run's `key` (a description of its input -- args, RNG state, ...),
+    every completed temp shard with its row count (so the input position to
+    resume from is their sum), and the shard being written, if any. Once
+    every shard is written, it also records their final names before
+    `_finalize_shards` renames them, so a rerun can tell a shard that's
+    already been renamed from a missing one.
+    """
+
+    def __init__(self, path: Path, key: dict) -> None:
+        self.path = path
+        # JSON round-trip, so tuples etc. compare equal to what's been saved.
+        self.key = json.loads(json.dumps(key))
+        self.shards: list[tuple[Path, int]] = []
+        self.partial: Path | None = None
+        self.final: list[Path] | None = None
+        if not path.exists():
+            return
+
+        state = json.loads(path.read_text())
+        if state["key"] != self.key:
+            msg = (
+                f"Journal {path} was written for different inputs; delete it "
+                "(and its temp shards) to start over."
+            )
+            raise ValueError(msg)
+        self.shards = [(path.parent / name, rows) for name, rows in state["shards"]]
+        if state.get("final") is not None:
+            self.final = [path.parent / name for name in state["final"]]
+            missing = [
+                p
+                for (p, _), dest in zip(self.shards, self.final, strict=True)
+                if not p.exists() and not dest.exists()
+            ]
+        else:
+            missing = [p for p, _ in self.shards if not p.exists()]
+        if missing:
+            msg = f"Journal {path} lists missing shards: {missing}"
+            raise FileNotFoundError(msg)
+        # A shard that was still being written when the run died is garbage.
+        if state["partial"] is not None:
+            (path.parent / state["partial"]).unlink(missing_ok=True)
+
+    @property
+    def num_rows(self) -> int:
+        """Input rows already written to completed shards."""
+        return sum(rows for _, rows in self.shards)
+
+    def open_shard(self, path: Path) -> None:
+        """Record `path` as the shard being written."""
+        self.partial = path
+        self._save()
+
+    def close_shard(self, path: Path, num_rows: int) -> None:
+        """Record `path` as completed, holding `num_rows` rows."""
+        self.shards.append((path, num_rows))
+        self.partial = None
+        self._save()
+
+    def finalize(self, dests: list[Path]) -> None:
+        """Record `dests` as the final names of the completed shards."""
+        self.final = dests
+        self._save()
+
+    def discard_partial(self) -> None:
+        """Delete the shard being written, if any."""
+        if self.partial is not None:
+            self.partial.unlink(missing_ok=True)
+            self.partial = None
+            self._save()
+
+    def _save(self) -> None:
+        state = {
+            "key": self.key,
+            "shards": [[p.name, rows] for p, rows in self.shards],
+            "partial": self.partial.name if self.partial is not None else None,
+            "final": [p.name for p in self.final] if self.final is not None else None,
+        }
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        tmp_path.write_text(json.dumps(state))
+        tmp_path.replace(self.path)
+
+
+def _journal_path(output_dir: Path, prefix: str, part: int | None = None) -> Path:
+    suffix = "" if part is None else f"-{part:05d}"
+    return output_dir / f"_{prefix}_journal{suffix}.json"
+
+
+def shards_complete(output_dir: Path, prefix: str) -> bool:
+    """Whether `prefix`'s shards under `output_dir` are completely written.
+
+    That is, some `{prefix}-*.parquet` shards exist and no resume journal
+    does -- one would mean a resumable write (see `write_sharded_parquet`'s
+    `resume_key`) is still unfinished, possibly mid-way through renaming its
+    shards, so the script should rerun it rather than skip `prefix`.
+    """
+    if any(output_dir.glob(f"_{prefix}_journal*.json")):
+        return False
+    return any(output_dir.glob(f"{prefix}-*.parquet"))
+
+
+def _rows_from(rows: Rows, start: int) -> Iterable[Chunk]:
+    if callable(rows):
+        return rows(start)
+    if start > 0:
+        msg = "Resuming needs `rows` as a callable taking the row to start from"
+        raise ValueError(msg)
+    return rows
+
+
+def _write_shards(  # noqa: C901, PLR0915
+    rows: Rows,
+    output_dir: Path,
+    schema: pa.Schema,
+    compression: dict[str, str],
+    row_group_size: int,
+    max_shard_bytes: int,
+    columnar: bool,
+    index: IndexOptions,
+    journal: _Journal | None,
+) -> list[Path]:
+    """Write `rows` to size-capped temp shards; return their paths, in order.
+
+    On failure, every temp shard written so far is deleted before re-raising
+    -- unless there's a `journal`, in which case completed shards are kept
+    (only the one being written is deleted), and a rerun with the same
+    journal resumes right after them. Shards only ever close on row-group
+    boundaries, and the row-group/rollover logic restarts from scratch with
+    each new shard, so the resumed run's shards come out byte-identical to
+    those of an uninterrupted one.
+    """
+    if journal is not None and journal.final is not None:
+        # Every shard was written; only finalizing them was interrupted.
+        return [p for p, _ in journal.shards]
+
+    writer_kwargs = index.writer_kwargs(row_group_size)
+    shard_tmp_paths: list[Path] = []
+    if journal is not None:
+        shard_tmp_paths = [p for p, _ in journal.shards]
+    rows = _rows_from(rows, journal.num_rows if journal is not None else 0)
+    shard_rows = 0
+    # Buffered rows, in order: Arrow chunks, then any row dicts appended since
+    # the last chunk (converted in bulk, only once needed).
+    chunks: list[pa.Table] = []
+    pending_rows: list[dict] = []
+    num_buffered = 0
+    file_obj = None
+    writer = None
+
+    def _open_shard() -> None:
+        nonlocal file_obj, writer, shard_rows
+        fd, tmp_path_str = tempfile.mkstemp(suffix=".parquet", dir=output_dir)
+        os.close(fd)
+        tmp_path = Path(tmp_path_str)
+        if journal is not None:
+            journal.open_shard(tmp_path)
+        shard_tmp_paths.append(tmp_path)
+        shard_rows = 0
+        file_obj = tmp_path.open("wb")
+        writer = pq.ParquetWriter(
+            file_obj, schema, compression=compression, **writer_kwargs
+        )
+
+    def _close_shard() -> None:
+        nonlocal file_obj, writer
+        writer.close()
+        file_obj.close()
+        writer = None
+        file_obj = None
+        if journal is not None:
+            journal.close_shard(shard_tmp_paths[-1], shard_rows)
+
+    def _seal_pending_rows() -> None:
+        nonlocal pending_rows
+        if pending_rows:
+            chunks.append(pa.Table.from_pylist(pending_rows, schema=schema))
+            pending_rows = []
+
+    def _add_chunk(chunk: pa.RecordBatch | pa.Table | dict) -> None:
+        nonlocal num_buffered
+        _seal_pending_rows()
+        if isinstance(chunk, dict):
+            table = pa.Table.from_pydict(chunk, schema=schema)
+        elif isinstance(chunk, pa.RecordBatch):
+            table = pa.Table.from_batches([chunk])
+        else:
+            table = chunk
+        table = table.select(schema.names).cast(schema)
+        chunks.append(table)
+        num_buffered += table.num_rows
+
+    def _flush_row_groups(*, force: bool = False) -> None:
+        nonlocal chunks, num_buffered, shard_rows
+        if num_buffered == 0 or (num_buffered < row_group_size and not force):
+            return
+        _seal_pending_rows()
+        table = pa.concat_tables(chunks)
+        offset = 0
+        while table.num_rows - offset >= row_group_size or (
+            force and offset < table.num_rows
+        ):
+            if writer is None:
+                _open_shard()
+            group = table.slice(offset, row_group_size)
+            writer.write_table(group, row_group_size=row_group_size)
+            offset += group.num_rows
+            shard_rows += group.num_rows
+            if file_obj.tell() >= max_shard_bytes:
+                _close_shard()
+        chunks = [table.slice(offset)] if offset < table.num_rows else []
+        num_buffered = table.num_rows - offset
+
+    try:
+        for item in rows:
+            if isinstance(item, dict) and not columnar:
+                pending_rows.append(item)
+                num_buffered += 1
+            else:
+                _add_chunk(item)
+            if num_buffered >= row_group_size:
+                _flush_row_groups()
+        _flush_row_groups(force=True)
+        if writer is not None:
+            _close_shard()
+    except Exception:
+        if writer is not None:
+            writer.close()
+            file_obj.close()
+        if journal is not None:
+            journal.discard_partial()
+        else:
+            for p in shard_tmp_paths:
+                p.unlink(missing_ok=True)
+        raise
+
+    return shard_tmp_paths
+
+
+def _finalize_shards(
+    shard_tmp_paths: list[Path],
+    output_dir: Path,
+    prefix: str,
+    schema: pa.Schema,
+    index: IndexOptions,
+    journals: Sequence[_Journal] = (),
+) -> None:
+    """Rename temp shards, in order, to their final `N-of-M` names.
+
+    Then, if requested, write the summary file from the final shards'
+    footers (footer reads only). Any existing summary is deleted before the
+    first rename -- it describes a previous run's shards, which are about to
+    be overwritten -- and the new one is written to a temp file and renamed
+    into place, so a crash never leaves a summary that disagrees with the
+    shards next to it.
+
+    Idempotent, given `journals` -- those of the runs that wrote
+    `shard_tmp_paths`, in order: the final names are recorded in them before
+    anything is renamed, and a temp shard that's gone but whose final name
+    exists counts as already renamed. So a rerun after a crash in here just
+    finishes the renames and rebuilds the summary.
+    """
+    num_shards = len(shard_tmp_paths)
+    dests = [
+        output_dir / f"{prefix}-{i:05d}-of-{num_shards:05d}.parquet"
+        for i in range(num_shards)
+    ]
+    start = 0
+    for journal in journals:
+        journal.finalize(dests[start : start + len(journal.shards)])
+        start += len(journal.shards)
+
+    summary = summary_path(output_dir, prefix)
+    summary.unlink(missing_ok=True)
+    for tmp_path, dest in zip(shard_tmp_paths, dests, strict=True):
+        if tmp_path.exists() or not dest.exists():
+            shutil.move(str(tmp_path), str(dest))
+
+    if index.summary:
+        footers = []
+        for dest in dests:
+            footer = pq.read_metadata(dest)
+            footer.set_file_path(dest.name)
+            footers.append(footer)
+        tmp_summary = summary.with_name(f"{summary.name}.tmp")
+        pq.write_metadata(schema, tmp_summary, metadata_collector=footers)
+        tmp_summary.replace(summary)
+
+
+def write_sharded_parquet(
+    rows: Rows,
     output_dir: Path,
     prefix: str,
     schema: pa.Schema,
     compression: dict[str, str],
     row_group_size: int,
     max_shard_bytes: int,
+    *,
+    columnar: bool = False,
+    index: IndexOptions | None = None,
+    resume_key: dict | None = None,
 ) -> None:
     """Write `rows` to `{prefix}-NNNNN-of-MMMMM.parquet` shards under `output_dir`.
 
@@ -32,7 +394,14 @@ def write_sharded_parquet(  # noqa: C901
     once the total shard count is known, so a failure mid-write leaves no
     partial/misnamed output.
 
-    :param rows: Row dicts matching `schema`'s field names.
+    Arrow inputs are buffered as-is (zero-copy slices) and written straight
+    through, skipping the per-row `pa.Table.from_pylist` conversion that row
+    dicts need -- the fast path for large binary columns.
+
+    :param rows: Row dicts matching `schema`'s field names, and/or
+        `pa.RecordBatch`/`pa.Table` chunks of rows (cast to `schema`); the
+        two may be mixed freely, and are written in order. May also be a
+        callable returning those, starting from the row index it's given.
     :param output_dir: Directory to write shards into (must already exist).
     :param prefix: Shard filename prefix (e.g. `"train"`/`"val"`).
     :param schema: Target Parquet schema.
@@ -44,56 +413,161 @@ def write_sharded_parquet(  # noqa: C901
         end up somewhat larger than this -- by up to one row group's
         on-disk size, which is usually small relative to the cap, but grows
         with `row_group_size` and per-row size.
+    :param columnar: Treat plain dicts in `rows` as column dicts (field name
+        to equal-length list of values) rather than single rows.
+    :param index: Read-acceleration metadata to write (defaults to
+        pyarrow's: statistics for every column, nothing else).
+    :param resume_key: If given, make the write crash-resumable: completed
+        temp shards survive a failure, tracked by a `_{prefix}_journal.json`
+        journal under `output_dir`, and a rerun with an equal `resume_key`
+        -- any JSON-serializable description of the input (args, RNG state,
+        ...) -- picks up after the last completed shard, calling `rows` with
+        the row to restart from. The output is byte-identical to that of an
+        uninterrupted run. This covers the final renames and summary too: a
+        rerun after a crash there just finishes them. The journal is deleted
+        once the write completes.
     """
-    shard_tmp_paths: list[Path] = []
-    buffer: list[dict] = []
-    file_obj = None
-    writer = None
+    index = index or IndexOptions()
+    journal = None
+    if resume_key is not None:
+        journal = _Journal(_journal_path(output_dir, prefix), resume_key)
+    shard_tmp_paths = _write_shards(
+        rows,
+        output_dir,
+        schema,
+        compression,
+        row_group_size,
+        max_shard_bytes,
+        columnar,
+        index,
+        journal,
+    )
+    journals = [journal] if journal is not None else []
+    _finalize_shards(shard_tmp_paths, output_dir, prefix, schema, index, journals)
+    if journal is not None:
+        journal.path.unlink()
 
-    def _open_shard() -> None:
-        nonlocal file_obj, writer
-        fd, tmp_path_str = tempfile.mkstemp(suffix=".parquet", dir=output_dir)
-        os.close(fd)
-        tmp_path = Path(tmp_path_str)
-        shard_tmp_paths.append(tmp_path)
-        file_obj = tmp_path.open("wb")
-        writer = pq.ParquetWriter(file_obj, schema, compression=compression)
 
-    def _close_shard() -> None:
-        nonlocal file_obj, writer
-        writer.close()
-        file_obj.close()
-        writer = None
-        file_obj = None
+def write_sharded_parquet_parallel(
+    sources: Sequence[Callable[[int], Iterable[Chunk]]],
+    output_dir: Path,
+    prefix: str,
+    schema: pa.Schema,
+    compression: dict[str, str],
+    row_group_size: int,
+    max_shard_bytes: int,
+    *,
+    columnar: bool = False,
+    index: IndexOptions | None = None,
+    resume_key: dict | None = None,
+    num_workers: int | None = None,
+) -> None:
+    """Like `write_sharded_parquet`, but with one writer process per source.
 
-    def _flush_row_group(*, force: bool = False) -> None:
-        nonlocal buffer
-        if not buffer or (len(buffer) < row_group_size and not force):
-            return
-        if writer is None:
-            _open_shard()
-        table = pa.Table.from_pylist(buffer, schema=schema)
-        writer.write_table(table, row_group_size=row_group_size)
-        buffer = []
-        if file_obj.tell() >= max_shard_bytes:
-            _close_shard()
+    Each of `sources` is called in its own worker process, and its rows
+    written to that worker's own temp shards, exactly as in
+    `write_sharded_parquet`. Once every worker is done, all temp shards are
+    renamed to their final `N-of-M` names in `sources` order -- so the output
+    reads back as `sources[0]`'s rows, then `sources[1]`'s, and so on. If
+    any worker fails, every worker's temp shards are deleted -- unless
+    `resume_key` is given, in which case each source keeps its own
+    `_{prefix}_journal-NNNNN.json` journal and resumes independently.
 
-    try:
-        for row in rows:
-            buffer.append(row)
-            if len(buffer) >= row_group_size:
-                _flush_row_group()
-        _flush_row_group(force=True)
-        if writer is not None:
-            _close_shard()
-    except Exception:
-        if writer is not None:
-            _close_shard()
-        for p in shard_tmp_paths:
-            p.unlink(missing_ok=True)
-        raise
+    Each source's last shard (and last row group) may be partial, so the
+    output has up to `len(sources) - 1` more undersized shards than a
+    single-writer run would.
 
-    num_shards = len(shard_tmp_paths)
-    for i, tmp_path in enumerate(shard_tmp_paths):
-        dest = output_dir / f"{prefix}-{i:05d}-of-{num_shards:05d}.parquet"
-        shutil.move(str(tmp_path), str(dest))
+    :param sources: Picklable callables (e.g. `functools.partial` of a
+        module-level function), each returning an iterable of
+        `write_sharded_parquet` inputs, starting from the row (within that
+        source) it's called with -- always 0 unless resuming.
+    :param num_workers: Max writer processes at once (defaults to
+        `len(sources)`).
+
+    See `write_sharded_parquet` for the remaining parameters.
+    """
+    index = index or IndexOptions()
+    journal_paths: list[Path | None] = [
+        _journal_path(output_dir, prefix, part) if resume_key is not None else None
+        for part in range(len(sources))
+    ]
+    journal_keys = [
+        {"key": resume_key, "part": part, "num_parts": len(sources)}
+        for part in range(len(sources))
+    ]
+    with ProcessPoolExecutor(num_workers or len(sources)) as pool:
+        futures = [
+            pool.submit(
+                _write_shard_source,
+                source,
+                output_dir,
+                schema,
+                compression,
+                row_group_size,
+                max_shard_bytes,
+                columnar,
+                index,
+                journal_path,
+                journal_key,
+            )
+            for source, journal_path, journal_key in zip(
+                sources, journal_paths, journal_keys, strict=True
+            )
+        ]
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        if any(future.exception() is not None for future in done):
+            for future in futures:
+                future.cancel()
+
+    finished = [future for future in futures if not future.cancelled()]
+    failed = [future for future in finished if future.exception() is not None]
+    shard_tmp_paths = [
+        path
+        for future in finished
+        if future.exception() is None
+        for path in future.result()
+    ]
+    if failed:
+        if resume_key is None:
+            for p in shard_tmp_paths:
+                p.unlink(missing_ok=True)
+        raise failed[0].exception()
+
+    # Reloaded here (the workers' copies are gone) to record the final names.
+    journals = [
+        _Journal(journal_path, journal_key)
+        for journal_path, journal_key in zip(journal_paths, journal_keys, strict=True)
+        if journal_path is not None
+    ]
+    _finalize_shards(shard_tmp_paths, output_dir, prefix, schema, index, journals)
+    for journal in journals:
+        journal.path.unlink()
+
+
+def _write_shard_source(
+    source: Callable[[int], Iterable[Chunk]],
+    output_dir: Path,
+    schema: pa.Schema,
+    compression: dict[str, str],
+    row_group_size: int,
+    max_shard_bytes: int,
+    columnar: bool,
+    index: IndexOptions,
+    journal_path: Path | None,
+    resume_key: dict,
+) -> list[Path]:
+    """Worker-process entry point for `write_sharded_parquet_parallel`."""
+    journal = None
+    if journal_path is not None:
+        journal = _Journal(journal_path, resume_key)
+    return _write_shards(
+        source,
+        output_dir,
+        schema,
+        compression,
+        row_group_size,
+        max_shard_bytes,
+        columnar,
+        index,
+        journal,
+    )
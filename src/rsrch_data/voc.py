@@ -4,11 +4,13 @@ from collections.abc import Sequence
 from pathlib import Path
 from typing import Literal
 
+import numpy as np
 from PIL import Image
 from ruamel.yaml import YAML
 
 from rsrch_data.registry import register_dataset
 from rsrch_data.types.sem_seg import Metadata, Sample
+from rsrch_data.utils.image_sizes import cached_image_sizes
 
 
 @register_dataset("voc2012")
@@ -60,6 +62,20 @@ class VOCSegmentation(Sequence):
         seg_map = Image.open(seg_map_path)
         return {"image": image, "labels": seg_map}
 
+    def image_sizes(self, num_threads: int = 32) -> np.ndarray:
+        """Return every image's `(width, height)`, as an `(N, 2)` int32 array.
+
+        Read from the image file headers (no decoding) on first call, then
+        cached as `VOCdevkit/VOC2012/_{split}_image_sizes.npy` -- see
+        `cached_image_sizes`.
+        """
+        return cached_image_sizes(
+            self.root / "JPEGImages",
+            [f"{img_id}.jpg" for img_id in self._ids],
+            self.root / f"_{self.split}_image_sizes.npy",
+            num_threads,
+        )
+
     @staticmethod
     def meta() -> Metadata:
         """Return semantic segmentation metadata loaded from the bundled YAML."""